@@ -0,0 +1,124 @@
+import fnmatch
+import os
+import zipfile
+
+
+class ExtractFilter:
+    """
+    Decides which archive members are worth extracting.
+    Evaluated against the ZIP central directory (ZipInfo), so rejected
+    members are never decompressed.
+
+    Glob patterns containing '/' match the full member path, others match
+    the member's base name (e.g. "Thumbs.db", "*.jpg", "*/thumbnails/*").
+    Matching is case-insensitive (Windows semantics).
+    """
+    def __init__(self, include=None, exclude=None, extensions=None,
+                 exclude_extensions=None, min_size=0, max_size=0):
+        self.include = [p.lower() for p in (include or [])]
+        self.exclude = [p.lower() for p in (exclude or [])]
+        self.extensions = {self._norm_ext(e) for e in (extensions or [])}
+        self.exclude_extensions = {self._norm_ext(e) for e in (exclude_extensions or [])}
+        self.min_size = int(min_size or 0)
+        self.max_size = int(max_size or 0) # 0 = no limit
+
+    @staticmethod
+    def _norm_ext(ext):
+        ext = ext.lower().strip()
+        return ext if ext.startswith('.') else '.' + ext
+
+    @classmethod
+    def for_archive(cls, archive_name, rules):
+        """
+        Returns the filter of the first rule whose 'archive' glob matches
+        archive_name, or None if no rule applies.
+        rules: list of dicts from the 'extract_filters' setting.
+        """
+        name = archive_name.lower()
+        for rule in rules or []:
+            if fnmatch.fnmatch(name, rule.get('archive', '*').lower()):
+                return cls(
+                    include=rule.get('include'),
+                    exclude=rule.get('exclude'),
+                    extensions=rule.get('extensions'),
+                    exclude_extensions=rule.get('exclude_extensions'),
+                    min_size=rule.get('min_size', 0),
+                    max_size=rule.get('max_size', 0),
+                )
+        return None
+
+    @staticmethod
+    def _match(path, patterns):
+        base = path.rstrip('/').rsplit('/', 1)[-1]
+        for pattern in patterns:
+            target = path if '/' in pattern else base
+            if fnmatch.fnmatchcase(target, pattern):
+                return True
+        return False
+
+    def accepts(self, info):
+        path = info.filename.replace('\\', '/').lower()
+
+        if self.exclude and self._match(path, self.exclude):
+            return False
+
+        # Directory entries only carry structure; size/extension rules don't apply.
+        if info.is_dir():
+            return True
+
+        if self.include and not self._match(path, self.include):
+            return False
+
+        ext = os.path.splitext(path)[1]
+        if self.extensions and ext not in self.extensions:
+            return False
+        if ext in self.exclude_extensions:
+            return False
+
+        if info.file_size < self.min_size:
+            return False
+        if self.max_size and info.file_size > self.max_size:
+            return False
+        return True
+
+
+class ExtractionPlan:
+    """Result of filtering an archive's central directory."""
+    def __init__(self, members, skipped):
+        self.members = members # List[ZipInfo] to extract
+        self.skipped = skipped # List[ZipInfo] never decompressed
+
+    @property
+    def is_filtered(self):
+        return bool(self.skipped)
+
+    @property
+    def extract_bytes(self):
+        return sum(i.file_size for i in self.members)
+
+    @property
+    def skipped_bytes(self):
+        """Uncompressed bytes that will not be written."""
+        return sum(i.file_size for i in self.skipped)
+
+    @property
+    def skipped_compressed_bytes(self):
+        """Compressed bytes that will not be read/inflated."""
+        return sum(i.compress_size for i in self.skipped)
+
+
+def plan_extraction(zip_path, extract_filter):
+    """
+    Reads only the central directory of zip_path and splits its members
+    into extract/skip lists. Raises zipfile.BadZipFile on corrupt archives.
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        infos = zip_ref.infolist()
+
+    if not extract_filter:
+        return ExtractionPlan(infos, [])
+
+    members, skipped = [], []
+    for info in infos:
+        (members if extract_filter.accepts(info) else skipped).append(info)
+    return ExtractionPlan(members, skipped)
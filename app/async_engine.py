@@ -0,0 +1,410 @@
+import asyncio
+import heapq
+import itertools
+import os
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.polling import is_network_path
+from app.readiness import ReadinessTracker
+from app.scheduler import JobScheduler
+from app.session import DownloadSession
+from app.watcher import DownloadHandler
+
+
+class AsyncLane:
+    """Lane of AsyncJobScheduler: a cost-ordered heap and a running-job count."""
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = max(1, int(workers))
+        self.heap = []
+        self.busy = 0
+
+
+class AsyncJobScheduler:
+    """
+    JobScheduler for the asyncio engine: same lanes, cost buckets and
+    de-duplication, but the lanes are heaps on the event loop and a job
+    is one run_in_executor call (the executor has one thread per lane slot).
+    submit() is safe from any thread.
+    """
+    def __init__(self, loop, executor, quick_workers=4, heavy_workers=1, heavy_threshold=64 * 1024 * 1024):
+        self.loop = loop
+        self.executor = executor
+        self.heavy_threshold = heavy_threshold
+        self.lanes = {
+            "quick": AsyncLane("quick", quick_workers),
+            "heavy": AsyncLane("heavy", heavy_workers),
+        }
+        self._seq = itertools.count()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._tasks = set()
+        self._idle = None # asyncio.Event, created on the loop
+        self.closing = False
+
+    @classmethod
+    def from_settings(cls, loop, executor, settings):
+        base = JobScheduler.from_settings(settings)
+        return cls(loop, executor, base.lanes["quick"].workers, base.lanes["heavy"].workers, base.heavy_threshold)
+
+    @property
+    def workers(self):
+        return sum(lane.workers for lane in self.lanes.values())
+
+    def lane_for(self, cost):
+        return self.lanes["heavy" if cost >= self.heavy_threshold else "quick"]
+
+    def submit(self, key, cost, fn, *args):
+        """Queues fn(*args). Returns the lane name, or None if key is already waiting."""
+        with self._lock:
+            if key in self._pending:
+                return None
+            self._pending.add(key)
+        lane = self.lane_for(cost)
+        item = (max(0, int(cost)).bit_length(), next(self._seq), key, fn, args)
+        self.loop.call_soon_threadsafe(self._push, lane, item)
+        return lane.name
+
+    def _push(self, lane, item):
+        heapq.heappush(lane.heap, item)
+        self._pump(lane)
+
+    def _pump(self, lane):
+        while not self.closing and lane.busy < lane.workers and lane.heap:
+            _, _, key, fn, args = heapq.heappop(lane.heap)
+            lane.busy += 1
+            task = self.loop.create_task(self._run(lane, key, fn, args))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, lane, key, fn, args):
+        with self._lock:
+            self._pending.discard(key)
+        try:
+            await self.loop.run_in_executor(self.executor, fn, *args)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Scheduler ({lane.name}) job error: {e}")
+        finally:
+            lane.busy -= 1
+            self._pump(lane) # No-op once cancelled: nothing new reaches the executor
+            if self._idle is not None and not self.queue_depth() and not self.in_flight():
+                self._idle.set()
+
+    async def drain(self):
+        """Waits (on the loop) until every queued and running job is done."""
+        while self.queue_depth() or self.in_flight():
+            self._idle = asyncio.Event()
+            await self._idle.wait()
+
+    def cancel(self):
+        """Drops every queued job and stops starting new ones (on the loop)."""
+        self.closing = True
+        for lane in self.lanes.values():
+            lane.heap.clear()
+        with self._lock:
+            self._pending.clear()
+
+    def shutdown(self):
+        """JobScheduler interface; the engine drains the lanes in AsyncDownloadHandler.shutdown."""
+
+    def queue_depth(self):
+        return sum(len(lane.heap) for lane in self.lanes.values())
+
+    def in_flight(self):
+        return sum(lane.busy for lane in self.lanes.values())
+
+
+class AsyncSessionGrouper:
+    """SessionGrouper on the event loop: one timer per open session instead of a thread. add() is thread-safe."""
+    def __init__(self, loop, on_flush, window=1.5, max_duration=30.0):
+        self.loop = loop
+        self.on_flush = on_flush
+        self.window = window
+        self.max_duration = max_duration
+        self._sessions = {} # key -> (session, timer handle)
+        self._count = 0
+
+    def add(self, key, route, file_path, size, cost):
+        self.loop.call_soon_threadsafe(self._add, key, route, file_path, size, cost)
+
+    def _add(self, key, route, file_path, size, cost):
+        session, timer = self._sessions.get(key, (None, None))
+        if session is None:
+            session = DownloadSession(route)
+        else:
+            timer.cancel()
+        session.add(file_path, size, cost)
+        self._count += 1
+        due_in = min(session.last_added + self.window, session.opened + self.max_duration) - time.monotonic()
+        self._sessions[key] = (session, self.loop.call_later(due_in, self._flush, key))
+
+    def _flush(self, key):
+        session, _ = self._sessions.pop(key)
+        self._count -= len(session.files)
+        try:
+            self.on_flush(session)
+        except Exception as e:
+            print(f"Session flush error: {e}")
+
+    def pending(self):
+        return self._count
+
+    def cancel(self):
+        for session, timer in self._sessions.values():
+            timer.cancel()
+        self._sessions.clear()
+        self._count = 0
+
+
+class AsyncRetryQueue:
+    """RetryQueue on the event loop (call_later timers). add() is thread-safe and returns at once."""
+    def __init__(self, loop, on_retry, delays=(5, 15, 45, 120, 300)):
+        self.loop = loop
+        self.on_retry = on_retry
+        self.delays = tuple(delays)
+        self._timers = {} # file_path -> TimerHandle
+        self._lock = threading.Lock()
+
+    def add(self, file_path, attempt):
+        """Schedules retry number 'attempt' (1-based). Returns the delay, or None when out of retries."""
+        if attempt > len(self.delays):
+            return None
+        delay = self.delays[attempt - 1]
+        with self._lock:
+            if file_path in self._timers:
+                return delay
+            self._timers[file_path] = None
+        self.loop.call_soon_threadsafe(self._schedule, file_path, attempt, delay)
+        return delay
+
+    def _schedule(self, file_path, attempt, delay):
+        with self._lock:
+            if file_path in self._timers:
+                self._timers[file_path] = self.loop.call_later(delay, self._due, file_path, attempt)
+
+    def _due(self, file_path, attempt):
+        with self._lock:
+            self._timers.pop(file_path, None)
+        try:
+            self.on_retry(file_path, attempt)
+        except Exception as e:
+            print(f"Retry error for {file_path}: {e}")
+
+    def pending(self):
+        with self._lock:
+            return len(self._timers)
+
+    def scheduled(self, file_path):
+        with self._lock:
+            return file_path in self._timers
+
+    def cancel(self):
+        with self._lock:
+            for timer in self._timers.values():
+                if timer is not None:
+                    timer.cancel()
+            self._timers.clear()
+
+
+class AsyncDownloadHandler(DownloadHandler):
+    """
+    The organizer engine on one asyncio event loop (engine: "asyncio").
+    Intake, readiness timers, retries, sessions and lane scheduling all run
+    on the loop's thread; no thread is created per event.
+    - Blocking work goes to sized executors: organize jobs to one thread
+      per lane slot (quick + heavy workers), file probes that can block
+      (network roots, context files, routing a verified file) to
+      'async_probe_workers' threads. Readiness probes of local files are
+      single stat/rename calls and run on the loop, except while the file is
+      still empty: those probes may scan the folder for a batch in progress.
+    - 'tar' runs through asyncio.create_subprocess_exec with tar_timeout;
+      it is killed on timeout or when the engine is cancelled.
+    - shutdown() drains the lanes; shutdown(cancel=True) cancels readiness
+      waits, retries, sessions and running tar processes.
+    Same intake, readiness policy, routing and organizer as DownloadHandler,
+    so the two engines can be benchmarked against each other.
+    """
+    def __init__(self):
+        super().__init__()
+        from app.settings import SettingsManager
+        settings = SettingsManager()
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self._run_loop, name="async-engine", daemon=True)
+        self.loop_thread.start()
+
+        self.scheduler = AsyncJobScheduler.from_settings(self.loop, None, settings)
+        self.executor = ThreadPoolExecutor(max_workers=self.scheduler.workers, thread_name_prefix="async-organize")
+        self.scheduler.executor = self.executor
+        self.probe_executor = ThreadPoolExecutor(max_workers=max(1, int(settings.get("async_probe_workers", 4))),
+                                                 thread_name_prefix="async-probe")
+        self.sessions = AsyncSessionGrouper(self.loop, self.submit_session, window=self.session_window,
+                                            max_duration=self.sessions.max_duration)
+        self.retries = AsyncRetryQueue(self.loop, self.retry, self.retries.delays)
+        self.organizer.tar_runner = self.run_tar
+        self.tasks = set()
+        self.network_folders = {} # folder -> is_network_path (probes of network roots are offloaded)
+
+        self.metrics.gauge("plmorg_queue_depth", "Organize jobs waiting in the scheduler lanes",
+                           self.scheduler.queue_depth)
+        self.metrics.gauge("plmorg_workers_in_flight", "Organize jobs currently running", self.scheduler.in_flight)
+        self.metrics.gauge("plmorg_session_files_pending", "Files held in open download sessions",
+                           self.sessions.pending)
+        self.metrics.gauge("plmorg_ready_retries_pending", "Files waiting for another readiness check",
+                           self.retries.pending)
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def _in_loop(self):
+        return threading.current_thread() is self.loop_thread
+
+    def _spawn(self, coro):
+        task = self.loop.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    # --- Intake (watchdog thread -> loop) ----------------------------------
+
+    def dispatch(self, event):
+        from app.trace import TraceRecorder
+        recorder = TraceRecorder.active
+        if recorder is not None:
+            recorder.on_event(event)
+        if not event.is_directory and event.event_type in ("created", "modified"):
+            self.io.note_activity()
+        self.loop.call_soon_threadsafe(self._intake, event)
+
+    def _intake(self, event):
+        path = self.intake.on_event(event)
+        if path is not None:
+            self.start_process(path)
+
+    def start_process(self, file_path):
+        # Also called by the intake's hold timer (another thread)
+        if not self._in_loop():
+            self.loop.call_soon_threadsafe(self.start_process, file_path)
+            return
+        if self.intake.begin(file_path):
+            self.track_pending(file_path)
+            self._spawn(self.process_async(file_path))
+
+    def retry(self, file_path, attempt):
+        if os.path.exists(file_path):
+            self._spawn(self.process_async(file_path, attempt))
+        else:
+            self.intake.end(file_path)
+            self.settle((file_path,))
+
+    # --- Verification ------------------------------------------------------
+
+    async def process_async(self, file_path, attempt=0):
+        """DownloadHandler.process on the loop."""
+        outcome = None
+        try:
+            outcome = await self.process_file_async(file_path, attempt)
+        except asyncio.CancelledError:
+            outcome = "cancelled" # Engine shutdown: not an outcome, the file stays pending (warm state)
+            raise
+        finally:
+            if outcome not in ("ready", "retry", "cancelled"):
+                self.settle((file_path,))
+            if outcome != "retry" and self.intake.end(file_path) and outcome == "gone" and os.path.exists(file_path):
+                self.start_process(file_path)
+
+    async def process_file_async(self, file_path, attempt):
+        if self.is_context_file(file_path):
+            await asyncio.sleep(1.0)
+            await self.loop.run_in_executor(self.probe_executor, self.load_context_file, file_path)
+            return None
+
+        self.note_detected(file_path, attempt)
+        tracker = await self.wait_ready_async(file_path)
+        outcome = self.readiness_outcome(file_path, attempt, tracker)
+        if outcome == "ready":
+            # Routing may create the target folder and the cost estimate reads the ZIP directory
+            await self.loop.run_in_executor(self.probe_executor, self.hand_off, file_path)
+        return outcome
+
+    async def wait_ready_async(self, file_path):
+        """wait_for_file_ready with asyncio.sleep between probes (cancellable at every sleep)."""
+        print(f"Verifying stability for: {os.path.basename(file_path)}")
+        tracker = ReadinessTracker(file_path, self.readiness)
+        steps = tracker.steps(busy_check=self.is_folder_busy)
+        folder = os.path.dirname(file_path)
+        offload = self.network_folders.get(folder)
+        if offload is None:
+            offload = self.network_folders[folder] = is_network_path(folder)
+        try:
+            while True:
+                # An empty placeholder makes the next probe scan the folder (is_folder_busy)
+                if offload or not tracker.size:
+                    delay = await self.loop.run_in_executor(self.probe_executor, next, steps, None)
+                else:
+                    delay = next(steps, None)
+                if delay is None:
+                    return tracker
+                await asyncio.sleep(delay)
+        finally:
+            steps.close()
+
+    # --- Extraction subprocess -----------------------------------------------
+
+    def run_tar(self, args, timeout):
+        """Organizer.tar_runner: called from an organize thread, runs tar on the loop."""
+        return asyncio.run_coroutine_threadsafe(self.run_tar_async(args, timeout), self.loop).result()
+
+    async def run_tar_async(self, args, timeout):
+        proc = await asyncio.create_subprocess_exec(*args, stdout=asyncio.subprocess.DEVNULL,
+                                                    stderr=asyncio.subprocess.PIPE)
+        try:
+            _, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise subprocess.TimeoutExpired(args, timeout)
+        except asyncio.CancelledError:
+            proc.kill()
+            await proc.wait() # Reaped before the loop stops
+            raise
+        return proc.returncode, stderr.decode(errors="replace")
+
+    # --- Shutdown ------------------------------------------------------------
+
+    def shutdown(self, cancel=False, timeout=None):
+        """
+        Drains the lanes (jobs already queued are organized), then stops the loop.
+        With cancel, process-pool extractions, pending readiness waits, retries,
+        sessions and tar processes are cancelled first. Safe to call from any thread but the loop's.
+        """
+        if not self.loop.is_running():
+            return
+        if cancel:
+            self.organizer.shutdown() # Organize threads waiting on extraction processes return
+        future = asyncio.run_coroutine_threadsafe(self._shutdown(cancel), self.loop)
+        try:
+            future.result(timeout)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop_thread.join(timeout)
+            self.executor.shutdown(wait=False, cancel_futures=cancel)
+            self.probe_executor.shutdown(wait=False, cancel_futures=cancel)
+
+    async def _shutdown(self, cancel):
+        if cancel:
+            self.scheduler.cancel()
+            self.retries.cancel()
+            self.sessions.cancel()
+            current = asyncio.current_task()
+            tasks = [t for t in asyncio.all_tasks() if t is not current]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        else:
+            await self.scheduler.drain()
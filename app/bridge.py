@@ -7,6 +7,7 @@ import win32process
 import win32api
 import win32con
 from app.context import ContextManager
+from app.metrics import Metrics
 
 class TitleBridge(threading.Thread):
     """
@@ -21,6 +22,7 @@ class TitleBridge(threading.Thread):
         # Pattern: [PLM_CTX:ID|Title] - Greedy for title (captures until the LAST ']')
         self.pattern = re.compile(r'^\[PLM_CTX:([^|]{1,30})\|(.*)\](?:\s|$)')
         self.last_sync_tag = ""
+        self.metrics = Metrics()
 
     def _get_process_name(self, hwnd):
         """Robustly retrieve the executable name of the window's process."""
@@ -41,6 +43,7 @@ class TitleBridge(threading.Thread):
     def run(self):
         # Silence premature print to prevent pythonw window popup
         while self.running:
+            self.metrics.inc("plmorg_bridge_wakeups_total")
             try:
                 # OPTIMIZATION (v1.7.2):
                 # Instead of scanning ALL windows (EnumWindows), only check the Foreground Window.
@@ -0,0 +1,250 @@
+"""
+Command-line tools (no GUI, no PyQt import):
+
+    PLM_Organizer.exe search DF12345 board
+    PLM_Organizer.exe index D:/PLM D:/Archive --workers 16
+    PLM_Organizer.exe merge-folders D:/PLM --apply
+    PLM_Organizer.exe diagnose profile --seconds 30
+"""
+import argparse
+import os
+import sys
+import time
+
+from app.utils import format_size
+
+
+def attach_console():
+    # The frozen EXE is a windowed app: borrow the calling console for output.
+    windowed = getattr(sys, "frozen", False) or sys.executable.endswith("pythonw.exe")
+    if os.name != 'nt' or not windowed:
+        return
+    try:
+        import ctypes
+        if ctypes.windll.kernel32.AttachConsole(-1):
+            sys.stdout = open("CONOUT$", "w", encoding="utf-8")
+            sys.stderr = sys.stdout
+    except Exception:
+        pass
+
+
+def cmd_search(args):
+    from app.search import SearchIndex, timed_search
+    rows, ms = timed_search(SearchIndex(), " ".join(args.query), args.limit)
+    for row in rows:
+        print(f"{row[1]}  ({format_size(row[8] or 0)})")
+    print(f"{len(rows)} result(s) in {ms:.1f} ms")
+    return 0
+
+
+def cmd_index(args):
+    from app.search import SearchIndex
+    from app.settings import SettingsManager
+    roots = args.roots or [SettingsManager().get("watch_folder") or os.path.join(os.path.expanduser("~"), "Downloads")]
+    index = SearchIndex()
+    started = time.perf_counter()
+
+    def progress(done, total, files):
+        if done == total or done % 100 == 0:
+            print(f"  {done}/{total} folders, {files} files")
+
+    print(f"Indexing PLM folders under: {', '.join(roots)}")
+    count = index.bulk_index(roots, workers=args.workers, progress=progress)
+    stats = index.stats()
+    print(f"Indexed {count} files in {time.perf_counter() - started:.1f}s "
+          f"(index: {stats['files']} files, {stats['terms']} terms)")
+    return 0
+
+
+def cmd_merge_folders(args):
+    from app.organizer import Organizer
+    from app.settings import SettingsManager
+    base = args.root or SettingsManager().get("watch_folder") or os.path.join(os.path.expanduser("~"), "Downloads")
+    organizer = Organizer()
+    plan = organizer.merge_record_folders(base, record_ids=args.ids, dry_run=not args.apply)
+    if not plan:
+        print("No split record folders found.")
+    elif not args.apply:
+        print(f"{len(plan)} record(s) split over several folders. Re-run with --apply to merge.")
+    for store in (organizer.history, organizer.search_index, organizer.manifest):
+        if store is not None:
+            store.flush(timeout=None)
+    return 0
+
+
+def cmd_retention(args):
+    from app.retention import RetentionJob, print_report
+    from app.settings import SettingsManager
+    job = RetentionJob.from_settings(SettingsManager())
+    if args.roots:
+        job.roots = args.roots
+    if args.days is not None:
+        job.days = args.days
+    if args.repack:
+        job.repack = True
+    print(f"{'Compacting' if args.apply else 'Dry run:'} record folders untouched for {job.days:g} days "
+          f"under: {', '.join(job.roots)}")
+    report = job.run(apply=args.apply)
+    print_report(report, args.apply)
+    if not args.apply and report["stale"]:
+        print("Re-run with --apply to compact.")
+    return 0
+
+
+def cmd_dedup(args):
+    from app.dedup import DedupStore, deduplicate_tree, rehydrate
+    from app.settings import SettingsManager
+    if args.action == "rehydrate":
+        files, copied = rehydrate(args.path)
+        print(f"Rehydrated {files} linked file(s) ({format_size(copied)}) in {args.path}")
+        return 0
+    try:
+        store = DedupStore(args.path)
+    except OSError as e:
+        print(f"No dedup store possible in {args.path}: {e}")
+        return 1
+    try:
+        if args.action == "scan":
+            from app.retention import record_folders
+            min_size = int(SettingsManager().get("dedup_min_size_kb", 64)) * 1024
+            started = time.monotonic()
+            files = saved = 0
+            for folder in record_folders([args.path]): # Only organized files, never pending downloads
+                folder_files, folder_saved = deduplicate_tree(store, folder, min_size)
+                files += folder_files
+                saved += folder_saved
+            print(f"Scanned {files} file(s) in {time.monotonic() - started:.1f}s, saved {format_size(saved)}")
+        elif args.action == "gc":
+            print(f"Removed unused objects: {format_size(store.gc())} freed")
+        stats = store.stats()
+        print(f"{stats['objects']} object(s) ({format_size(stats['stored_bytes'])}) linked into "
+              f"{stats['copies']} place(s); saved {format_size(stats['saved_bytes'])}")
+        if stats["orphans"]:
+            print(f"{stats['orphans']} object(s) are no longer used (run 'dedup gc').")
+    finally:
+        store.close()
+    return 0
+
+
+def cmd_manifest(args):
+    import datetime
+    from app.manifest import Manifest
+    count = 0
+    for entry in Manifest(args.folder):
+        if args.name and entry.get("name") != args.name:
+            continue
+        count += 1
+        when = datetime.datetime.fromtimestamp(entry.get("ts", 0)).strftime("%Y-%m-%d %H:%M:%S")
+        size = format_size(entry.get("size") or 0)
+        line = f"{when}  {entry.get('kind', 'file'):<4}  {entry.get('name')}  ({size})"
+        if entry.get("zip"):
+            line += f"  from {entry['zip']}"
+        if entry.get("merged_from"):
+            line += f"  merged from {entry['merged_from']}"
+        print(line)
+        if args.verbose:
+            for key in ("source", "source_url", "referrer_url", "sha256"):
+                if entry.get(key):
+                    print(f"    {key}: {entry[key]}")
+            context = entry.get("context") or {}
+            if context:
+                print(f"    context: {', '.join(f'{k}={v}' for k, v in context.items() if v)}")
+    print(f"{count} entr{'y' if count == 1 else 'ies'}")
+    return 0
+
+
+def cmd_diagnose(args):
+    # Runs inside the organizer that is already running, through its loopback endpoint.
+    import json
+    import urllib.error
+    import urllib.request
+    from app.metrics import TOKEN_HEADER, token_path
+    from app.settings import SettingsManager
+    port = SettingsManager().get("metrics_port", 9477)
+    url = f"http://127.0.0.1:{port}/diagnostics/{args.action}?seconds={args.seconds:g}&mode={args.mode}"
+    try:
+        with open(token_path(), "r", encoding="utf-8") as f:
+            token = f.read().strip()
+    except OSError:
+        print("The organizer is not running (no diagnostics token in the settings folder).")
+        return 1
+    if args.action == "profile":
+        print(f"Profiling the running organizer for {args.seconds:g}s ({args.mode})...")
+    try:
+        request = urllib.request.Request(url, data=b"", method="POST", headers={TOKEN_HEADER: token})
+        with urllib.request.urlopen(request, timeout=args.seconds + 120) as response:
+            status, result = response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        if e.code == 403:
+            print("The organizer rejected the diagnostics token. Was it restarted meanwhile?")
+            return 1
+        status, result = e.code, json.load(e)
+    except OSError as e:
+        print(f"Cannot reach the organizer on 127.0.0.1:{port} ({e}). "
+              f"Is it running with \"metrics_enabled\" on?")
+        return 1
+    print(result["message"])
+    if result["bundle"]:
+        print(f"Bundle: {result['bundle']}")
+    return 0 if status == 200 else 1
+
+
+COMMANDS = {
+    "search": cmd_search,
+    "index": cmd_index,
+    "merge-folders": cmd_merge_folders,
+    "retention": cmd_retention,
+    "dedup": cmd_dedup,
+    "manifest": cmd_manifest,
+    "diagnose": cmd_diagnose,
+}
+
+
+def build_parser():
+    p = argparse.ArgumentParser(prog="PLM_Organizer", description="PLM Organizer command-line tools")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    s = sub.add_parser("search", help="Search organized files (prefix/token match)")
+    s.add_argument("query", nargs="+", help="e.g. DF12345, 'main board', P000123")
+    s.add_argument("--limit", type=int, default=200)
+
+    s = sub.add_parser("index", help="One-time bulk index of existing [ID]_Title folders")
+    s.add_argument("roots", nargs="*", help="Folders containing [ID]_Title folders (default: watch folder)")
+    s.add_argument("--workers", type=int, default=8, help="parallel folder scanners")
+
+    s = sub.add_parser("merge-folders", help="Merge [ID]_Title folders split by a title change")
+    s.add_argument("root", nargs="?", help="Folder containing the [ID]_Title folders (default: watch folder)")
+    s.add_argument("--id", dest="ids", action="append", help="Only this record ID (repeatable)")
+    s.add_argument("--apply", action="store_true", help="Move files (default: dry run)")
+
+    s = sub.add_parser("retention", help="Reclaim space in old [ID]_Title folders (extracted trees kept next to their ZIP)")
+    s.add_argument("roots", nargs="*", help="Folders containing the [ID]_Title folders (default: watch roots)")
+    s.add_argument("--days", type=float, help="only folders untouched for this many days (default: retention_days)")
+    s.add_argument("--repack", action="store_true", help="also pack loose trees without a ZIP into one")
+    s.add_argument("--apply", action="store_true", help="Delete/repack (default: dry run with the reclaimable space)")
+
+    s = sub.add_parser("dedup", help="Hardlink store for files duplicated across record folders")
+    s.add_argument("action", choices=("stats", "scan", "gc", "rehydrate"),
+                   help="report savings, deduplicate existing folders, drop unused objects, "
+                        "or turn a folder's links back into independent copies")
+    s.add_argument("path", help="Folder containing the [ID]_Title folders, only those are scanned "
+                                "(for rehydrate: the folder to copy)")
+
+    s = sub.add_parser("manifest", help="Show what was filed into a record folder, and from where")
+    s.add_argument("folder", help="an [ID]_Title folder")
+    s.add_argument("name", nargs="?", help="only entries for this file or tree name")
+    s.add_argument("-v", "--verbose", action="store_true", help="also show source, URL, digest and context")
+
+    s = sub.add_parser("diagnose", help="Capture a diagnostics bundle from the running organizer")
+    s.add_argument("action", choices=("stacks", "profile", "memory", "memory-stop", "trace-start", "trace-stop"),
+                   help="thread stacks, CPU profile, memory snapshot/diff, stop memory tracing, "
+                        "or start/stop recording an event trace for bench.replay")
+    s.add_argument("--seconds", type=float, default=10.0, help="profile duration (at most 600)")
+    s.add_argument("--mode", choices=("sampling", "cprofile"), default="sampling")
+    return p
+
+
+def run_cli(argv):
+    attach_console()
+    args = build_parser().parse_args(argv)
+    return COMMANDS[args.command](args)
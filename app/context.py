@@ -1,5 +1,6 @@
 from threading import Lock
 import time
+from app.metrics import Metrics
 
 class ContextManager:
     _instance = None
@@ -13,6 +14,9 @@ class ContextManager:
                     cls._instance.current_data = {}
                     cls._instance.observers = []
                     cls._instance.last_heartbeat = 0
+                    cls._instance.updated = 0 # Wall time the current context was set (kept across restores)
+                    # Bumped on every change; lets caches key on "same context as before"
+                    cls._instance.version = 0
         return cls._instance
 
     def update_context(self, data):
@@ -84,16 +88,39 @@ class ContextManager:
             data['folder_name'] = f"[{id_part}]_{clean_title}"
             
             self.current_data = data
+            self.version += 1
             self.last_heartbeat = time.time()
+            self.updated = self.last_heartbeat
+            Metrics().context_updated()
             self.notify_observers()
 
     def get_context(self):
         with self._lock:
             return self.current_data.copy()
 
+    def restore(self, data, updated):
+        """
+        Reinstates a context saved by WarmState (already normalized, folder_name included)
+        with its original update time, so it ages across restarts.
+        last_heartbeat stays as it is: a restored context is not a live link.
+        """
+        with self._lock:
+            if self.current_data or not data.get('folder_name'):
+                return False # A live update arrived first
+            self.current_data = dict(data)
+            self.version += 1
+            self.updated = updated
+            Metrics().context_updated()
+            self.notify_observers()
+            return True
+
     def add_observer(self, callback):
         self.observers.append(callback)
 
+    def remove_observer(self, callback):
+        if callback in self.observers:
+            self.observers.remove(callback)
+
     def notify_observers(self):
         for callback in self.observers:
             try:
@@ -107,5 +134,8 @@ class ContextManager:
             # Only notify if there WAS data to clear to avoid spamming
             if self.current_data:
                 self.current_data = {}
+                self.version += 1
                 self.last_heartbeat = time.time()
+                self.updated = self.last_heartbeat
+                Metrics().context_updated()
                 self.notify_observers()
@@ -0,0 +1,345 @@
+import errno
+import hashlib
+import os
+import queue
+import shutil
+import sqlite3
+import stat
+import threading
+
+from app.folder_map import record_id_of
+from app.locks import path_key
+
+STORE_DIR = ".plm_store"
+CHUNK_SIZE = 1024 * 1024
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (hash TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER, ctime_ns INTEGER);
+CREATE INDEX IF NOT EXISTS idx_objects_size ON objects(size);
+CREATE TABLE IF NOT EXISTS candidates (path TEXT PRIMARY KEY, size INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS idx_candidates_size ON candidates(size);
+"""
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return digest.hexdigest()
+            digest.update(chunk)
+
+
+def record_base(path):
+    """The folder holding the [ID]_Title folder that contains path (None outside record folders)."""
+    parent = os.path.dirname(os.path.abspath(path))
+    while parent and parent != os.path.dirname(parent):
+        if record_id_of(os.path.basename(parent)):
+            return os.path.dirname(parent)
+        parent = os.path.dirname(parent)
+    return None
+
+
+class DedupStore:
+    """
+    Content-addressed store on one volume (<base>/.plm_store): every file is
+    kept once as objects/<hash[:2]>/<hash> and hardlinked into each record
+    folder that has a copy.
+    - Size-bucketed lookup: a file is only hashed when an object or an
+      earlier file ("candidate") has exactly its size; a unique size costs
+      one indexed query.
+    - Files are replaced by a link through a temp name + os.replace, so a
+      record folder never misses the file.
+    - An object is the same inode as its linked copies, so editing one copy
+      in place edits the object: its size and timestamps are recorded and
+      checked before linking, and an object that changed is retired (the
+      new file becomes the object) instead of being linked to.
+    Not thread-safe: DedupService uses one worker thread; the CLI one store.
+    """
+    def __init__(self, base):
+        self.base = base
+        self.root = os.path.join(base, STORE_DIR)
+        os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+        if os.name == "nt":
+            try:
+                import ctypes
+                ctypes.windll.kernel32.SetFileAttributesW(self.root, 0x2) # FILE_ATTRIBUTE_HIDDEN
+            except Exception:
+                pass
+        self._probe_links()
+        self.conn = sqlite3.connect(os.path.join(self.root, "index.db"))
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(objects)")}
+        for column in ("mtime_ns", "ctime_ns"):
+            if column not in columns: # Store created before stamps were kept: verified on first use
+                self.conn.execute(f"ALTER TABLE objects ADD COLUMN {column} INTEGER")
+
+    def _probe_links(self):
+        """Raises OSError if the volume cannot hardlink (FAT, some network shares)."""
+        probe = os.path.join(self.root, "probe")
+        with open(probe, "wb"):
+            pass
+        try:
+            os.link(probe, probe + ".link")
+            os.remove(probe + ".link")
+        finally:
+            os.remove(probe)
+
+    def object_path(self, digest):
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def _ingest(self, path, digest, size):
+        """Makes path the store's object for digest (a hardlink, no copy), retiring a changed one."""
+        target = self.object_path(digest)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.lexists(target):
+            os.remove(target) # The edited inode stays with the copies that share it
+        os.link(path, target)
+        st = os.stat(target)
+        self.conn.execute("INSERT OR REPLACE INTO objects (hash, size, mtime_ns, ctime_ns) VALUES (?, ?, ?, ?)",
+                          (digest, size, st.st_mtime_ns, st.st_ctime_ns))
+
+    def _stamp(self, digest):
+        st = os.stat(self.object_path(digest))
+        self.conn.execute("UPDATE objects SET mtime_ns = ?, ctime_ns = ? WHERE hash = ?",
+                          (st.st_mtime_ns, st.st_ctime_ns, digest))
+
+    def _is_current(self, digest, st):
+        """
+        True if the object (st: its stat) still holds digest's content.
+        Same size and timestamps as recorded: unchanged. Another size: edited.
+        Other timestamps only (a copy was touched, or linked/unlinked outside
+        the store): the object is hashed again to decide.
+        """
+        row = self.conn.execute("SELECT size, mtime_ns, ctime_ns FROM objects WHERE hash = ?", (digest,)).fetchone()
+        if row is None or st.st_size != row[0]:
+            return False
+        if (st.st_mtime_ns, st.st_ctime_ns) == (row[1], row[2]):
+            return True
+        if file_hash(self.object_path(digest)) != digest:
+            return False
+        self._stamp(digest)
+        return True
+
+    def _link(self, path, digest, size):
+        """
+        Replaces path by a hardlink to the object. Returns True if it was a
+        separate copy. If the object no longer holds digest's content, path
+        becomes the object instead (and stays a separate copy).
+        """
+        target = self.object_path(digest)
+        try:
+            st = os.stat(target)
+        except FileNotFoundError:
+            st = None # Deleted from the store by hand
+        if st is not None and os.path.samestat(os.stat(path), st):
+            return False
+        if st is None or not self._is_current(digest, st):
+            print(f"Dedup: stored copy of {os.path.basename(path)} was changed, {path} replaces it")
+            self._ingest(path, digest, size)
+            return False
+        temp = path + ".plmlink"
+        try:
+            os.link(target, temp)
+        except OSError as e:
+            if e.errno == errno.EMLINK:
+                return False # Link limit of the object reached (1023 on NTFS): keep the copy
+            raise
+        try:
+            shutil.copystat(path, temp) # Keeps the copy's timestamps (shared by every link)
+        except OSError:
+            pass
+        os.replace(temp, path)
+        self._stamp(digest) # Linking and copystat moved the object's own timestamps
+        return True
+
+    def add(self, path, digest=None):
+        """
+        Deduplicates one file. digest: its SHA-256 if already known (from a
+        verified copy). Returns the bytes saved (0 if it stays a separate copy).
+        """
+        st = os.stat(path)
+        size = st.st_size
+        if st.st_nlink > 1:
+            return 0 # Already linked (into the store or by the user)
+        objects = [h for (h,) in self.conn.execute("SELECT hash FROM objects WHERE size = ?", (size,))]
+        candidates = [p for (p,) in self.conn.execute("SELECT path FROM candidates WHERE size = ? AND path != ?",
+                                                      (size, path))]
+        if not objects and not candidates:
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO candidates (path, size) VALUES (?, ?)", (path, size))
+            return 0
+
+        saved = 0
+        with self.conn:
+            # Same size as something seen before: now (and only now) hash both sides
+            for candidate in candidates:
+                self.conn.execute("DELETE FROM candidates WHERE path = ?", (candidate,))
+                try:
+                    if os.path.getsize(candidate) != size or os.stat(candidate).st_nlink > 1:
+                        continue
+                    known = file_hash(candidate)
+                except OSError:
+                    continue # Moved or deleted since
+                if known in objects:
+                    saved += size if self._link(candidate, known, size) else 0
+                else:
+                    self._ingest(candidate, known, size)
+                    objects.append(known)
+
+            digest = digest or file_hash(path)
+            if digest in objects:
+                saved += size if self._link(path, digest, size) else 0
+            else:
+                self._ingest(path, digest, size)
+        return saved
+
+    def stats(self):
+        """Objects, linked copies and bytes saved (from the objects' link counts)."""
+        objects = copies = stored = saved = orphans = 0
+        for digest, size in self.conn.execute("SELECT hash, size FROM objects").fetchall():
+            try:
+                links = os.stat(self.object_path(digest)).st_nlink - 1 # Minus the object itself
+            except OSError:
+                continue
+            objects += 1
+            stored += size
+            copies += links
+            saved += max(0, links - 1) * size
+            orphans += links == 0
+        return {"objects": objects, "copies": copies, "stored_bytes": stored, "saved_bytes": saved,
+                "orphans": orphans}
+
+    def gc(self):
+        """Drops objects no record folder links to any more. Returns the bytes freed."""
+        freed = 0
+        with self.conn:
+            for digest, size in self.conn.execute("SELECT hash, size FROM objects").fetchall():
+                target = self.object_path(digest)
+                try:
+                    if os.stat(target).st_nlink > 1:
+                        continue
+                    os.remove(target)
+                    freed += size
+                except FileNotFoundError:
+                    pass
+                self.conn.execute("DELETE FROM objects WHERE hash = ?", (digest,))
+            for (path,) in self.conn.execute("SELECT path FROM candidates").fetchall():
+                if not os.path.exists(path):
+                    self.conn.execute("DELETE FROM candidates WHERE path = ?", (path,))
+        return freed
+
+    def close(self):
+        self.conn.close()
+
+
+def rehydrate(folder):
+    """
+    Turns every hardlinked file under folder back into an independent copy
+    (e.g. before editing files in place, or moving the folder to another
+    volume). Returns (files, bytes) copied.
+    """
+    files = copied = 0
+    for dirpath, dirnames, filenames in os.walk(folder):
+        dirnames[:] = [d for d in dirnames if d != STORE_DIR]
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            st = os.stat(path)
+            if st.st_nlink < 2:
+                continue
+            temp = path + ".plmcopy"
+            shutil.copy2(path, temp)
+            os.chmod(temp, stat.S_IMODE(st.st_mode) | stat.S_IWRITE)
+            os.replace(temp, path)
+            files += 1
+            copied += st.st_size
+    return files, copied
+
+
+def deduplicate_tree(store, folder, min_size=0, progress=None):
+    """Adds every file under folder (an [ID]_Title folder or a tree in one) to store. Returns (files, bytes saved)."""
+    files = saved = 0
+    for dirpath, dirnames, filenames in os.walk(folder):
+        dirnames[:] = [d for d in dirnames if d != STORE_DIR]
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                if os.path.getsize(path) < min_size:
+                    continue
+                saved += store.add(path)
+                files += 1
+            except OSError as e:
+                print(f"Dedup: skipped {path}: {e}")
+            if progress is not None:
+                progress(files, saved)
+    return files, saved
+
+
+class DedupService:
+    """
+    Feeds organized files to the DedupStore of their volume, on one
+    background thread at the "dedup" I/O priority (organizing never waits on
+    hashing). A base folder whose volume cannot hardlink gets no store.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    from app.settings import SettingsManager
+                    instance = super(DedupService, cls).__new__(cls)
+                    instance._init(SettingsManager())
+                    cls._instance = instance
+        return cls._instance
+
+    def _init(self, settings):
+        self.min_size = int(settings.get("dedup_min_size_kb", 64)) * 1024
+        self.queue = queue.Queue()
+        self.stores = {} # path_key(base) -> DedupStore, or None when disabled
+        self.saved = 0
+        self.thread = None
+
+    def submit(self, path, sha256=None):
+        """Queues a moved file or folder (cheap; safe from any thread)."""
+        if self.thread is None:
+            with self._lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self._run, name="dedup", daemon=True)
+                    self.thread.start()
+        self.queue.put((path, sha256))
+
+    def _store(self, base):
+        key = path_key(base)
+        if key not in self.stores:
+            try:
+                self.stores[key] = DedupStore(base)
+            except (OSError, sqlite3.Error) as e:
+                print(f"Dedup disabled for {base}: {e}")
+                self.stores[key] = None
+        return self.stores[key]
+
+    def _run(self):
+        from app.iopriority import IoController
+        from app.metrics import Metrics
+        with IoController().stage("dedup"):
+            while True:
+                path, sha256 = self.queue.get()
+                base = record_base(path)
+                store = self._store(base) if base else None
+                if store is None:
+                    continue
+                try:
+                    if os.path.isdir(path):
+                        _, saved = deduplicate_tree(store, path, self.min_size)
+                    elif os.path.getsize(path) >= self.min_size:
+                        saved = store.add(path, sha256)
+                    else:
+                        saved = 0
+                except (OSError, sqlite3.Error) as e:
+                    print(f"Dedup error for {path}: {e}")
+                    continue
+                if saved:
+                    self.saved += saved
+                    Metrics().inc("plmorg_dedup_saved_bytes_total", saved)
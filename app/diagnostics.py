@@ -0,0 +1,372 @@
+import collections
+import cProfile
+import datetime
+import io
+import json
+import os
+import platform
+import pstats
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+import zipfile
+
+from app.utils import format_size
+
+# Frames of interest when summarizing stacks: function name -> locals worth showing
+WAIT_FRAMES = {"wait_for_file_ready": ("file_path", "tracker")}
+MAX_PROFILE_SECONDS = 600
+
+
+class DiagnosticsBundle:
+    """
+    A timestamped folder under <settings_dir>/diagnostics that is zipped on close
+    (attach the .zip to a bug report). Every bundle carries an environment
+    summary and the current metrics.
+    """
+    def __init__(self, kind, root=None):
+        if root is None:
+            from app.settings import SettingsManager
+            root = os.path.join(SettingsManager().settings_dir, "diagnostics")
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.path = os.path.join(root, f"{stamp}-{kind}")
+        counter = 1
+        while os.path.exists(self.path):
+            self.path = os.path.join(root, f"{stamp}-{kind}-{counter}")
+            counter += 1
+        os.makedirs(self.path)
+        self.write("environment.json", json.dumps(environment(), indent=2))
+        try:
+            from app.metrics import Metrics
+            self.write("metrics.txt", Metrics().render())
+        except Exception as e:
+            self.write("metrics.txt", f"unavailable: {e}")
+
+    def write(self, name, text):
+        with open(os.path.join(self.path, name), "w", encoding="utf-8") as f:
+            f.write(text)
+        return os.path.join(self.path, name)
+
+    def close(self):
+        """Zips the bundle folder; returns the .zip path."""
+        archive = self.path + ".zip"
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            for name in sorted(os.listdir(self.path)):
+                zf.write(os.path.join(self.path, name), os.path.join(os.path.basename(self.path), name))
+        print(f"Diagnostics bundle: {archive}")
+        return archive
+
+
+def environment():
+    info = {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version,
+        "platform": platform.platform(),
+        "executable": sys.executable,
+        "frozen": bool(getattr(sys, "frozen", False)),
+        "threads": threading.active_count(),
+    }
+    try:
+        import psutil
+        process = psutil.Process()
+        info["rss_mb"] = round(process.memory_info().rss / 1048576, 1)
+        info["cpu_count"] = psutil.cpu_count()
+    except Exception:
+        pass
+    try:
+        from app.settings import SettingsManager
+        info["settings"] = dict(SettingsManager().data)
+    except Exception:
+        pass
+    return info
+
+
+# --- Thread stacks ----------------------------------------------------------
+
+def format_stacks():
+    """
+    All thread stacks, plus a summary of the threads waiting for downloads to
+    settle (which file, how far the stability check got).
+    """
+    names = {t.ident: t.name for t in threading.enumerate()}
+    waiting, sections = [], []
+    for ident, frame in sys._current_frames().items():
+        name = names.get(ident, f"thread-{ident}")
+        sections.append(f"--- {name} ({ident}) ---\n" + "".join(traceback.format_stack(frame)))
+        f = frame
+        while f is not None:
+            wanted = WAIT_FRAMES.get(f.f_code.co_name)
+            if wanted:
+                state = ", ".join(f"{k}={f.f_locals[k]!r}" for k in wanted if k in f.f_locals)
+                waiting.append(f"  {name}: {f.f_code.co_name}({state}) at line {f.f_lineno}, "
+                               f"now in {frame.f_code.co_name}")
+                break
+            f = f.f_back
+
+    header = [f"{len(sections)} threads, {len(waiting)} waiting for downloads to settle"]
+    return "\n".join(header + waiting) + "\n\n" + "\n".join(sections)
+
+
+def dump_stacks():
+    bundle = DiagnosticsBundle("stacks")
+    bundle.write("stacks.txt", format_stacks())
+    return bundle.close()
+
+
+# --- Profiling --------------------------------------------------------------
+
+class SamplingProfiler:
+    """
+    Samples every thread's stack with sys._current_frames() every 'interval'
+    seconds from its own thread. Nothing is hooked into the sampled threads.
+    """
+    def __init__(self, interval=0.005, skip=None):
+        self.interval = interval
+        self.skip = skip # Optional skip(thread name) -> True for threads left out
+        self.stacks = collections.Counter() # (thread name, frames...) -> samples
+        self.samples = 0
+
+    def run(self, seconds, stop_event):
+        me = threading.get_ident()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline and not stop_event.is_set():
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me or (self.skip is not None and self.skip(names.get(ident, "?"))):
+                    continue
+                frames = []
+                while frame is not None:
+                    code = frame.f_code
+                    frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.stacks[(_thread_group(names.get(ident, "?")),) + tuple(reversed(frames))] += 1
+            self.samples += 1
+            time.sleep(self.interval)
+
+    def report(self):
+        """(top-functions text, folded stacks for flame graph tools)."""
+        own, total = collections.Counter(), collections.Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for frame in set(stack[1:]):
+                total[frame] += count
+        all_samples = sum(self.stacks.values()) or 1
+        lines = [f"{self.samples} sampling rounds, {all_samples} thread samples, interval {self.interval * 1000:.0f} ms",
+                 "", "Self time (top 40):"]
+        lines += [f"  {100 * c / all_samples:5.1f}%  {frame}" for frame, c in own.most_common(40)]
+        lines += ["", "Inclusive time (top 40):"]
+        lines += [f"  {100 * c / all_samples:5.1f}%  {frame}" for frame, c in total.most_common(40)]
+        folded = "\n".join(f"{';'.join(stack)} {count}" for stack, count in self.stacks.most_common())
+        return "\n".join(lines) + "\n", folded + "\n"
+
+
+def _thread_group(name):
+    """'quick-worker-3' -> 'quick-worker', 'Thread-12 (process)' -> 'Thread (process)'."""
+    head, _, tail = name.partition(" ")
+    head = head.rstrip("0123456789").rstrip("-")
+    return f"{head} {tail}".strip()
+
+
+class ThreadProfiles:
+    """
+    cProfile for all worker threads, merged on stop.
+    - Python 3.12+: cProfile runs on sys.monitoring, which covers every thread.
+    - Before that a Profile only sees its own thread and can only be switched
+      off from it: scheduler lane workers get one per job via Lane.job_hook
+      (enabled and disabled inside the job), every other thread (per-file
+      readiness threads) is sampled with sys._current_frames() instead, so
+      nothing stays hooked once the capture ends.
+    """
+    GLOBAL = sys.version_info >= (3, 12)
+
+    def __init__(self, interval=0.005):
+        self.profiles = []
+        self.lock = threading.Lock()
+        self.sampler = None if self.GLOBAL else SamplingProfiler(interval, skip=_is_lane_worker)
+        self.sampling_done = threading.Event()
+        self.sampling_thread = None
+
+    def start(self):
+        if self.GLOBAL:
+            self.new_profile().enable()
+            return
+        from app.scheduler import Lane
+        Lane.job_hook = self.run_job
+        self.sampling_thread = threading.Thread(target=self.sampler.run, args=(float("inf"), self.sampling_done),
+                                                name="diagnostics-sampler", daemon=True)
+        self.sampling_thread.start()
+
+    def stop(self):
+        if self.GLOBAL:
+            self.profiles[0].disable()
+            return
+        from app.scheduler import Lane
+        Lane.job_hook = None
+        self.sampling_done.set()
+        self.sampling_thread.join()
+
+    def new_profile(self):
+        profile = cProfile.Profile()
+        with self.lock:
+            self.profiles.append(profile)
+        return profile
+
+    def run_job(self, job):
+        profile = self.new_profile()
+        profile.enable()
+        try:
+            job()
+        finally:
+            profile.disable()
+
+    def report(self):
+        """(top-functions text, merged pstats.Stats), or (message, None) without data."""
+        stats = None
+        with self.lock:
+            profiles = list(self.profiles)
+        for profile in profiles:
+            profile.create_stats()
+            if not profile.stats:
+                continue
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+        sampled = ""
+        if self.sampler is not None and self.sampler.stacks:
+            sampled = "\nThreads outside the scheduler lanes (sampled):\n" + self.sampler.report()[0]
+        if stats is None:
+            return "No worker activity was profiled (no downloads during the window).\n" + sampled, None
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(50)
+        stats.sort_stats("tottime").print_stats(30)
+        return f"{len(profiles)} thread profile(s) merged\n" + out.getvalue() + sampled, stats
+
+
+def _is_lane_worker(name):
+    """Scheduler lane threads are named '<lane>-worker-<n>' (see Lane.start)."""
+    return "-worker-" in name
+
+
+class Diagnostics:
+    """
+    Entry point for the GUI menu and the loopback endpoint (CLI).
+    Nothing runs or is hooked until a capture is requested, so there is no
+    overhead when diagnostics are off.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    instance = super(Diagnostics, cls).__new__(cls)
+                    instance.busy = threading.Lock()
+                    instance.stop_event = threading.Event()
+                    instance.memory_snapshot = None
+                    instance.memory_bundle = None
+                    cls._instance = instance
+        return cls._instance
+
+    def profile(self, seconds=10.0, mode="sampling"):
+        """
+        Profiles all threads for 'seconds' and returns the bundle .zip path
+        (None if another profile is running). Blocks; call it off the GUI thread.
+        """
+        if mode not in ("sampling", "cprofile"):
+            raise ValueError(f"Unknown profile mode: {mode}")
+        if not self.busy.acquire(blocking=False):
+            print("A profile is already running.")
+            return None
+        try:
+            self.stop_event.clear()
+            bundle = DiagnosticsBundle(f"profile-{mode}")
+            print(f"Profiling all threads for {seconds:g}s ({mode})...")
+            if mode == "sampling":
+                profiler = SamplingProfiler()
+                profiler.run(seconds, self.stop_event)
+                text, folded = profiler.report()
+                bundle.write("profile.txt", text)
+                bundle.write("stacks.folded", folded)
+            else:
+                profiles = ThreadProfiles()
+                profiles.start()
+                try:
+                    self.stop_event.wait(seconds)
+                finally:
+                    profiles.stop()
+                text, stats = profiles.report()
+                bundle.write("profile.txt", text)
+                if stats is not None:
+                    stats.dump_stats(os.path.join(bundle.path, "profile.pstats"))
+            bundle.write("stacks.txt", format_stacks())
+            return bundle.close()
+        finally:
+            self.busy.release()
+
+    def stop_profile(self):
+        self.stop_event.set()
+
+    def snapshot_memory(self):
+        """
+        First call starts tracemalloc (baseline snapshot); each later call
+        diffs against the previous snapshot. Returns the bundle .zip path.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+            self.memory_snapshot = tracemalloc.take_snapshot()
+            print("Memory tracing started (baseline taken). Take another snapshot to see what grew.")
+            return None
+
+        snapshot = tracemalloc.take_snapshot()
+        snapshot = snapshot.filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"Traced: {format_size(current)} (peak {format_size(peak)})", "", "Top growth by line:"]
+        lines += [f"  {stat}" for stat in snapshot.compare_to(self.memory_snapshot, "lineno")[:30]]
+        lines += ["", "Top growth by call stack (5 largest):"]
+        for stat in snapshot.compare_to(self.memory_snapshot, "traceback")[:5]:
+            lines.append(f"  {stat.size_diff / 1024:+.1f} KiB in {stat.count_diff:+d} blocks")
+            lines += [f"    {line}" for line in stat.traceback.format()]
+        lines += ["", "Largest allocations now:"]
+        lines += [f"  {stat}" for stat in snapshot.statistics("lineno")[:20]]
+        self.memory_snapshot = snapshot
+
+        bundle = DiagnosticsBundle("memory")
+        bundle.write("memory_diff.txt", "\n".join(lines) + "\n")
+        return bundle.close()
+
+    def stop_memory(self):
+        """Stops tracemalloc (it slows allocations while on)."""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            print("Memory tracing stopped.")
+        self.memory_snapshot = None
+
+    def run(self, action, seconds=10.0, mode="sampling"):
+        """Dispatch used by the loopback endpoint: returns (bundle path or None, message)."""
+        if action == "stacks":
+            return dump_stacks(), "Thread stacks dumped."
+        if action == "profile":
+            if not seconds > 0:
+                raise ValueError("seconds must be positive")
+            path = self.profile(min(seconds, MAX_PROFILE_SECONDS), mode)
+            return path, "Profile finished." if path else "A profile is already running."
+        if action == "memory":
+            path = self.snapshot_memory()
+            return path, "Memory diff written." if path else "Memory tracing started (baseline)."
+        if action == "memory-stop":
+            self.stop_memory()
+            return None, "Memory tracing stopped."
+        if action == "trace-start":
+            from app.trace import TraceRecorder
+            recorder = TraceRecorder.start()
+            return recorder.path, "Event trace recording (replay it with bench.replay)."
+        if action == "trace-stop":
+            from app.trace import TraceRecorder
+            path = TraceRecorder.stop()
+            return path, "Event trace saved." if path else "No event trace was recording."
+        raise ValueError(f"Unknown diagnostics action: {action}")
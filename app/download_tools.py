@@ -0,0 +1,176 @@
+import fnmatch
+import os
+import re
+import threading
+
+
+class DownloadTool:
+    """
+    How one download tool writes files.
+    - temp: name globs of its temporary artifacts (never organized).
+    - segments: regex for temporary artifacts whose group 'final' is the name
+      the artifact will end up as (segments of a multipart transfer, or the
+      .part of a pre-created placeholder). While any artifact of a group is
+      on disk, its final file is not finished.
+    Renaming a temp artifact to a normal name is the tool's final rename.
+    """
+    def __init__(self, name, temp, segments=None):
+        self.name = name
+        self.temp = list(temp)
+        self.segments = re.compile(segments, re.IGNORECASE) if segments else None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["name"], data.get("temp", []), data.get("segments"))
+
+
+BUILTIN_TOOLS = [
+    DownloadTool("chromium", ["*.crdownload"], r"^(?P<final>.+)\.crdownload$"),
+    # Firefox pre-creates NAME (0 bytes) next to NAME.part, then replaces it
+    DownloadTool("firefox", ["*.part"], r"^(?P<final>.+)\.part$"),
+    DownloadTool("safari", ["*.download"], r"^(?P<final>.+)\.download$"),
+    # Innorix: NAME.irx, or one NAME.irx.<n> per segment, merged into NAME
+    DownloadTool("innorix", ["*.irx"], r"^(?P<final>.+)\.irx(?:\.\d+)?$"),
+    # NAME.part1, NAME.part02 (not "x.part1.rar", that is a finished volume)
+    DownloadTool("multipart", ["*.partial"], r"^(?P<final>.+)\.part(?:ial|\d+)$"),
+    DownloadTool("generic", ["*.tmp"]),
+]
+
+
+class DownloadIntake:
+    """
+    Filters raw watcher events before any thread or stat work:
+    - temp artifacts of every known tool are dropped (one regex match),
+    - a final file whose group still has artifacts on disk is held and
+      released once, when the last one is renamed or deleted (or after
+      'hold_seconds' if the tool leaves them behind),
+    - a path already being verified is not started again.
+    The handler calls begin()/end() around its verification of a path.
+    """
+    def __init__(self, tools, hold_seconds=600.0):
+        self.tools = list(tools)
+        self.hold_seconds = hold_seconds
+        self.temp_re = re.compile("|".join(fnmatch.translate(p) for t in self.tools for p in t.temp) or r"(?!)",
+                                  re.IGNORECASE)
+        self.lock = threading.Lock()
+        self.groups = {} # (folder, final name) -> set of artifact names on disk
+        self.held = {} # (folder, final name) -> (path, timer)
+        self.in_flight = {} # path -> True if another event arrived meanwhile
+
+    @classmethod
+    def from_settings(cls, settings):
+        tools = []
+        for data in settings.get("download_tools", []):
+            try:
+                tools.append(DownloadTool.from_dict(data))
+            except (KeyError, TypeError, re.error) as e:
+                print(f"Ignoring invalid download tool {data!r}: {e}")
+        return cls(tools + BUILTIN_TOOLS, float(settings.get("download_tool_hold_seconds", 600.0)))
+
+    def is_temp(self, name):
+        if self.temp_re.match(name) is not None:
+            return True
+        return any(t.segments is not None and t.segments.match(name) for t in self.tools)
+
+    def _final_key(self, folder, name):
+        for tool in self.tools:
+            if tool.segments is not None:
+                match = tool.segments.match(name)
+                if match:
+                    return folder, match.group("final").lower()
+        return None
+
+    def on_event(self, event):
+        """Returns the path to verify for this event, or None."""
+        kind = event.event_type
+        if event.is_directory or kind not in ("created", "moved", "deleted"):
+            return None
+        folder, name = os.path.split(event.src_path)
+        released = None
+        if self.is_temp(name):
+            key = self._final_key(folder, name)
+            with self.lock:
+                group = self.groups.get(key) if key else None
+                if kind == "created" and key:
+                    self.groups.setdefault(key, set()).add(name)
+                elif group is not None:
+                    group.discard(name)
+                    if not group:
+                        del self.groups[key]
+                        released = self._release(key)
+            if kind != "moved":
+                return released
+            # Final rename: NAME.crdownload -> NAME
+            dest = event.dest_path
+            dest_folder, dest_name = os.path.split(dest)
+            if self.is_temp(dest_name):
+                dest_key = self._final_key(dest_folder, dest_name)
+                if dest_key:
+                    with self.lock:
+                        self.groups.setdefault(dest_key, set()).add(dest_name)
+                return released
+            return self._finalized(dest, dest_folder, dest_name, released)
+
+        if kind == "deleted":
+            return None
+        path = event.dest_path if kind == "moved" else event.src_path
+        folder, name = os.path.split(path)
+        if self.is_temp(name):
+            return None # Renamed back into a temp name
+        return self._finalized(path, folder, name, None)
+
+    def _finalized(self, path, folder, name, released):
+        key = (folder, name.lower())
+        with self.lock:
+            if key in self.groups:
+                # Artifacts of this file are still on disk: the tool is not done
+                if key not in self.held:
+                    timer = threading.Timer(self.hold_seconds, self._expire, args=(key,))
+                    timer.daemon = True
+                    self.held[key] = (path, timer)
+                    timer.start()
+                return released
+            held = self.held.pop(key, None)
+        if held is not None:
+            held[1].cancel()
+        if released is not None and released != path:
+            # Rare: a different file was released by the same event
+            threading.Thread(target=self.on_release, args=(released,), daemon=True).start()
+        return path
+
+    def _release(self, key):
+        """Caller holds the lock."""
+        held = self.held.pop(key, None)
+        if held is None:
+            return None
+        held[1].cancel()
+        return held[0]
+
+    def _expire(self, key):
+        with self.lock:
+            held = self.held.pop(key, None)
+            self.groups.pop(key, None)
+        if held is not None:
+            print(f"Download tool left temp files behind, processing {os.path.basename(held[0])} anyway.")
+            self.on_release(held[0])
+
+    def on_release(self, path):
+        """Set by the handler: verify a path released outside of an event."""
+
+    def held_count(self):
+        with self.lock:
+            return len(self.held)
+
+    def begin(self, path):
+        """False if path is already being verified (the event is merged into that run)."""
+        with self.lock:
+            if path in self.in_flight:
+                self.in_flight[path] = True
+                return False
+            self.in_flight[path] = False
+            return True
+
+    def end(self, path):
+        """Ends a verification; True if events arrived meanwhile (the caller may run it again)."""
+        with self.lock:
+            return self.in_flight.pop(path, False)
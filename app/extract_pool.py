@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from app.integrity import extract_member
+
+
+def shard_members(infos, shards):
+    """
+    Splits members into at most 'shards' contiguous index ranges of roughly
+    equal uncompressed size (contiguous ranges keep each worker's reads of
+    the archive sequential). Returns a list of ZipInfo lists.
+    """
+    infos = [i for i in infos if not i.is_dir()]
+    if not infos:
+        return []
+    shards = max(1, min(shards, len(infos)))
+    total = sum(max(1, i.file_size) for i in infos)
+    target = total / shards
+
+    ranges, current, acc = [], [], 0
+    for info in infos:
+        current.append(info)
+        acc += max(1, info.file_size)
+        if acc >= target * (len(ranges) + 1) and len(ranges) < shards - 1:
+            ranges.append(current)
+            current = []
+    if current:
+        ranges.append(current)
+    return ranges
+
+
+def _long_path(path):
+    # zipfile has no MAX_PATH workaround ('tar' did that for us); use the \\?\ prefix.
+    path = os.path.abspath(path)
+    if os.name == 'nt' and not path.startswith('\\\\?\\'):
+        return '\\\\?\\' + path
+    return path
+
+
+def _extract_range(zip_path, extract_path, names, progress, cancel, shard_id):
+    """
+    Worker process entry point: extracts one member range, each member
+    verified in the same pass (IntegrityError is re-raised by f.result()).
+    Reports (shard_id, bytes) after every member; stops between members
+    once 'cancel' is set. Returns (members_done, bytes_done, cancelled).
+    """
+    done, written = 0, 0
+    with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+        for name in names:
+            if cancel is not None and cancel.is_set():
+                return done, written, True
+            info = zip_ref.getinfo(name)
+            extract_member(zip_ref, info, _long_path(extract_path))
+            done += 1
+            written += info.file_size
+            if progress is not None:
+                progress.put((shard_id, info.file_size))
+    return done, written, False
+
+
+class ExtractionJob:
+    """Handle for one archive being extracted by the pool."""
+    def __init__(self, zip_path, total_bytes, cancel_event):
+        self.zip_path = zip_path
+        self.total_bytes = total_bytes
+        self.done_bytes = 0
+        self.cancelled = False
+        self._cancel_event = cancel_event
+
+    def cancel(self):
+        self.cancelled = True
+        self._cancel_event.set()
+
+
+class ProcessPoolExtractor:
+    """
+    Optional extraction backend: inflates one archive across several worker
+    processes (deflate holds the GIL, so threads cannot use more than ~1 core,
+    and the GUI thread starves). The pool is created on first use and reused.
+    """
+    def __init__(self, workers=0):
+        self.workers = workers or os.cpu_count() or 1
+        self._executor = None
+        self._manager = None
+        self._jobs = set()
+        self._lock = threading.Lock()
+
+    def _ensure_pool(self):
+        with self._lock:
+            if self._executor is None:
+                import multiprocessing
+                self._manager = multiprocessing.Manager()
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor, self._manager
+
+    def extract(self, zip_path, extract_path, members, progress_callback=None, job_callback=None):
+        """
+        Extracts 'members' (ZipInfo list) of zip_path into extract_path.
+        progress_callback(done_bytes, total_bytes) runs in the calling process.
+        job_callback(job) receives the ExtractionJob right away (for cancel()).
+        Returns True if every member was extracted.
+        """
+        shards = shard_members(members, self.workers)
+        # Directory entries ride along with the first shard (zipfile sanitizes their paths).
+        dirs = [i for i in members if i.is_dir()]
+        if dirs:
+            shards = [dirs + shards[0]] + shards[1:] if shards else [dirs]
+        if not shards:
+            return True
+
+        executor, manager = self._ensure_pool()
+        progress = manager.Queue()
+        cancel_event = manager.Event()
+        job = ExtractionJob(zip_path, sum(i.file_size for s in shards for i in s), cancel_event)
+        if job_callback:
+            job_callback(job)
+
+        with self._lock:
+            self._jobs.add(job)
+        try:
+            if not os.path.exists(extract_path):
+                os.makedirs(extract_path)
+
+            futures = [executor.submit(_extract_range, zip_path, extract_path,
+                                       [i.filename for i in shard], progress, cancel_event, n)
+                       for n, shard in enumerate(shards)]
+
+            # Drain progress in this thread until every shard finished.
+            while True:
+                finished = all(f.done() for f in futures)
+                while not progress.empty():
+                    _, nbytes = progress.get()
+                    job.done_bytes += nbytes
+                    if progress_callback:
+                        progress_callback(job.done_bytes, job.total_bytes)
+                if finished:
+                    break
+                if job.cancelled:
+                    for f in futures:
+                        f.cancel() # Not-yet-started shards never run
+                time.sleep(0.05)
+
+            complete = True
+            for f in futures:
+                if f.cancelled():
+                    complete = False
+                    continue
+                _, _, was_cancelled = f.result() # Re-raises worker errors
+                complete = complete and not was_cancelled
+            return complete and not job.cancelled
+        finally:
+            with self._lock:
+                self._jobs.discard(job)
+
+    def cancel_all(self):
+        with self._lock:
+            jobs = list(self._jobs)
+        for job in jobs:
+            job.cancel()
+
+    def shutdown(self, timeout=None):
+        """
+        Cancels every job and stops the worker processes. Shards stop between
+        members; a worker still busy after timeout is terminated (an exiting
+        app would otherwise leave it running on its own).
+        """
+        self.cancel_all()
+        with self._lock:
+            executor, manager = self._executor, self._manager
+            self._executor = self._manager = None
+        if executor is None:
+            return
+        processes = list((executor._processes or {}).values()) # No public handle to terminate stragglers
+        executor.shutdown(wait=False, cancel_futures=True)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for process in processes:
+            process.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+        manager.shutdown()
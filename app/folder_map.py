@@ -0,0 +1,139 @@
+import json
+import os
+import re
+import threading
+
+from app.locks import path_key
+
+# "[ID]_Title" folder names built by ContextManager ("Unknown" is not a real ID)
+_RECORD_FOLDER = re.compile(r'^\[([^\]]+)\]')
+
+
+def record_id_of(folder_name):
+    match = _RECORD_FOLDER.match(folder_name or "")
+    if not match or match.group(1).lower() == "unknown":
+        return None
+    return match.group(1).upper()
+
+
+class FolderMap:
+    """
+    Persistent record ID -> canonical folder name, per target base folder
+    (folder_map.json next to settings.json). When a record's title is edited,
+    later downloads go to the folder the ID already has instead of a new
+    "[ID]_New_Title" sibling.
+    - Lookups are dict hits. A base folder is listed once, the first time it
+      is seen (seeding from folders organized before the map existed);
+      after that the map is kept current from the organizer's own folders.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    instance = super(FolderMap, cls).__new__(cls)
+                    instance._init()
+                    cls._instance = instance
+        return cls._instance
+
+    def _init(self):
+        from app.settings import SettingsManager
+        self.path = os.path.join(SettingsManager().settings_dir, "folder_map.json")
+        self.bases = {} # path_key(base) -> {record_id: folder_name}
+        self.mutex = threading.Lock()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.bases = json.load(f).get("bases", {})
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Error loading folder map: {e}")
+
+    def save(self):
+        try:
+            temp = self.path + ".tmp"
+            with open(temp, 'w', encoding='utf-8') as f:
+                json.dump({"bases": self.bases}, f, indent=1, ensure_ascii=False)
+            os.replace(temp, self.path)
+        except Exception as e:
+            print(f"Error saving folder map: {e}")
+
+    def _ids(self, base_dir):
+        key = path_key(base_dir)
+        ids = self.bases.get(key)
+        if ids is None:
+            ids = self.bases[key] = self._seed(base_dir)
+            self.save()
+        return ids
+
+    def _seed(self, base_dir):
+        """One listing of base_dir: the oldest folder per ID becomes canonical."""
+        ids, created = {}, {}
+        try:
+            with os.scandir(base_dir) as it:
+                for entry in it:
+                    record_id = record_id_of(entry.name)
+                    if not record_id or not entry.is_dir():
+                        continue
+                    ctime = entry.stat().st_ctime
+                    if record_id not in ids or ctime < created[record_id]:
+                        ids[record_id] = entry.name
+                        created[record_id] = ctime
+        except OSError:
+            pass
+        return ids
+
+    def canonical(self, base_dir, folder_name):
+        """
+        Folder name to use under base_dir for a context whose folder name is
+        folder_name. Returns folder_name itself for new records.
+        """
+        record_id = record_id_of(folder_name)
+        if not record_id:
+            return folder_name
+        with self.mutex:
+            ids = self._ids(base_dir)
+            existing = ids.get(record_id)
+            if existing and existing != folder_name:
+                if os.path.isdir(os.path.join(base_dir, existing)):
+                    return existing
+                # Canonical folder was deleted or renamed by the user: start over.
+                del ids[record_id]
+                self.save()
+            return folder_name
+
+    def remember(self, base_dir, folder_name):
+        record_id = record_id_of(folder_name)
+        if not record_id:
+            return
+        with self.mutex:
+            ids = self._ids(base_dir)
+            if ids.get(record_id) != folder_name:
+                ids[record_id] = folder_name
+                self.save()
+
+    def splits(self, base_dir):
+        """{record_id: (canonical, [other folder names])} for IDs split over several folders."""
+        groups = {}
+        try:
+            with os.scandir(base_dir) as it:
+                for entry in it:
+                    record_id = record_id_of(entry.name)
+                    if record_id and entry.is_dir():
+                        groups.setdefault(record_id, []).append(entry.name)
+        except OSError as e:
+            print(f"Cannot list {base_dir}: {e}")
+            return {}
+        with self.mutex:
+            ids = self._ids(base_dir)
+        result = {}
+        for record_id, names in groups.items():
+            if len(names) < 2:
+                continue
+            canonical = ids.get(record_id)
+            if canonical not in names:
+                canonical = min(names, key=lambda n: os.stat(os.path.join(base_dir, n)).st_ctime)
+            result[record_id] = (canonical, sorted(n for n in names if n != canonical))
+        return result
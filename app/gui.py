@@ -1,10 +1,13 @@
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QLabel, 
-                             QTextEdit, QPushButton, QHBoxLayout, QStatusBar, QFileDialog, QGroupBox, QCheckBox)
+                             QTextEdit, QPushButton, QHBoxLayout, QStatusBar, QFileDialog, QGroupBox, QCheckBox,
+                             QMenu)
 from PyQt6.QtCore import Qt, pyqtSlot, QTimer, pyqtSignal
 from PyQt6.QtGui import QIcon, QPainter, QColor, QFont, QBrush, QPen, QFontMetrics
 from app.context import ContextManager
 from app.settings import SettingsManager
+from app.utils import format_size
 import datetime
+import threading
 import time
 import os
 import win32gui
@@ -31,6 +34,7 @@ class MainWindow(QMainWindow):
     # Signals to bridge background thread -> UI thread
     context_signal = pyqtSignal(dict)
     log_signal = pyqtSignal(str)
+    session_signal = pyqtSignal(dict)
 
     def __init__(self, watcher):
         super().__init__()
@@ -44,6 +48,7 @@ class MainWindow(QMainWindow):
         # Connect signals
         self.context_signal.connect(self.update_status_display)
         self.log_signal.connect(self._log_to_area) # Safe wrapper
+        self.session_signal.connect(self.on_session_processed)
         
         # Add observer to singleton ContextManager
         self.context_manager.add_observer(self.on_context_received)
@@ -55,6 +60,7 @@ class MainWindow(QMainWindow):
         
         if hasattr(self.watcher, 'event_handler'):
             self.watcher.event_handler.organizer.set_callback(self.on_file_processed)
+            self.watcher.event_handler.organizer.set_session_callback(self.session_signal.emit)
             
         # Defer showing the overlay to ensure everything is initialized
         QTimer.singleShot(500, self.delayed_setup)
@@ -288,6 +294,18 @@ class MainWindow(QMainWindow):
         row2_layout = QHBoxLayout()
         row2_layout.addWidget(self.auto_unzip_cb)
         row2_layout.addStretch(1) # Keep it left-aligned
+        self.history_btn = QPushButton("History")
+        self.history_btn.setFixedWidth(80)
+        self.history_btn.clicked.connect(self.show_history)
+        row2_layout.addWidget(self.history_btn)
+        self.search_btn = QPushButton("Search")
+        self.search_btn.setFixedWidth(80)
+        self.search_btn.clicked.connect(self.show_search)
+        row2_layout.addWidget(self.search_btn)
+        self.diagnostics_btn = QPushButton("Diagnostics")
+        self.diagnostics_btn.setFixedWidth(100)
+        self.diagnostics_btn.setMenu(self.build_diagnostics_menu())
+        row2_layout.addWidget(self.diagnostics_btn)
         settings_layout.addLayout(row2_layout)
         
         # Target Folder Styled Field
@@ -336,6 +354,13 @@ class MainWindow(QMainWindow):
         self.status_label.setStyleSheet("background-color: #333; color: #aaa; padding: 10px; border-radius: 8px; border: 1px solid #555; font-weight: bold;") # Unified radius (8px)
         self.status_label.setWordWrap(True)
         context_layout.addWidget(self.status_label)
+
+        # Last download session summary (hidden until the first batch lands)
+        self.session_label = QLabel("")
+        self.session_label.setStyleSheet("color: #aaa; padding: 4px 10px;")
+        self.session_label.setWordWrap(True)
+        self.session_label.hide()
+        context_layout.addWidget(self.session_label)
         
         main_layout.addLayout(context_layout) 
 
@@ -364,6 +389,8 @@ class MainWindow(QMainWindow):
         
         self.log_area = QTextEdit()
         self.log_area.setReadOnly(True)
+        # The full record lives in the History view; keep the live log bounded.
+        self.log_area.document().setMaximumBlockCount(2000)
         log_layout.addWidget(self.log_area)
         
         log_group.setLayout(log_layout)
@@ -453,6 +480,72 @@ class MainWindow(QMainWindow):
         file_name = os.path.basename(dest_path)
         self.log_message(f"✅ Moved: {file_name} -> 📂 {folder_name}")
 
+    @pyqtSlot(dict)
+    def on_session_processed(self, summary):
+        # One line per session; the files themselves are listed in the History view
+        text = (f"📦 Session: {summary['count']} files ({format_size(summary['bytes'])}) -> "
+                f"📂 {summary['folder_name']} in {summary['duration']:.1f}s "
+                f"({format_size(summary['throughput'])}/s)")
+        if summary["failed"]:
+            text += f", {summary['failed']} failed"
+        self.log_message(text)
+        self.session_label.setText(text)
+        self.session_label.show()
+
+    def show_history(self):
+        from app.history_view import HistoryDialog
+        if getattr(self, "history_dialog", None) is None:
+            self.history_dialog = HistoryDialog(self)
+        else:
+            self.history_dialog.apply_filter()
+        self.history_dialog.show()
+        self.history_dialog.raise_()
+
+    def show_search(self):
+        from app.search_view import SearchDialog
+        if getattr(self, "search_dialog", None) is None:
+            self.search_dialog = SearchDialog(self)
+        self.search_dialog.show()
+        self.search_dialog.raise_()
+        self.search_dialog.query_edit.setFocus()
+
+    def build_diagnostics_menu(self):
+        menu = QMenu(self)
+        menu.addAction("Dump Thread Stacks", lambda: self.run_diagnostics("stacks"))
+        menu.addAction("Profile 30s (Sampling)", lambda: self.run_diagnostics("profile", 30, "sampling"))
+        menu.addAction("Profile 30s (cProfile)", lambda: self.run_diagnostics("profile", 30, "cprofile"))
+        menu.addAction("Stop Profile Early", self.stop_diagnostics_profile)
+        menu.addSeparator()
+        menu.addAction("Memory Snapshot / Diff", lambda: self.run_diagnostics("memory"))
+        menu.addAction("Stop Memory Tracing", lambda: self.run_diagnostics("memory-stop"))
+        menu.addSeparator()
+        menu.addAction("Record Event Trace", lambda: self.run_diagnostics("trace-start"))
+        menu.addAction("Stop Event Trace", lambda: self.run_diagnostics("trace-stop"))
+        menu.addSeparator()
+        menu.addAction("Open Diagnostics Folder", self.open_diagnostics_folder)
+        return menu
+
+    def run_diagnostics(self, action, seconds=10.0, mode="sampling"):
+        # Captures block (profiles run for 'seconds'): keep them off the GUI thread.
+        from app.diagnostics import Diagnostics
+        def capture():
+            try:
+                bundle, message = Diagnostics().run(action, seconds, mode)
+                print(f"🩺 {message}" + (f" -> {bundle}" if bundle else ""))
+            except Exception as e:
+                print(f"Diagnostics failed: {e}")
+        threading.Thread(target=capture, name="diagnostics", daemon=True).start()
+
+    def stop_diagnostics_profile(self):
+        from app.diagnostics import Diagnostics
+        Diagnostics().stop_profile()
+
+    def open_diagnostics_folder(self):
+        folder = os.path.join(self.settings_manager.settings_dir, "diagnostics")
+        os.makedirs(folder, exist_ok=True)
+        if hasattr(os, "startfile"):
+            os.startfile(folder)
+
     def toggle_monitoring(self):
         if self.monitoring_active:
             self.watcher.stop()
@@ -542,6 +635,12 @@ class MainWindow(QMainWindow):
         rect = self.geometry().getRect() # (x, y, w, h)
         self.settings_manager.set("window_geometry", rect)
         self.log_message(f"Window geometry saved: {rect}")
+        # main() ends with os._exit: write out queued history rows and manifest lines first.
+        organizer = getattr(getattr(self.watcher, 'event_handler', None), 'organizer', None)
+        if organizer is not None:
+            for store in (organizer.history, organizer.search_index, organizer.manifest):
+                if store is not None:
+                    store.flush(timeout=2.0)
         super().closeEvent(event)
 
     def log_message_signal(self, message):
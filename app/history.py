@@ -0,0 +1,164 @@
+import os
+import re
+import threading
+import time
+
+from app.store import BatchedSqliteStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    plm_id TEXT,
+    folder TEXT COLLATE NOCASE,
+    file_name TEXT,
+    dest_path TEXT,
+    size INTEGER,
+    kind TEXT,
+    sha256 TEXT,
+    defect_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_history_ts ON history(ts);
+CREATE INDEX IF NOT EXISTS idx_history_plm ON history(plm_id);
+CREATE INDEX IF NOT EXISTS idx_history_folder ON history(folder);
+"""
+
+COLUMNS = ("id", "ts", "plm_id", "folder", "file_name", "dest_path", "size", "kind")
+_ID_PATTERN = re.compile(r'^\[([^\]]+)\]')
+
+
+class HistoryFilter:
+    """Filter for HistoryStore.query. Empty fields match everything."""
+    def __init__(self, plm_id=None, folder=None, date_from=None, date_to=None):
+        self.plm_id = plm_id.strip().upper() if plm_id and plm_id.strip() else None
+        self.folder = folder.strip() if folder and folder.strip() else None
+        self.date_from = date_from # unix time, inclusive
+        self.date_to = date_to # unix time, exclusive
+
+    def is_empty(self):
+        return not (self.plm_id or self.folder or self.date_from or self.date_to)
+
+
+class HistoryStore(BatchedSqliteStore):
+    """
+    Persistent record of every organized file (history.db next to settings.json).
+    - Workers only enqueue; the writer thread inserts in batches
+      (BatchedSqliteStore), so moves never wait on disk syncs.
+    - Rows are appended in time order, so a date range maps to an id range
+      and every filter is an index range scan (milliseconds at 1M rows).
+    """
+    _instance = None
+    _lock = threading.Lock()
+    writer_name = "history-writer"
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    instance = super(HistoryStore, cls).__new__(cls)
+                    instance._open(cls.default_path(), SCHEMA)
+                    instance._migrate()
+                    cls._instance = instance
+        return cls._instance
+
+    @staticmethod
+    def default_path():
+        from app.settings import SettingsManager
+        return os.path.join(SettingsManager().settings_dir, "history.db")
+
+    def _migrate(self):
+        conn = self._connection()
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(history)")}
+        if "sha256" not in columns:
+            with conn:
+                conn.execute("ALTER TABLE history ADD COLUMN sha256 TEXT")
+        if "defect_id" not in columns:
+            with conn:
+                conn.execute("ALTER TABLE history ADD COLUMN defect_id TEXT")
+        with conn:
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_history_defect ON history(defect_id)")
+
+    # --- Writing ---------------------------------------------------------
+
+    def record(self, dest_path, ts=None, sha256=None, record=None):
+        """
+        Queues one organized file or folder (cheap; safe from any thread).
+        sha256: digest computed while the file was copied (integrity_sha256).
+        record: the route's PLM record (plm_id / defect_id). Without one the ID
+        is read from the folder's [...] prefix, which holds the defect ID when
+        the record has one.
+        """
+        folder = os.path.basename(os.path.dirname(dest_path))
+        if record:
+            plm_id, defect_id = record.get("plm_id"), record.get("defect_id")
+        else:
+            match = _ID_PATTERN.match(folder)
+            plm_id, defect_id = match.group(1) if match else None, None
+        is_dir = os.path.isdir(dest_path)
+        try:
+            size = 0 if is_dir else os.path.getsize(dest_path)
+        except OSError:
+            size = 0
+        self._enqueue([(ts or time.time(), str(plm_id).upper() if plm_id else None, folder,
+                        os.path.basename(dest_path), dest_path, size, "folder" if is_dir else "file", sha256,
+                        str(defect_id).upper() if defect_id else None)])
+
+    def record_rows(self, rows):
+        """Queues pre-built (ts, plm_id, folder, file_name, dest_path, size, kind) rows."""
+        self._enqueue([tuple(row) + (None, None) for row in rows])
+
+    def _write_batch(self, conn, batch):
+        conn.executemany(
+            "INSERT INTO history (ts, plm_id, folder, file_name, dest_path, size, kind, sha256, defect_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+
+    # --- Reading ---------------------------------------------------------
+
+    def _id_bounds(self, conn, f):
+        """Translates the date range to an id range with two index seeks."""
+        lo, hi = None, None
+        if f.date_from:
+            row = conn.execute("SELECT id FROM history WHERE ts >= ? ORDER BY ts LIMIT 1", (f.date_from,)).fetchone()
+            lo = row[0] if row else -1 # Nothing that recent: empty result
+        if f.date_to:
+            row = conn.execute("SELECT id FROM history WHERE ts < ? ORDER BY ts DESC LIMIT 1", (f.date_to,)).fetchone()
+            hi = row[0] if row else -1
+        if lo == -1 or hi == -1:
+            return 0, -1
+        return lo, hi
+
+    def query(self, history_filter=None, before_id=None, limit=500):
+        """
+        Newest-first page of rows (tuples in COLUMNS order) matching the filter.
+        Pass the last id of the previous page as before_id for the next one.
+        """
+        f = history_filter or HistoryFilter()
+        conn = self._connection()
+        where, params = [], []
+        if f.plm_id:
+            # Rows from folder names (bulk imports) may hold a defect ID as plm_id
+            where.append("(plm_id = ? OR defect_id = ?)")
+            params += [f.plm_id, f.plm_id]
+        if f.folder:
+            where.append("folder = ?")
+            params.append(f.folder)
+        if f.date_from or f.date_to:
+            lo, hi = self._id_bounds(conn, f)
+            if lo is not None:
+                where.append("id >= ?")
+                params.append(lo)
+            if hi is not None:
+                where.append("id <= ?")
+                params.append(hi)
+        if before_id is not None:
+            where.append("id < ?")
+            params.append(before_id)
+
+        sql = f"SELECT {', '.join(COLUMNS)} FROM history"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id DESC LIMIT ?"
+        return conn.execute(sql, params + [limit]).fetchall()
+
+    def count(self):
+        return self._connection().execute("SELECT COUNT(*) FROM history").fetchone()[0]
@@ -0,0 +1,185 @@
+import datetime
+import os
+import time
+
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, QDate, QTimer
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLineEdit, QLabel, QTableView,
+                             QCheckBox, QDateEdit, QPushButton, QHeaderView, QAbstractItemView)
+
+from app.history import HistoryStore, HistoryFilter
+from app.utils import format_size
+
+
+class HistoryModel(QAbstractTableModel):
+    """
+    Read-only, lazily fetched view of HistoryStore: Qt asks for more rows
+    (canFetchMore/fetchMore) only as the table scrolls, one page at a time.
+    """
+    HEADERS = ("Time", "PLM ID", "Folder", "File", "Size")
+    PAGE_SIZE = 500
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.filter = HistoryFilter()
+        self.rows = []
+        self.exhausted = False
+        self.last_query_ms = 0.0
+
+    def set_filter(self, history_filter):
+        self.beginResetModel()
+        self.filter = history_filter
+        self.rows = []
+        self.exhausted = False
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def refresh(self):
+        self.set_filter(self.filter)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        _, ts, plm_id, folder, file_name, dest_path, size, kind = row
+        if role == Qt.ItemDataRole.DisplayRole:
+            col = index.column()
+            if col == 0:
+                return datetime.datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S")
+            if col == 1:
+                return plm_id or ""
+            if col == 2:
+                return folder
+            if col == 3:
+                return file_name + ("/" if kind == "folder" else "")
+            if col == 4:
+                return "" if kind == "folder" else format_size(size)
+        elif role == Qt.ItemDataRole.ToolTipRole:
+            return dest_path
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self.exhausted:
+            return
+        before = self.rows[-1][0] if self.rows else None
+        started = time.perf_counter()
+        page = self.store.query(self.filter, before_id=before, limit=self.PAGE_SIZE)
+        self.last_query_ms = (time.perf_counter() - started) * 1000
+        if len(page) < self.PAGE_SIZE:
+            self.exhausted = True
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self.endInsertRows()
+
+    def row_at(self, row):
+        return self.rows[row]
+
+
+class HistoryDialog(QDialog):
+    """Processed-files history with PLM ID / folder / date filters."""
+    def __init__(self, parent=None, store=None):
+        super().__init__(parent)
+        self.setWindowTitle("Processed Files History")
+        self.resize(900, 560)
+        self.model = HistoryModel(store or HistoryStore(), self)
+
+        layout = QVBoxLayout(self)
+        filters = QHBoxLayout()
+        self.plm_edit = QLineEdit()
+        self.plm_edit.setPlaceholderText("PLM ID")
+        self.folder_edit = QLineEdit()
+        self.folder_edit.setPlaceholderText("Folder (exact name)")
+        self.date_cb = QCheckBox("Date")
+        today = QDate.currentDate()
+        self.date_from = QDateEdit(today.addDays(-7))
+        self.date_to = QDateEdit(today)
+        for edit in (self.date_from, self.date_to):
+            edit.setCalendarPopup(True)
+            edit.setDisplayFormat("yyyy-MM-dd")
+        refresh_btn = QPushButton("Refresh")
+        refresh_btn.clicked.connect(self.apply_filter)
+
+        filters.addWidget(self.plm_edit)
+        filters.addWidget(self.folder_edit, 1)
+        filters.addWidget(self.date_cb)
+        filters.addWidget(self.date_from)
+        filters.addWidget(QLabel("~"))
+        filters.addWidget(self.date_to)
+        filters.addWidget(refresh_btn)
+        layout.addLayout(filters)
+
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        # Fixed row heights and column modes: the view never measures every row.
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        header.setStretchLastSection(True)
+        for col, width in enumerate((150, 130, 260, 240)):
+            self.table.setColumnWidth(col, width)
+        self.table.doubleClicked.connect(self.on_double_click)
+        layout.addWidget(self.table, 1)
+
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet("color: #aaa;")
+        layout.addWidget(self.status_label)
+
+        # Debounce typing: query once the user pauses
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(250)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        for signal in (self.plm_edit.textChanged, self.folder_edit.textChanged,
+                       self.date_from.dateChanged, self.date_to.dateChanged, self.date_cb.toggled):
+            signal.connect(lambda *_: self.filter_timer.start())
+        self.model.rowsInserted.connect(self.update_status)
+        self.model.modelReset.connect(self.update_status)
+
+        self.apply_filter()
+
+    def current_filter(self):
+        date_from = date_to = None
+        if self.date_cb.isChecked():
+            start = self.date_from.date()
+            end = self.date_to.date().addDays(1) # Inclusive end date
+            date_from = datetime.datetime(start.year(), start.month(), start.day()).timestamp()
+            date_to = datetime.datetime(end.year(), end.month(), end.day()).timestamp()
+        return HistoryFilter(self.plm_edit.text(), self.folder_edit.text(), date_from, date_to)
+
+    def apply_filter(self):
+        self.model.store.flush(timeout=1.0) # Include rows still in the write queue
+        self.model.set_filter(self.current_filter())
+
+    def update_status(self, *args):
+        more = "+" if self.model.canFetchMore() else ""
+        self.status_label.setText(f"{len(self.model.rows)}{more} rows ({self.model.last_query_ms:.1f} ms)")
+
+    def on_double_click(self, index):
+        # Double-click: filter by that row's PLM ID (or open its folder with Ctrl)
+        row = self.model.row_at(index.row())
+        dest_path = row[5]
+        from PyQt6.QtWidgets import QApplication
+        if QApplication.keyboardModifiers() & Qt.KeyboardModifier.ControlModifier:
+            folder = os.path.dirname(dest_path)
+            if os.path.isdir(folder) and hasattr(os, "startfile"):
+                os.startfile(folder)
+        elif row[2]:
+            self.plm_edit.setText(row[2])
@@ -0,0 +1,137 @@
+import hashlib
+import os
+import shutil
+import zipfile
+
+CHUNK_SIZE = 1024 * 1024
+_INVALID_CHARS = str.maketrans({c: "_" for c in ':<>|"?*'})
+
+
+class IntegrityError(Exception):
+    """Bytes written to the target do not match the source (size or CRC-32)."""
+    def __init__(self, path, expected, actual):
+        super().__init__(path, expected, actual)
+        self.path = path
+        self.expected = expected
+        self.actual = actual
+
+    def __str__(self):
+        return f"Integrity check failed for {self.path}: expected {self.expected}, got {self.actual}"
+
+
+def member_target(info, extract_path):
+    """Target path of a member, sanitized the way ZipFile.extract does it."""
+    arcname = info.filename.replace("/", os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    parts = [p for p in arcname.split(os.path.sep) if p not in ("", os.path.curdir, os.path.pardir)]
+    if os.path.sep == "\\":
+        parts = [p.translate(_INVALID_CHARS).rstrip(".") or "_" for p in parts]
+    return os.path.join(extract_path, *parts)
+
+
+def extract_member(zip_ref, info, extract_path, throttle=None):
+    """
+    Extracts one member in a single streaming pass and verifies it:
+    zipfile checks the CRC-32 of the inflated stream against the central
+    directory as it reads, and the size that reached the target is
+    compared with the directory entry. Raises IntegrityError on mismatch.
+    throttle(nbytes) is called after every chunk (bandwidth limit).
+    Returns the number of bytes written.
+    """
+    target = member_target(info, extract_path)
+    if info.is_dir():
+        os.makedirs(target, exist_ok=True)
+        return 0
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    written = 0
+    try:
+        with zip_ref.open(info) as src, open(target, "wb") as dst:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                dst.write(chunk)
+                written += len(chunk)
+                if throttle is not None:
+                    throttle(len(chunk))
+            dst.flush()
+            on_disk = os.fstat(dst.fileno()).st_size
+    except zipfile.BadZipFile as e:
+        if "CRC" in str(e):
+            raise IntegrityError(target, f"CRC-32 {info.CRC:08x}", "a different CRC-32") from e
+        raise
+    if written != info.file_size or on_disk != info.file_size:
+        raise IntegrityError(target, f"{info.file_size} bytes", f"{on_disk} bytes")
+    return written
+
+
+def extract_verified(zip_path, extract_path, members=None, throttle=None):
+    """Extracts members (ZipInfo list, default: all) with extract_member. Returns bytes written."""
+    written = 0
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        for info in members if members is not None else zip_ref.infolist():
+            written += extract_member(zip_ref, info, extract_path, throttle)
+    return written
+
+
+class VerifiedCopy:
+    """
+    copy_function for shutil.move: used only when a move crosses volumes
+    (same-volume moves are renames and never copy).
+    - Without sha256: shutil.copy2 (OS fast paths) and the size that reached
+      the target is checked.
+    - With sha256 (or a throttle while limit() is non-zero): one streaming
+      pass hashes and meters what it writes; the digest of every copied file
+      is kept in 'digests' (destination -> hex).
+    limit: optional callable giving the bandwidth limit in effect, read per
+    copy, so an unthrottled moment still gets the fast path.
+    Raises IntegrityError on mismatch (not an OSError, so copytree does not
+    swallow it into a partial copy).
+    """
+    def __init__(self, sha256=False, verify=True, throttle=None, limit=None):
+        self.sha256 = sha256
+        self.verify = verify
+        self.throttle = throttle
+        self.limit = limit
+        self.digests = {}
+
+    def __call__(self, src, dst, follow_symlinks=True):
+        if os.path.isdir(dst):
+            dst = os.path.join(dst, os.path.basename(src))
+        throttle = self.throttle if self.limit is None or self.limit() else None
+        if not self.sha256 and throttle is None:
+            expected = os.path.getsize(src)
+            shutil.copy2(src, dst, follow_symlinks=follow_symlinks)
+            on_disk = os.path.getsize(dst)
+        else:
+            digest = hashlib.sha256() if self.sha256 else None
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                expected = os.fstat(fsrc.fileno()).st_size
+                while True:
+                    chunk = fsrc.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if digest is not None:
+                        digest.update(chunk)
+                    fdst.write(chunk)
+                    if throttle is not None:
+                        throttle(len(chunk))
+                fdst.flush()
+                on_disk = os.fstat(fdst.fileno()).st_size
+            shutil.copystat(src, dst, follow_symlinks=follow_symlinks)
+            if digest is not None:
+                self.digests[dst] = digest.hexdigest()
+        if self.verify and on_disk != expected:
+            raise IntegrityError(dst, f"{expected} bytes", f"{on_disk} bytes")
+        return dst
+
+    @classmethod
+    def from_settings(cls, settings, throttle=None, limit=None):
+        """None when neither verification nor a bandwidth limit needs the copy (plain shutil.copy2)."""
+        verify = bool(settings.get("verify_integrity", True))
+        if not verify and throttle is None:
+            return None
+        return cls(sha256=verify and bool(settings.get("integrity_sha256", False)), verify=verify, throttle=throttle,
+                   limit=limit)
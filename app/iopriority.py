@@ -0,0 +1,187 @@
+import os
+import platform
+import threading
+import time
+from contextlib import contextmanager
+
+MB = 1024 * 1024
+LEVELS = ("normal", "low", "idle")
+
+# Linux ioprio_set/ioprio_get syscall numbers
+_IOPRIO_SYSCALLS = {"x86_64": (251, 252), "amd64": (251, 252), "aarch64": (30, 31), "arm64": (30, 31),
+                    "i386": (289, 290), "i686": (289, 290)}
+_IOPRIO_CLASS_SHIFT = 13
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO = {"low": (2 << _IOPRIO_CLASS_SHIFT) | 7, "idle": 3 << _IOPRIO_CLASS_SHIFT} # best-effort 7 / idle
+
+# Windows SetThreadPriority modes (lower the thread's I/O and memory priority)
+_THREAD_MODE_BACKGROUND_BEGIN = 0x00010000
+_THREAD_MODE_BACKGROUND_END = 0x00020000
+
+
+class _ThreadIoPriority:
+    """Lowers the I/O priority of the calling thread only (other workers keep theirs)."""
+    def __init__(self):
+        self.backend = None
+        try:
+            if os.name == "nt":
+                import ctypes
+                self.kernel32 = ctypes.windll.kernel32
+                self.backend = "windows"
+            elif platform.system() == "Linux" and platform.machine().lower() in _IOPRIO_SYSCALLS:
+                import ctypes
+                self.libc = ctypes.CDLL(None, use_errno=True)
+                self.set_nr, self.get_nr = _IOPRIO_SYSCALLS[platform.machine().lower()]
+                self.backend = "linux"
+        except (OSError, AttributeError):
+            self.backend = None
+
+    def lower(self, level):
+        """Returns a token for restore(), or None if nothing was changed."""
+        if level == "normal" or self.backend is None:
+            return None
+        if self.backend == "windows":
+            thread = self.kernel32.GetCurrentThread()
+            return thread if self.kernel32.SetThreadPriority(thread, _THREAD_MODE_BACKGROUND_BEGIN) else None
+        tid = threading.get_native_id()
+        previous = self.libc.syscall(self.get_nr, _IOPRIO_WHO_PROCESS, tid)
+        if previous < 0 or self.libc.syscall(self.set_nr, _IOPRIO_WHO_PROCESS, tid, _IOPRIO[level]) < 0:
+            return None
+        return (tid, previous)
+
+    def restore(self, token):
+        if token is None:
+            return
+        if self.backend == "windows":
+            self.kernel32.SetThreadPriority(token, _THREAD_MODE_BACKGROUND_END)
+        else:
+            self.libc.syscall(self.set_nr, _IOPRIO_WHO_PROCESS, token[0], token[1])
+
+
+def lower_process_priority():
+    """
+    Puts the whole current process in background mode (CPU and I/O).
+    For worker processes that only do housekeeping (retention).
+    """
+    try:
+        if os.name == "nt":
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetPriorityClass(kernel32.GetCurrentProcess(), 0x00100000) # PROCESS_MODE_BACKGROUND_BEGIN
+            return
+        os.nice(19)
+        # The worker runs its tasks on the main thread, so the thread priority is the process priority
+        _ThreadIoPriority().lower("idle")
+    except (OSError, AttributeError) as e:
+        print(f"Cannot lower process priority: {e}")
+
+
+class TokenBucket:
+    """
+    Bandwidth limit shared by every thread that consumes from it.
+    rate() returns bytes/s (0 = unlimited) and is read on every call, so the
+    limit can follow download activity. A consumer may go into debt by one
+    chunk and then sleeps it off, which keeps the long-run rate exact.
+    clock and sleep can be replaced (tests use a fake clock).
+    """
+    def __init__(self, rate, burst=MB, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate if callable(rate) else (lambda: rate)
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = burst
+        self.last = clock()
+        self.lock = threading.Lock()
+
+    def consume(self, nbytes):
+        """Takes nbytes, sleeping if the bucket is in debt. Returns the seconds slept."""
+        with self.lock:
+            rate = self.rate()
+            now = self.clock()
+            if not rate:
+                self.tokens, self.last = self.burst, now
+                return 0.0
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * rate)
+            self.last = now
+            self.tokens -= nbytes
+            wait = -self.tokens / rate if self.tokens < 0 else 0.0
+        if wait:
+            self.sleep(wait)
+        return wait
+
+
+class ActivityMonitor:
+    """Remembers when a download last wrote into a watch folder."""
+    def __init__(self, window=3.0, clock=time.monotonic):
+        self.window = window
+        self.clock = clock
+        self.last = None
+
+    def note(self):
+        self.last = self.clock() # A float store: no lock needed on the event thread
+
+    def busy(self):
+        last = self.last
+        return last is not None and self.clock() - last < self.window
+
+
+class IoController:
+    """
+    I/O priority layer for heavy organizer work (extraction, cross-volume copies):
+    - per-stage priority classes ("normal", "low", "idle"), applied to the
+      worker thread while it runs that stage,
+    - one token bucket for extraction and copy throughput: 'io_limit_mbps'
+      normally (0 = unlimited), 'io_limit_busy_mbps' while downloads are
+      still writing into a watch folder (ActivityMonitor).
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    from app.settings import SettingsManager
+                    instance = super(IoController, cls).__new__(cls)
+                    instance._init(SettingsManager())
+                    cls._instance = instance
+        return cls._instance
+
+    def _init(self, settings, clock=time.monotonic, sleep=time.sleep):
+        self.priorities = {"extract": "low", "copy": "low", "dedup": "idle"}
+        self.priorities.update(settings.get("io_priority", {}))
+        self.limit = float(settings.get("io_limit_mbps", 0)) * MB
+        self.busy_limit = float(settings.get("io_limit_busy_mbps", 32)) * MB
+        self.activity = ActivityMonitor(float(settings.get("io_busy_window_seconds", 3.0)), clock)
+        self.bucket = TokenBucket(self.current_limit, clock=clock, sleep=sleep)
+        self.thread_priority = _ThreadIoPriority()
+
+    def current_limit(self):
+        if self.busy_limit and self.activity.busy():
+            return min(self.busy_limit, self.limit) if self.limit else self.busy_limit
+        return self.limit
+
+    @property
+    def limited(self):
+        """True if a limit is configured at all (whether it applies right now is current_limit())."""
+        return bool(self.limit or self.busy_limit)
+
+    def note_activity(self):
+        self.activity.note()
+
+    def throttle(self, nbytes):
+        waited = self.bucket.consume(nbytes)
+        if waited:
+            from app.metrics import Metrics
+            Metrics().inc("plmorg_io_throttled_seconds_total", waited)
+        return waited
+
+    @contextmanager
+    def stage(self, name):
+        """Runs the block with the stage's I/O priority on the current thread."""
+        level = self.priorities.get(name, "normal")
+        token = self.thread_priority.lower(level) if level in LEVELS else None
+        try:
+            yield
+        finally:
+            self.thread_priority.restore(token)
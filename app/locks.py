@@ -0,0 +1,54 @@
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+
+
+class _KeyLock:
+    # Plain threading.Lock objects cannot be weak-referenced, so wrap them.
+    __slots__ = ('lock', '__weakref__')
+
+    def __init__(self):
+        # Reentrant: a batch holding the folder lock can still call per-file moves.
+        self.lock = threading.RLock()
+
+
+class KeyedLock:
+    """
+    One lock per key (e.g. per target directory).
+    - Striped: the key table is split into N stripes, each with its own guard,
+      so looking up locks for different folders rarely contends.
+    - Self-cleaning: entries are weakly referenced and vanish as soon as no
+      thread holds or waits on them, so the table never grows unbounded.
+    """
+    def __init__(self, stripes=16):
+        self._stripes = [(threading.Lock(), weakref.WeakValueDictionary())
+                         for _ in range(stripes)]
+
+    def _entry(self, key):
+        guard, table = self._stripes[hash(key) % len(self._stripes)]
+        with guard:
+            entry = table.get(key)
+            if entry is None:
+                entry = _KeyLock()
+                table[key] = entry
+            return entry
+
+    @contextmanager
+    def hold(self, key):
+        # The local strong reference keeps the entry alive while we wait/hold.
+        entry = self._entry(key)
+        with entry.lock:
+            yield
+
+    def __len__(self):
+        count = 0
+        for guard, table in self._stripes:
+            with guard:
+                count += len(table)
+        return count
+
+
+def path_key(path):
+    """Normalized lock key for a directory path (case-insensitive on Windows)."""
+    return os.path.normcase(os.path.abspath(path))
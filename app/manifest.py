@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+
+from app.store import BatchedWriter
+
+MANIFEST_NAME = ".plm_manifest.jsonl"
+
+
+def source_urls(path):
+    """
+    Where a downloaded file came from, from the Windows "Mark of the Web"
+    (the Zone.Identifier stream browsers attach; it moves with the file).
+    Returns {"source_url": ..., "referrer_url": ...} with the keys that are present.
+    """
+    if os.name != "nt":
+        return {}
+    try:
+        with open(path + ":Zone.Identifier", "r", encoding="utf-8", errors="replace") as f:
+            lines = f.read(4096).splitlines()
+    except OSError:
+        return {}
+    urls = {}
+    for line in lines:
+        key, _, value = line.partition("=")
+        if key == "HostUrl" and value:
+            urls["source_url"] = value.strip()
+        elif key == "ReferrerUrl" and value:
+            urls["referrer_url"] = value.strip()
+    return urls
+
+
+class Manifest:
+    """
+    Reader for one folder's manifest. Nothing is read until the entries are
+    iterated, and iteration streams the file line by line; entries() and
+    latest() parse it once and keep the result.
+    A line cut off by a crash is skipped.
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, MANIFEST_NAME)
+        self._entries = None
+
+    def __iter__(self):
+        if self._entries is not None:
+            yield from self._entries
+            return
+        try:
+            f = open(self.path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    def entries(self):
+        if self._entries is None:
+            self._entries = list(self)
+        return self._entries
+
+    def latest(self):
+        """{name: newest entry} (a name reused after a deletion keeps its last filing)."""
+        return {entry["name"]: entry for entry in self.entries()}
+
+    def find(self, name):
+        return self.latest().get(name)
+
+
+class ManifestWriter(BatchedWriter):
+    """
+    Appends one JSON line per filed file or extracted tree to the
+    .plm_manifest.jsonl of its target folder.
+    - Workers only enqueue; the writer thread (BatchedWriter) buffers lines
+      per folder and appends them with one write every
+      'manifest_flush_seconds' (or every 1000 lines), so a session of 500
+      files is one append.
+    - Entries are built from what the organizer already knows (context,
+      sizes, digests, timings): the folder is never listed or re-read.
+    """
+    _instance = None
+    _lock = threading.Lock()
+    writer_name = "manifest-writer"
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    from app.settings import SettingsManager
+                    instance = super(ManifestWriter, cls).__new__(cls)
+                    instance._start_writer(1000, float(SettingsManager().get("manifest_flush_seconds", 2.0)))
+                    cls._instance = instance
+        return cls._instance
+
+    def append(self, destination, entry, url_from=None):
+        """
+        Queues the entry for destination's folder (cheap; safe from any thread).
+        url_from: file whose Mark of the Web gives the source URL (read by the writer).
+        """
+        self._enqueue([(os.path.dirname(destination), entry, url_from)])
+
+    def _write(self, batch):
+        lines = {}
+        for folder, entry, url_from in batch:
+            if url_from:
+                entry.update(source_urls(url_from))
+            lines.setdefault(folder, []).append(json.dumps(entry, ensure_ascii=False) + "\n")
+        for folder, folder_lines in lines.items():
+            path = os.path.join(folder, MANIFEST_NAME)
+            try:
+                new = not os.path.exists(path)
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write("".join(folder_lines))
+                if new and os.name == "nt":
+                    import ctypes
+                    ctypes.windll.kernel32.SetFileAttributesW(path, 0x2) # FILE_ATTRIBUTE_HIDDEN
+            except OSError as e:
+                print(f"manifest-writer error ({len(folder_lines)} entries for {folder} dropped): {e}")
+
+    def absorb(self, manifest_path, folder):
+        """Appends another folder's manifest to folder's (record folder merges), then deletes it."""
+        self.flush()
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            content = f.read()
+        if content and not content.endswith("\n"):
+            content = content[:content.rfind("\n") + 1] # Drop a line cut off by a crash
+        with open(os.path.join(folder, MANIFEST_NAME), "a", encoding="utf-8") as f:
+            f.write(content)
+        os.remove(manifest_path)
@@ -0,0 +1,276 @@
+import bisect
+import collections
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOKEN_FILE = "diagnostics.token"
+TOKEN_HEADER = "X-PLM-Token"
+
+# name -> (type, help, histogram buckets)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+DEFINITIONS = {
+    "plmorg_files_detected_total": ("counter", "Files seen by the watcher (temporary download files excluded)", None),
+    "plmorg_files_organized_total": ("counter", "Files moved into a record folder", None),
+    "plmorg_files_failed_total": ("counter", "Files that could not be organized, by stage", None),
+    "plmorg_bytes_moved_total": ("counter", "Bytes of files moved into record folders", None),
+    "plmorg_bytes_extracted_total": ("counter", "Uncompressed bytes written by archive extraction", None),
+    "plmorg_context_updates_total": ("counter", "PLM context changes (bridge, context files, clears)", None),
+    "plmorg_bridge_wakeups_total": ("counter", "Title bridge poll iterations", None),
+    "plmorg_ready_retries_total": ("counter", "Readiness checks that failed and were queued for a retry", None),
+    "plmorg_io_throttled_seconds_total": ("counter", "Seconds extraction and copies slept for the bandwidth limit", None),
+    "plmorg_integrity_failures_total": ("counter", "Extracted or copied files that failed verification, by stage", None),
+    "plmorg_dedup_saved_bytes_total": ("counter", "Bytes freed by hardlinking duplicate files into the dedup store", None),
+    "plmorg_readiness_wait_seconds": ("histogram", "Time from detection until a file is stable and unlocked",
+                                      (0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0, 20.0, 30.0, 60.0)),
+    "plmorg_extraction_duration_seconds": ("histogram", "Archive extraction time", DURATION_BUCKETS),
+    "plmorg_move_duration_seconds": ("histogram", "Time of one move into a record folder", DURATION_BUCKETS),
+}
+
+
+class _Shard:
+    """Counters and histograms written by one thread only."""
+    def __init__(self, thread):
+        self.thread = thread
+        self.counters = {} # (name, labels) -> value
+        self.histograms = {} # name -> [bucket counts..., +Inf count, sum]
+
+
+class Metrics:
+    """
+    Process-wide engine metrics, exported in Prometheus text format.
+    - Hot path is lock-free: each thread updates its own shard; shards are
+      summed on scrape (shards of finished threads are folded into one).
+    - Gauges (queue depth, workers in flight, ...) are callables read on scrape.
+    """
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    instance = super(Metrics, cls).__new__(cls)
+                    instance._init()
+                    cls._instance = instance
+        return cls._instance
+
+    def _init(self):
+        self.local = threading.local()
+        self.shards = []
+        self.retired = _Shard(None)
+        self.shards_lock = threading.Lock()
+        self.gauges = {} # name -> (help, fn)
+        self.started = time.time()
+        # Recent context changes, for the per-minute rate (deque appends are atomic)
+        self.context_times = collections.deque(maxlen=10000)
+
+    def _shard(self):
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = self.local.shard = _Shard(threading.current_thread())
+            with self.shards_lock:
+                self.shards.append(shard)
+        return shard
+
+    def inc(self, name, value=1, labels=()):
+        """labels: tuple of (label, value) pairs, e.g. (("stage", "move"),)."""
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, value):
+        histograms = self._shard().histograms
+        buckets = DEFINITIONS[name][2]
+        counts = histograms.get(name)
+        if counts is None:
+            counts = histograms[name] = [0] * (len(buckets) + 2)
+        counts[bisect.bisect_left(buckets, value)] += 1
+        counts[-1] += value
+
+    def context_updated(self):
+        self.inc("plmorg_context_updates_total")
+        self.context_times.append(time.monotonic())
+
+    def gauge(self, name, help_text, fn):
+        """Registers fn() as the value of gauge 'name' (read on every scrape)."""
+        self.gauges[name] = (help_text, fn)
+
+    def _collect(self):
+        """Sums all shards; shards of finished threads are folded into 'retired'."""
+        counters, histograms = {}, {}
+        with self.shards_lock:
+            alive = []
+            for shard in self.shards:
+                if shard.thread.is_alive():
+                    alive.append(shard)
+                else:
+                    _merge(self.retired, shard)
+            self.shards = alive
+            for shard in [self.retired] + alive:
+                for key, value in list(shard.counters.items()):
+                    counters[key] = counters.get(key, 0) + value
+                for name, counts in list(shard.histograms.items()):
+                    total = histograms.setdefault(name, [0] * len(counts))
+                    for i, c in enumerate(list(counts)):
+                        total[i] += c
+        return counters, histograms
+
+    def render(self):
+        """Prometheus text exposition (version 0.0.4)."""
+        counters, histograms = self._collect()
+        lines = []
+        for name, (kind, help_text, buckets) in DEFINITIONS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                series = [(labels, v) for (n, labels), v in counters.items() if n == name] or [((), 0)]
+                for labels, value in sorted(series):
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+            else:
+                counts = histograms.get(name) or [0] * (len(buckets) + 2)
+                cumulative = 0
+                for bound, count in zip(buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else _number(bound)
+                    lines.append(f'{name}_bucket{{le="{le}"}} {cumulative}')
+                lines.append(f"{name}_sum {_number(counts[-1])}")
+                lines.append(f"{name}_count {cumulative}")
+
+        cutoff = time.monotonic() - 60
+        gauges = {"plmorg_context_updates_per_minute": ("PLM context changes in the last 60 seconds",
+                                                        lambda: sum(1 for t in list(self.context_times) if t >= cutoff)),
+                  "plmorg_uptime_seconds": ("Seconds since the organizer started", lambda: time.time() - self.started)}
+        gauges.update(self.gauges)
+        for name, (help_text, fn) in gauges.items():
+            try:
+                value = fn()
+            except Exception as e:
+                print(f"Metrics: gauge {name} failed: {e}")
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _merge(into, shard):
+    for key, value in shard.counters.items():
+        into.counters[key] = into.counters.get(key, 0) + value
+    for name, counts in shard.histograms.items():
+        total = into.histograms.setdefault(name, [0] * len(counts))
+        for i, c in enumerate(counts):
+            total[i] += c
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = Metrics().render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        # POST /diagnostics/<action>?seconds=10&mode=sampling (used by "PLM_Organizer.exe diagnose")
+        from urllib.parse import parse_qs, urlparse
+        url = urlparse(self.path)
+        prefix = "/diagnostics/"
+        if not url.path.startswith(prefix):
+            self.send_error(404)
+            return
+        # Browsers send Origin with every cross-site POST; the CLI sends the token instead
+        token = self.headers.get(TOKEN_HEADER, "")
+        if self.headers.get("Origin") is not None or not hmac.compare_digest(token, self.server.token):
+            self.send_error(403)
+            return
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            from app.diagnostics import Diagnostics
+            bundle, message = Diagnostics().run(url.path[len(prefix):], float(query.get("seconds", 10)),
+                                                query.get("mode", "sampling"))
+            status, result = 200, {"bundle": bundle, "message": message}
+        except ValueError as e:
+            status, result = 400, {"bundle": None, "message": str(e)}
+        except Exception as e:
+            status, result = 500, {"bundle": None, "message": f"Diagnostics failed: {e}"}
+        body = json.dumps(result).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass # One line per scrape would flood the log area
+
+
+def token_path():
+    from app.settings import SettingsManager
+    return os.path.join(SettingsManager().settings_dir, TOKEN_FILE)
+
+
+class MetricsServer:
+    """
+    GET http://127.0.0.1:<metrics_port>/metrics, plus POST /diagnostics/<action>
+    for the "diagnose" command-line tool.
+    Bound to the loopback interface only: other machines on the shared
+    workstation's network cannot reach it. Diagnostics also need the token
+    written to diagnostics.token in the settings folder at each start, so a
+    web page cannot trigger them through the browser.
+    """
+    HOST = "127.0.0.1"
+
+    def __init__(self, port):
+        self.port = int(port)
+        self.httpd = None
+
+    @classmethod
+    def from_settings(cls, settings):
+        if not settings.get("metrics_enabled", True):
+            return None
+        return cls(settings.get("metrics_port", 9477))
+
+    def start(self):
+        try:
+            self.httpd = ThreadingHTTPServer((self.HOST, self.port), _MetricsHandler)
+        except OSError as e:
+            print(f"Metrics endpoint disabled (port {self.port}: {e})")
+            return False
+        self.httpd.daemon_threads = True
+        self.httpd.token = secrets.token_hex(16)
+        try:
+            fd = os.open(token_path(), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(self.httpd.token)
+        except OSError as e:
+            print(f"Diagnostics endpoint unavailable (cannot write its token: {e})")
+        threading.Thread(target=self.httpd.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"Metrics endpoint: http://{self.HOST}:{self.httpd.server_address[1]}/metrics")
+        return True
+
+    def stop(self):
+        if self.httpd:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
@@ -4,6 +4,20 @@ import time
 import threading
 import subprocess
 from app.context import ContextManager
+from app.archive import ExtractFilter, plan_extraction
+from app.locks import KeyedLock, path_key
+from app.routing import RoutingCache
+from app.extract_pool import ProcessPoolExtractor, _long_path
+from app.dedup import DedupService
+from app.manifest import MANIFEST_NAME, ManifestWriter
+from app.integrity import IntegrityError, VerifiedCopy, extract_verified
+from app.iopriority import IoController
+from app.utils import format_size
+from app.history import HistoryStore
+from app.search import SearchIndex
+from app.folder_map import FolderMap
+from app.metrics import Metrics
+from app.trace import TraceRecorder
 import re
 import zipfile
 
@@ -11,13 +25,95 @@ class Organizer:
     def __init__(self):
         self.context_manager = ContextManager()
         self.on_success_callback = None
+        self.on_session_callback = None
         # v1.8.11: Thread-Safe Ledger to prevent duplicate processing
         self.active_files = set()
         self.lock = threading.Lock()
+        # Per-target-folder locks: moves into the same folder are serialized,
+        # different folders proceed in parallel.
+        self.dir_locks = KeyedLock()
+        from app.settings import SettingsManager
+        self.routing = RoutingCache(self.context_manager, SettingsManager(), self.dir_locks, FolderMap())
+        # Searchable record of everything organized (written in batches off-thread)
+        self.history = HistoryStore() if SettingsManager().get("history_enabled", True) else None
+        self.search_index = SearchIndex() if SettingsManager().get("search_index_enabled", True) else None
+        self.metrics = Metrics()
+        # Optional multi-process extraction backend (created on first use), its running jobs by ZIP path
+        self.process_extractor = None
+        self.extraction_jobs = {}
+        self.closing = False
+        # Integrity checks in the extraction / cross-volume copy pass; mismatches are re-queued
+        self.verify_integrity = bool(SettingsManager().get("verify_integrity", True))
+        # Heavy stages run at a lower I/O priority and share one bandwidth limit
+        self.io = IoController()
+        self.throttle = self.io.throttle if self.io.limited else None
+        # The limit in effect is read per copy: no limit at that moment -> shutil.copy2 fast path
+        self.copier = VerifiedCopy.from_settings(SettingsManager(), self.throttle, self.io.current_limit)
+        self.on_integrity_failure = None
+        self.requeued = set()
+        # Optional content-addressed store: duplicates across record folders become hardlinks
+        self.dedup = DedupService() if SettingsManager().get("dedup_enabled", False) else None
+        # .plm_manifest.jsonl in every target folder: what was filed there, from where
+        self.manifest = ManifestWriter() if SettingsManager().get("manifest_enabled", True) else None
+        # 'tar' is killed after tar_timeout; an engine can run it itself (argv, timeout) -> (returncode, stderr)
+        self.tar_timeout = float(SettingsManager().get("tar_timeout_seconds", 1800))
+        self.tar_runner = None
 
     def set_callback(self, callback):
         self.on_success_callback = callback
 
+    def set_session_callback(self, callback):
+        self.on_session_callback = callback
+
+    def set_integrity_callback(self, callback):
+        """callback(path) -> True if path was queued for another attempt."""
+        self.on_integrity_failure = callback
+
+    def requeue(self, path):
+        """Hands a path that failed verification back for a retry (False if it is out of retries)."""
+        if self.on_integrity_failure is None or not self.on_integrity_failure(path):
+            return False
+        with self.lock:
+            self.requeued.add(path)
+        return True
+
+    def was_requeued(self, path):
+        with self.lock:
+            if path in self.requeued:
+                self.requeued.discard(path)
+                return True
+        return False
+
+    def estimate_cost(self, file_path):
+        """
+        Approximate bytes of real I/O needed to file this path (for scheduling):
+        uncompressed size for archives that will be extracted, file size for
+        cross-volume moves, 0 for same-volume renames.
+        """
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            return 0
+
+        route = self.routing.resolve(os.path.dirname(file_path))
+        if route is None:
+            return size
+
+        if route.auto_unzip and file_path.lower().endswith('.zip'):
+            try:
+                # Central directory only, nothing is inflated here.
+                with zipfile.ZipFile(file_path, 'r') as zip_ref:
+                    return size + sum(i.file_size for i in zip_ref.infolist())
+            except Exception:
+                return size
+
+        try:
+            if os.stat(file_path).st_dev != os.stat(route.target_dir).st_dev:
+                return size
+        except OSError:
+            return size
+        return 0
+
 
     def organize_file(self, file_path):
         """
@@ -40,65 +136,183 @@ class Organizer:
     def _organize_file_internal(self, file_path):
         """
         Original organize_file logic, now wrapped for thread safety.
+        Fast path: one routing-cache lookup (context, target folder and
+        strategy are resolved once per context/settings version) + one move.
         """
-        # 1. Get Context
-        context = self.context_manager.get_context()
-        if not context:
+        # 1. Resolve Route (Context -> Target Directory -> Strategy)
+        # Note: We move FROM base_dir TO target_dir.
+        # As in v1, target_dir = os.path.join(base_dir, folder_name),
+        # i.e. a subfolder inside Downloads (created when the route is built).
+        base_dir = os.path.dirname(file_path)
+        route = self.routing.resolve(base_dir)
+        if not route:
             print(f"Skipping {file_path}: No active PLM context.")
             return
 
-        folder_name = context.get('folder_name')
-        if not folder_name:
-            print(f"Skipping {file_path}: No valid folder name determined.")
-            return
-            
-        # Target Directory
-        base_dir = os.path.dirname(file_path)
-        # Note: We move FROM base_dir TO target_dir
-        # target_dir is usually different from base_dir (e.g. Downloads -> Documents/PLM/...)
-        # But base_dir is where the file IS NOW (Downloads).
-        
-        # Construct absolute target path
-        # Assuming the user wants to organize relative to the app or a fixed location?
-        # Actually in v1 code, target_dir was os.path.join(base_dir, folder_name).
-        # Meaning it creates a subfolder inside Downloads.
-        target_dir = os.path.join(base_dir, folder_name)
-        
-        if not os.path.exists(target_dir):
-            os.makedirs(target_dir)
-            print(f"Created directory: {target_dir}")
-
         # 2. Check Strategy
         filename = os.path.basename(file_path)
         is_zip = filename.lower().endswith('.zip')
-        
-        from app.settings import SettingsManager
-        auto_unzip = SettingsManager().get("auto_unzip", True)
 
-        if is_zip and auto_unzip:
+        if is_zip and route.auto_unzip:
             print(f"ZIP detected (Unzip-First Strategy): {file_path}")
-            self.process_zip_workflow(file_path, target_dir)
+            moved = self.process_zip_workflow(file_path, route.target_dir, route)
         else:
-            self.move_file_safe(file_path, target_dir)
+            moved = self.move_file_safe(file_path, route.target_dir, route)
+            if self.on_success_callback and moved:
+                self.on_success_callback(moved)
+        self.count_result(1 if moved else 0, 0 if moved or self.was_requeued(file_path) else 1)
+
+    def organize_session(self, session):
+        """
+        Files a whole download session: the destination was resolved once when
+        the session opened, members are moved under a single hold of the folder
+        lock, and one aggregate event replaces the per-file callbacks.
+        """
+        route = session.route
+        started = time.time()
+        moved, failed = [], []
+
+        with self.lock:
+            members = [f for f in session.files if f not in self.active_files]
+            self.active_files.update(members)
+        zips = [f for f in members if route.auto_unzip and f.lower().endswith('.zip')]
+        plain = [f for f in members if f not in zips]
+        try:
+            # Bulk move: one lock acquisition for all plain members
+            with self.dir_locks.hold(path_key(route.target_dir)):
+                for file_path in plain:
+                    result = self.move_file_safe(file_path, route.target_dir, route, verbose=False)
+                    (moved if result else failed).append(result or file_path)
+
+            # Extraction happens outside the folder lock
+            for file_path in zips:
+                print(f"ZIP detected (Unzip-First Strategy): {file_path}")
+                result = self.process_zip_workflow(file_path, route.target_dir, route, notify=False)
+                (moved if result else failed).append(result or file_path)
+        finally:
+            with self.lock:
+                self.active_files.difference_update(members)
 
-    def process_zip_workflow(self, zip_path, target_dir):
+        failed = [f for f in failed if not self.was_requeued(f)] # Re-queued members come back on their own
+        self.count_result(len(moved), len(failed))
+        finished = time.time()
+        duration = max(finished - session.started, 1e-6)
+        summary = {
+            "session_id": session.id,
+            "folder_name": route.folder_name,
+            "target_dir": route.target_dir,
+            "count": len(moved),
+            "failed": len(failed),
+            "bytes": session.bytes,
+            "duration": duration,
+            "throughput": session.bytes / duration,
+            "files": moved,
+        }
+        print(f"Session #{session.id}: {len(moved)} files ({format_size(session.bytes)}) -> {route.folder_name} "
+              f"in {duration:.1f}s ({format_size(summary['throughput'])}/s)"
+              + (f", {len(failed)} failed" if failed else ""))
+
+        if self.on_session_callback:
+            self.on_session_callback(summary)
+        elif self.on_success_callback:
+            for dest in moved:
+                self.on_success_callback(dest)
+        return summary
+
+    def process_zip_workflow(self, zip_path, target_dir, route=None, notify=True):
         """
         Strategy v1.8.9:
         1. Unzip IN PLACE (Downloads folder)
         2. Move ZIP -> Target
         3. Move Extracted Folder -> Target
+        Returns the moved ZIP path (None on failure).
         """
         base_dir = os.path.dirname(zip_path)
         zip_name = os.path.basename(zip_path)
         folder_name = os.path.splitext(zip_name)[0]
         extract_path = os.path.join(base_dir, folder_name)
 
+        # A-0. Selective Extraction Plan (read from the central directory only)
+        plan = self.plan_selective_extraction(zip_path, route.extract_filters if route else None)
+
         # A. Unzip In-Place
         unzip_success = False
+        unzip_started = time.monotonic()
+        recorder = TraceRecorder.active
+        if recorder is not None:
+            recorder.claim(extract_path)
+
+        extracted = 0
+        try:
+            with self.io.stage("extract"):
+                unzip_success = self.unzip(zip_path, extract_path, plan, route)
+        except IntegrityError as e:
+            print(f"Error: {e}")
+            self.metrics.inc("plmorg_integrity_failures_total", labels=(("stage", "extract"),))
+            shutil.rmtree(extract_path, ignore_errors=True)
+            if self.requeue(zip_path):
+                return None # The ZIP stays where it is and is extracted again
+
+        if not unzip_success and self.closing:
+            shutil.rmtree(extract_path, ignore_errors=True) # Cancelled at exit: extracted again next start
+            return None
+
+        extract_seconds = time.monotonic() - unzip_started
+        self.metrics.observe("plmorg_extraction_duration_seconds", extract_seconds)
+        if unzip_success:
+            extracted = self.extracted_bytes(zip_path, plan)
+            self.metrics.inc("plmorg_bytes_extracted_total", extracted)
+
+        # B. Move Original ZIP (ALWAYS move)
+        print(f"Moving ZIP to {target_dir}...")
+        moved_zip = self.move_file_safe(zip_path, target_dir, route)
+        if moved_zip is None:
+            with self.lock:
+                requeued = zip_path in self.requeued
+            if requeued:
+                # The ZIP's copy failed verification: the retry extracts it again and files both
+                shutil.rmtree(extract_path, ignore_errors=True)
+                return None
 
+        # C. Move Extracted Folder (Only if unzip succeeded)
+        if os.path.exists(extract_path):
+            origin = {"kind": "tree", "zip": os.path.basename(moved_zip) if moved_zip else zip_name,
+                      "complete": unzip_success, "extract_seconds": round(extract_seconds, 3)}
+            if unzip_success:
+                 origin["size"] = extracted
+                 if plan is not None:
+                     origin["files"] = len(plan.members)
+                     origin["skipped_files"] = len(plan.skipped)
+                 print(f"Moving Extracted Folder to {target_dir}...")
+                 self.move_file_safe(extract_path, target_dir, route, origin=origin, url_from=moved_zip)
+            else:
+                 print(f"Moving Partial/Failed Extracted Folder to {target_dir}...")
+                 self.move_file_safe(extract_path, target_dir, route, origin=origin, url_from=moved_zip)
+        
+        if notify and self.on_success_callback and moved_zip:
+            self.on_success_callback(moved_zip)
+        return moved_zip
+
+    def unzip(self, zip_path, extract_path, plan=None, route=None):
+        """
+        Extracts zip_path into extract_path with the backend the route asks for.
+        Returns True on success; raises IntegrityError when verification fails.
+        """
+        zip_name = os.path.basename(zip_path)
+        unzip_success = False
+        if route and route.extraction_backend == "process":
+            # Optional backend: inflate across worker processes (deflate holds the GIL).
+            unzip_success = self.unzip_with_process_pool(zip_path, extract_path, plan)
+        elif self.verify_integrity:
+            # Verified in the extraction pass itself ('tar' output could only be checked by reading it back)
+            unzip_success = self.unzip_verified(zip_path, extract_path, plan)
+        elif plan and plan.is_filtered:
+            # Filters active: only wanted members are ever decompressed.
+            # ('tar' cannot filter by size, so zipfile does the work here.)
+            unzip_success = self.unzip_selective(zip_path, extract_path, plan)
         # Priority 1: Windows 'tar' (Robust for Long Paths)
         # User requested this as default for modern Windows env.
-        if self.unzip_with_tar(zip_path, extract_path):
+        elif self.unzip_with_tar(zip_path, extract_path):
              unzip_success = True
              print(f"Unzip successful (System Tar): {zip_name}")
         else:
@@ -128,22 +342,151 @@ class Organizer:
                 print(f"Error: Permission Denied during Unzip (Locked): {zip_path}")
              except Exception as e:
                 print(f"Error in ZIP workflow (Unzip Step): {e}")
+        return unzip_success
 
-        # B. Move Original ZIP (ALWAYS move)
-        print(f"Moving ZIP to {target_dir}...")
-        moved_zip = self.move_file_safe(zip_path, target_dir)
+    def plan_selective_extraction(self, zip_path, rules=None):
+        """
+        Applies the first matching 'extract_filters' rule to the archive.
+        Returns an ExtractionPlan, or None when no rule applies.
+        """
+        if rules is None:
+            from app.settings import SettingsManager
+            rules = SettingsManager().get("extract_filters", [])
+        extract_filter = ExtractFilter.for_archive(os.path.basename(zip_path), rules)
+        if not extract_filter:
+            return None
 
-        # C. Move Extracted Folder (Only if unzip succeeded)
-        if os.path.exists(extract_path):
-            if unzip_success:
-                 print(f"Moving Extracted Folder to {target_dir}...")
-                 self.move_file_safe(extract_path, target_dir)
+        try:
+            return plan_extraction(zip_path, extract_filter)
+        except Exception as e:
+            print(f"Extract filter ignored (Cannot read central directory): {e}")
+            return None
+
+    def unzip_selective(self, zip_path, extract_path, plan):
+        """
+        Extracts only plan.members and reports the I/O saved by the filter.
+        """
+        zip_name = os.path.basename(zip_path)
+        total = len(plan.members) + len(plan.skipped)
+        try:
+            if plan.members:
+                if not os.path.exists(extract_path):
+                    os.makedirs(extract_path)
+                with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                    zip_ref.extractall(extract_path, members=plan.members)
+
+            print(f"Unzip successful (Selective): {zip_name} "
+                  f"[{len(plan.members)}/{total} members, {format_size(plan.extract_bytes)} written]")
+            print(f"Filter saved I/O for {zip_name}: skipped {len(plan.skipped)} members, "
+                  f"{format_size(plan.skipped_bytes)} not written, "
+                  f"{format_size(plan.skipped_compressed_bytes)} not inflated")
+            return True
+        except zipfile.BadZipFile:
+            print(f"Error: Bad ZIP File (Corrupt): {zip_path}")
+        except PermissionError:
+            print(f"Error: Permission Denied during Unzip (Locked): {zip_path}")
+        except Exception as e:
+            print(f"Error in ZIP workflow (Selective Unzip): {e}")
+        return False
+
+    def unzip_verified(self, zip_path, extract_path, plan=None):
+        """
+        Streaming extraction with per-member verification (app/integrity.py),
+        of plan.members when a filter applies. Raises IntegrityError.
+        """
+        zip_name = os.path.basename(zip_path)
+        try:
+            os.makedirs(extract_path, exist_ok=True)
+            written = extract_verified(zip_path, _long_path(extract_path), plan.members if plan else None, self.throttle)
+            if plan and plan.is_filtered:
+                total = len(plan.members) + len(plan.skipped)
+                print(f"Unzip successful (Verified, Selective): {zip_name} "
+                      f"[{len(plan.members)}/{total} members, {format_size(written)} written]")
+                print(f"Filter saved I/O for {zip_name}: skipped {len(plan.skipped)} members, "
+                      f"{format_size(plan.skipped_bytes)} not written, "
+                      f"{format_size(plan.skipped_compressed_bytes)} not inflated")
             else:
-                 print(f"Moving Partial/Failed Extracted Folder to {target_dir}...")
-                 self.move_file_safe(extract_path, target_dir)
-        
-        if self.on_success_callback and moved_zip:
-            self.on_success_callback(moved_zip)
+                print(f"Unzip successful (Verified): {zip_name} [{format_size(written)} written]")
+            return True
+        except IntegrityError:
+            raise
+        except zipfile.BadZipFile:
+            print(f"Error: Bad ZIP File (Corrupt): {zip_path}")
+        except PermissionError:
+            print(f"Error: Permission Denied during Unzip (Locked): {zip_path}")
+        except Exception as e:
+            print(f"Error in ZIP workflow (Verified Unzip): {e}")
+        return False
+
+    def get_process_extractor(self):
+        with self.lock:
+            if self.process_extractor is None:
+                from app.settings import SettingsManager
+                workers = SettingsManager().get("extraction_processes", 0)
+                self.process_extractor = ProcessPoolExtractor(workers)
+            return self.process_extractor
+
+    def unzip_with_process_pool(self, zip_path, extract_path, plan=None):
+        """
+        Extracts plan.members (or the whole archive) with the process pool,
+        logging progress in 25% steps.
+        """
+        zip_name = os.path.basename(zip_path)
+        try:
+            if plan is None:
+                plan = plan_extraction(zip_path, None)
+            extractor = self.get_process_extractor()
+            print(f"Extracting {zip_name} with {extractor.workers} processes "
+                  f"({format_size(plan.extract_bytes)})...")
+
+            reported = [0]
+            def on_progress(done, total):
+                step = int(done * 4 / total) * 25 if total else 100
+                if step > reported[0]:
+                    reported[0] = step
+                    print(f"Extracting {zip_name}: {step}%")
+
+            def on_job(job):
+                with self.lock:
+                    self.extraction_jobs[zip_path] = job
+
+            try:
+                if extractor.extract(zip_path, extract_path, plan.members, progress_callback=on_progress,
+                                     job_callback=on_job):
+                    print(f"Unzip successful (Process Pool): {zip_name}")
+                    return True
+            finally:
+                with self.lock:
+                    self.extraction_jobs.pop(zip_path, None)
+            print(f"Unzip cancelled (Process Pool): {zip_name}")
+        except IntegrityError:
+            raise
+        except zipfile.BadZipFile:
+            print(f"Error: Bad ZIP File (Corrupt): {zip_path}")
+        except Exception as e:
+            if self.closing:
+                print(f"Unzip cancelled (Process Pool): {zip_name}") # Pool stopped under the job
+            else:
+                print(f"Error in ZIP workflow (Process Pool): {e}")
+        return False
+
+    def cancel_extraction(self, zip_path=None):
+        """Cancels the process-pool extraction of zip_path (None: all of them). Returns how many."""
+        with self.lock:
+            jobs = [job for path, job in self.extraction_jobs.items() if zip_path in (None, path)]
+        for job in jobs:
+            job.cancel()
+        return len(jobs)
+
+    def shutdown(self, timeout=5.0):
+        """
+        App exit: cancels running extractions (their ZIPs stay in the watch
+        folder, nothing partial is filed) and stops the extraction processes.
+        """
+        self.closing = True
+        self.cancel_extraction()
+        if self.process_extractor is not None:
+            self.process_extractor.shutdown(timeout)
 
     def unzip_with_tar(self, zip_path, extract_path):
         """
@@ -159,24 +502,166 @@ class Organizer:
             if not os.path.exists(extract_path):
                 os.makedirs(extract_path)
                 
-            result = subprocess.run(
-                ['tar', '-xf', zip_path, '-C', extract_path],
-                capture_output=True,
-                text=True
-            )
-            
-            if result.returncode == 0:
+            args = ['tar', '-xf', zip_path, '-C', extract_path]
+            if self.tar_runner is not None:
+                returncode, stderr = self.tar_runner(args, self.tar_timeout)
+            else:
+                result = subprocess.run(args, capture_output=True, text=True, timeout=self.tar_timeout)
+                returncode, stderr = result.returncode, result.stderr
+
+            if returncode == 0:
                 return True
             else:
-                print(f"Tar Error: {result.stderr}")
+                print(f"Tar Error: {stderr}")
                 return False
+        except subprocess.TimeoutExpired:
+            print(f"Tar timed out after {self.tar_timeout:g}s: {os.path.basename(zip_path)}")
+            return False
         except Exception as e:
             print(f"Tar Unexpected Error: {e}")
             return False
 
-    def move_file_safe(self, source, target_folder):
+    def count_result(self, organized, failed):
+        if organized:
+            self.metrics.inc("plmorg_files_organized_total", organized)
+        if failed:
+            self.metrics.inc("plmorg_files_failed_total", failed, labels=(("stage", "organize"),))
+
+    def extracted_bytes(self, zip_path, plan=None):
+        """Uncompressed bytes written for zip_path (central directory only)."""
+        if plan is not None:
+            return plan.extract_bytes
+        try:
+            with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+                return sum(i.file_size for i in zip_ref.infolist())
+        except Exception:
+            return 0
+
+    def copy_file(self, src, dst, follow_symlinks=True):
+        """copy_function for shutil.move (only called when a move crosses volumes)."""
+        with self.io.stage("copy"):
+            return (self.copier or shutil.copy2)(src, dst, follow_symlinks=follow_symlinks)
+
+    def take_digest(self, destination):
+        """SHA-256 computed while copying destination across volumes (None if it was a rename)."""
+        if self.copier is None or not self.copier.digests:
+            return None
+        if os.path.isdir(destination):
+            prefix = os.path.join(destination, "")
+            for key in [k for k in list(self.copier.digests) if k.startswith(prefix)]:
+                self.copier.digests.pop(key, None)
+            return None
+        return self.copier.digests.pop(destination, None)
+
+    def record_move(self, destination, route=None, sha256=None, source=None, size=0, seconds=None, origin=None,
+                    url_from=None):
+        """
+        History + search index + manifest for a completed move (never fails the move itself).
+        origin: extra manifest fields from the caller (e.g. the ZIP an extracted tree came from).
+        """
+        try:
+            if self.history is not None:
+                self.history.record(destination, sha256=sha256, record=route.record if route is not None else None)
+            if self.search_index is not None:
+                self.search_index.add(destination, route.record if route is not None else None)
+            if self.manifest is not None:
+                entry = {"ts": round(time.time(), 3), "kind": "tree" if os.path.isdir(destination) else "file",
+                         "name": os.path.basename(destination),
+                         "size": size, "sha256": sha256, "source": source,
+                         "context": route.context if route is not None else None,
+                         "move_seconds": round(seconds, 3) if seconds is not None else None}
+                entry.update(origin or {})
+                self.manifest.append(destination, entry, url_from or destination)
+            if self.dedup is not None:
+                self.dedup.submit(destination, sha256)
+        except Exception as e:
+            print(f"Bookkeeping error for {destination}: {e}")
+
+    def merge_record_folders(self, base_dir, record_ids=None, dry_run=True):
+        """
+        Merges folders of the same record that were split by a title change
+        ("[DF1]_Old_Title" + "[DF1]_New_Title") into the canonical one.
+        Colliding names get the usual timestamp suffix; emptied folders are removed.
+        Returns {record_id: (canonical, [merged folder names])}.
+        """
+        folder_map = self.routing.folder_map or FolderMap()
+        plan = folder_map.splits(base_dir)
+        if record_ids:
+            wanted = {r.upper() for r in record_ids}
+            plan = {r: v for r, v in plan.items() if r in wanted}
+
+        for record_id, (canonical, others) in sorted(plan.items()):
+            target = os.path.join(base_dir, canonical)
+            print(f"[{record_id}] -> {canonical}")
+            for name in others:
+                folder = os.path.join(base_dir, name)
+                entries = os.listdir(folder)
+                print(f"    {'would merge' if dry_run else 'merging'} {name} ({len(entries)} entries)")
+                if dry_run:
+                    continue
+                if MANIFEST_NAME in entries and self.manifest is not None:
+                    # Keeps the merged folder's filings, ahead of the moves recorded below
+                    entries.remove(MANIFEST_NAME)
+                    self.manifest.absorb(os.path.join(folder, MANIFEST_NAME), target)
+                for entry in entries:
+                    source = os.path.join(folder, entry)
+                    moved = self.move_file_safe(source, target, verbose=False, origin={"merged_from": name})
+                    if moved and self.search_index is not None:
+                        self.search_index.remove(source)
+                try:
+                    os.rmdir(folder)
+                except OSError as e:
+                    print(f"    kept {name}: {e}")
+            if not dry_run:
+                folder_map.remember(base_dir, canonical)
+        if not dry_run:
+            self.routing.invalidate()
+        return plan
+
+    def unique_destination(self, target_folder, name):
+        """
+        Returns a free path for name inside target_folder.
+        Duplicates get a timestamp suffix, plus a counter when several
+        same-name files arrive within the same second.
+        Caller must hold the folder lock.
+        """
+        destination = os.path.join(target_folder, name)
+        if not os.path.exists(destination):
+            return destination
+
+        # If it's a folder, ext is empty.
+        base, ext = os.path.splitext(name)
+        timestamp = int(time.time())
+        destination = os.path.join(target_folder, f"{base}_{timestamp}{ext}")
+        counter = 1
+        while os.path.exists(destination):
+            destination = os.path.join(target_folder, f"{base}_{timestamp}_{counter}{ext}")
+            counter += 1
+        return destination
+
+    def claim_destination(self, target_folder, name, route=None):
+        """
+        Free destination path for name, reserved in the route's name set.
+        The set is the fast path but only knows the folder as it was when the
+        route was built, so the claimed name is confirmed with one lexists:
+        a name added since (by the user or another tool) is skipped, instead
+        of shutil.move nesting into that folder or overwriting that file.
+        Caller must hold the folder lock.
+        """
+        if route is None:
+            return self.unique_destination(target_folder, name)
+        timestamp = int(time.time())
+        destination = route.claim_name(name, timestamp)
+        while os.path.lexists(destination):
+            destination = route.claim_name(name, timestamp) # The taken name stays in the set
+        return destination
+
+    def move_file_safe(self, source, target_folder, route=None, verbose=True, origin=None, url_from=None):
         """
         Moves a file OR directory to target_folder, handling duplicates.
+        With a route for target_folder, the duplicate check is answered from
+        the route's cached name set instead of the filesystem.
+        origin/url_from are passed on to record_move (manifest).
         Returns the new path.
         """
         try:
@@ -186,34 +671,76 @@ class Organizer:
                 return None
 
             name = os.path.basename(source)
-            destination = os.path.join(target_folder, name)
+            size = os.path.getsize(source) if os.path.isfile(source) else 0
+            if route is not None and route.target_dir != target_folder:
+                route = None
 
-            # Handle Duplicates
-            if os.path.exists(destination):
-                base, ext = os.path.splitext(name)
-                timestamp = int(time.time())
-                # If it's a folder, ext is empty.
-                destination = os.path.join(target_folder, f"{base}_{timestamp}{ext}")
+            recorder = TraceRecorder.active
+            if recorder is not None:
+                recorder.claim(source)
 
-            # Retry Loop
+            # Retry Loop. Duplicate check + move must be atomic per target folder
+            # (TOCTOU), otherwise two workers can pick the same free name: each
+            # attempt claims its name and moves under the folder lock, but waits
+            # outside it, so one locked file does not stall the folder's other moves.
+            moved = None
             max_retries = 5
             for attempt in range(max_retries):
-                try:
-                    shutil.move(source, destination)
-                    print(f"Moved: {source} -> {destination}")
-                    return destination
-                except FileNotFoundError:
-                    # Source disappeared during retry (Race condition resolved by other thread)
-                    print(f"Source disappeared during move: {source}")
-                    return None
-                except PermissionError:
-                    time.sleep(1)
-                except Exception as e:
-                    print(f"Move Error ({attempt}): {e}")
-                    time.sleep(1)
-            
-            print(f"Failed to move {source} after retries.")
-            return None
+                wait = False
+                with self.dir_locks.hold(path_key(target_folder)):
+                    destination = self.claim_destination(target_folder, name, route)
+                    try:
+                        move_started = time.monotonic()
+                        shutil.move(source, destination, copy_function=self.copy_file)
+                        move_seconds = time.monotonic() - move_started
+                        self.metrics.observe("plmorg_move_duration_seconds", move_seconds)
+                        if verbose:
+                            print(f"Moved: {source} -> {destination}")
+                        moved = destination
+                    except IntegrityError as e:
+                        # Cross-volume copy did not arrive intact: drop it, keep the source, retry later
+                        print(f"Error: {e}")
+                        self.metrics.inc("plmorg_integrity_failures_total", labels=(("stage", "copy"),))
+                        if os.path.isdir(destination):
+                            shutil.rmtree(destination, ignore_errors=True)
+                        elif os.path.exists(destination):
+                            os.remove(destination)
+                        self.requeue(source)
+                    except FileExistsError:
+                        # Name taken between the check and the move: it stays claimed, try the next one
+                        continue
+                    except FileNotFoundError:
+                        if route is not None and os.path.exists(source) and not os.path.isdir(target_folder):
+                            # Cached target folder was deleted: re-create it and drop stale routes.
+                            print(f"Target folder vanished, re-creating: {target_folder}")
+                            self.routing.invalidate()
+                            os.makedirs(target_folder, exist_ok=True)
+                            route.release_name(destination)
+                            continue
+                        # Source disappeared during retry (Race condition resolved by other thread)
+                        print(f"Source disappeared during move: {source}")
+                    except PermissionError:
+                        wait = True
+                    except Exception as e:
+                        print(f"Move Error ({attempt}): {e}")
+                        wait = True
+
+                    if moved is None and route is not None:
+                        route.release_name(destination)
+                if not wait:
+                    break
+                time.sleep(1)
+            else:
+                print(f"Failed to move {source} after retries.")
+
+            # Bookkeeping outside the folder lock (indexing a moved folder walks it)
+            if moved is not None:
+                if size:
+                    self.metrics.inc("plmorg_bytes_moved_total", size)
+                if recorder is not None:
+                    recorder.organized(source, moved)
+                self.record_move(moved, route, self.take_digest(moved), source, size, move_seconds, origin, url_from)
+            return moved
         except Exception as e:
             print(f"Critical Move Error: {e}")
             return None
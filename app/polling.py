@@ -0,0 +1,208 @@
+import os
+import time
+from functools import partial
+
+from watchdog.events import FileCreatedEvent, FileDeletedEvent, FileModifiedEvent, FileMovedEvent
+from watchdog.observers.api import BaseObserver, EventEmitter
+
+
+def diff_snapshots(old, new):
+    """
+    Compares two {path: (inode, size, mtime_ns)} snapshots.
+    Returns (created, deleted, modified, moved) where moved holds
+    (src, dest) pairs matched by inode (browser "NAME.crdownload" -> "NAME").
+    """
+    created = [p for p in new if p not in old]
+    deleted = [p for p in old if p not in new]
+    modified = [p for p, state in new.items() if p in old and old[p] != state]
+
+    moved = []
+    if created and deleted:
+        # inode 0 means "unknown" (some network file systems): never match those.
+        by_inode = {new[p][0]: p for p in created if new[p][0]}
+        for src in list(deleted):
+            dest = by_inode.pop(old[src][0], None) if old[src][0] else None
+            if dest is not None:
+                moved.append((src, dest))
+                deleted.remove(src)
+                created.remove(dest)
+    return created, deleted, modified, moved
+
+
+class SnapshotScanner:
+    """
+    Lists one folder into a {path: (inode, size, mtime_ns)} snapshot.
+    - Files only, non-recursive (what the download watcher needs).
+    - CPU cap: the scanning thread may use at most 'max_cpu' of a core; after
+      every 'chunk' entries it sleeps off any excess, so a 50k-entry share
+      does not pin a core on every poll.
+    - Inodes are reused from the previous snapshot for unchanged entries
+      (on Windows DirEntry.inode() costs an extra stat call).
+    """
+    def __init__(self, path, max_cpu=0.2, chunk=512):
+        self.path = path
+        self.max_cpu = max_cpu
+        self.chunk = chunk
+        self.last_scan_seconds = 0.0
+        self.last_scan_cpu = 0.0
+        self.last_scan_throttled = 0.0
+
+    def scan(self, previous=None, pause=time.sleep):
+        """Returns a fresh snapshot. 'pause(seconds)' returning True aborts (returns None)."""
+        previous = previous or {}
+        snapshot = {}
+        throttled = 0.0
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+
+        with os.scandir(self.path) as it:
+            for count, entry in enumerate(it, 1):
+                try:
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue # Vanished between listing and stat
+
+                old = previous.get(entry.path)
+                if old is not None and old[1] == st.st_size and old[2] == st.st_mtime_ns:
+                    inode = old[0]
+                else:
+                    try:
+                        inode = entry.inode()
+                    except OSError:
+                        inode = 0
+                snapshot[entry.path] = (inode, st.st_size, st.st_mtime_ns)
+
+                if count % self.chunk == 0 and self.max_cpu < 1.0:
+                    cpu = time.thread_time() - cpu_start
+                    wall = time.perf_counter() - wall_start
+                    excess = cpu / self.max_cpu - wall
+                    if excess > 0:
+                        throttled += excess
+                        if pause(excess):
+                            return None
+
+        self.last_scan_seconds = time.perf_counter() - wall_start
+        self.last_scan_cpu = time.thread_time() - cpu_start
+        self.last_scan_throttled = throttled
+        return snapshot
+
+
+class AdaptiveInterval:
+    """Polls fast while changes are seen, backs off geometrically while idle."""
+    def __init__(self, minimum=0.25, maximum=5.0, factor=2.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.current = minimum
+
+    def update(self, active):
+        if active:
+            self.current = self.minimum
+        else:
+            self.current = min(self.maximum, self.current * self.factor)
+        return self.current
+
+
+class AdaptivePollingEmitter(EventEmitter):
+    """
+    Polling emitter for folders where native notifications are unreliable
+    (SMB shares, virtualized folders). Emits the same events as the native
+    observer, so DownloadHandler works unchanged.
+    """
+    def __init__(self, event_queue, watch, timeout=1.0, min_interval=0.25, max_interval=5.0,
+                 max_cpu=0.2, **kwargs):
+        super().__init__(event_queue, watch, timeout=timeout, **kwargs)
+        self.scanner = SnapshotScanner(watch.path, max_cpu=max_cpu)
+        self.interval = AdaptiveInterval(min_interval, max_interval)
+        self._snapshot = {}
+        self._dir_mtime = None
+        self._last_full_scan = 0.0
+        self._unreachable = False
+
+    def on_thread_start(self):
+        try:
+            self._dir_mtime = os.stat(self.watch.path).st_mtime_ns
+            self._snapshot = self.scanner.scan(pause=self.stopped_event.wait) or {}
+            self._last_full_scan = time.monotonic()
+        except OSError as e:
+            print(f"Polling: initial scan of {self.watch.path} failed: {e}")
+
+    def queue_events(self, timeout):
+        # Never poll again sooner than one scan's I/O takes (huge folders on slow shares);
+        # time slept by the CPU cap already spaced the scans out.
+        io_time = self.scanner.last_scan_seconds - self.scanner.last_scan_throttled
+        if self.stopped_event.wait(max(self.interval.current, io_time)):
+            return
+
+        try:
+            # Fast path: creates, deletes and renames bump the folder's mtime. Content-only
+            # changes (and lazy SMB directory caches) are caught by the periodic full scan.
+            dir_mtime = os.stat(self.watch.path).st_mtime_ns
+            if dir_mtime == self._dir_mtime and time.monotonic() - self._last_full_scan < self.interval.maximum:
+                self.interval.update(False)
+                return
+            started = time.monotonic()
+            snapshot = self.scanner.scan(self._snapshot, pause=self.stopped_event.wait)
+        except OSError as e:
+            # Share temporarily gone: keep the old snapshot and retry at the slowest pace.
+            if not self._unreachable:
+                print(f"Polling: {self.watch.path} unreachable ({e}), retrying...")
+                self._unreachable = True
+            self.interval.current = self.interval.maximum
+            return
+        if snapshot is None: # Stopped mid-scan
+            return
+        self._dir_mtime = dir_mtime
+        self._last_full_scan = started
+        if self._unreachable:
+            print(f"Polling: {self.watch.path} reachable again.")
+            self._unreachable = False
+
+        created, deleted, modified, moved = diff_snapshots(self._snapshot, snapshot)
+        self._snapshot = snapshot
+
+        for path in deleted:
+            self.queue_event(FileDeletedEvent(path))
+        for path in modified:
+            self.queue_event(FileModifiedEvent(path))
+        for path in created:
+            self.queue_event(FileCreatedEvent(path))
+        for src, dest in moved:
+            self.queue_event(FileMovedEvent(src, dest))
+
+        self.interval.update(bool(created or deleted or modified or moved))
+
+
+class AdaptivePollingObserver(BaseObserver):
+    """Drop-in replacement for watchdog's Observer that polls with AdaptivePollingEmitter."""
+    def __init__(self, min_interval=0.25, max_interval=5.0, max_cpu=0.2):
+        emitter = partial(AdaptivePollingEmitter, min_interval=min_interval,
+                          max_interval=max_interval, max_cpu=max_cpu)
+        super().__init__(emitter, timeout=min_interval)
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(**polling_options(settings))
+
+
+def polling_options(settings):
+    return {"min_interval": float(settings.get("poll_min_interval", 0.25)),
+            "max_interval": float(settings.get("poll_max_interval", 5.0)),
+            "max_cpu": float(settings.get("poll_max_cpu", 0.2))}
+
+
+def is_network_path(path):
+    """True for UNC paths and mapped network drives (Windows only)."""
+    if os.name != 'nt':
+        return False
+    path = os.path.abspath(path)
+    if path.startswith('\\\\'):
+        return True
+    try:
+        import ctypes
+        DRIVE_REMOTE = 4
+        return ctypes.windll.kernel32.GetDriveTypeW(os.path.splitdrive(path)[0] + '\\') == DRIVE_REMOTE
+    except Exception:
+        return False
@@ -0,0 +1,222 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+
+
+class ReadinessPolicy:
+    """
+    When is a download finished? Instead of fixed constants (0.2 s x 3 checks,
+    30 s cap) the wait adapts to how each file is being written:
+    - A file that does not grow while watched (e.g. renamed from .crdownload
+      when complete) only needs 'min_quiet' seconds of stable size.
+    - A file seen growing has a live writer: it needs a quiet period of
+      'gap_factor' x the longest pause the writer made between writes,
+      at least 'growing_quiet' and at most 'max_quiet', so bursty network
+      downloads are not cut off mid-stall. (On Windows the lock check below
+      still catches writers that hold the file open.)
+    - There is no timeout while a file keeps growing (only 'max_wait' as a
+      safety net), so slow multi-GB downloads are never dropped.
+    - Polling runs about three times per quiet period, between
+      'min_interval' and 'max_interval'.
+    """
+    def __init__(self, min_quiet=0.3, growing_quiet=1.0, max_quiet=10.0, gap_factor=2.0, zero_grace=5.0,
+                 lock_timeout=10.0, max_wait=6 * 3600, min_interval=0.05, max_interval=1.0):
+        self.min_quiet = min_quiet
+        self.growing_quiet = growing_quiet
+        self.max_quiet = max_quiet
+        self.gap_factor = gap_factor
+        self.zero_grace = zero_grace
+        self.lock_timeout = lock_timeout
+        self.max_wait = max_wait
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            min_quiet=float(settings.get("ready_min_quiet_seconds", 0.3)),
+            growing_quiet=float(settings.get("ready_growing_quiet_seconds", 1.0)),
+            max_quiet=float(settings.get("ready_max_quiet_seconds", 10.0)),
+            zero_grace=float(settings.get("ready_zero_byte_grace_seconds", 5.0)),
+            lock_timeout=float(settings.get("ready_lock_timeout_seconds", 10.0)),
+            max_wait=float(settings.get("ready_max_wait_seconds", 6 * 3600)),
+        )
+
+    def quiet_needed(self, tracker):
+        if not tracker.grew:
+            return self.min_quiet
+        return min(self.max_quiet, max(self.growing_quiet, self.gap_factor * tracker.max_gap))
+
+    def interval(self, quiet):
+        return min(self.max_interval, max(self.min_interval, quiet / 3))
+
+
+class ReadinessTracker:
+    """
+    Per-file state of one readiness check: observed size, growth rate and
+    the writer's longest pause. ready/reason hold the verdict:
+    reason is None when ready, else "gone", "locked" or "timeout".
+    """
+    def __init__(self, file_path, policy):
+        self.file_path = file_path
+        self.policy = policy
+        self.size = None
+        self.grew = False
+        self.max_gap = 0.0 # Longest pause between two observed growths (decays slowly)
+        self.rate = 0.0 # Bytes/s, smoothed
+        self.phase = "stability"
+        self.ready = False
+        self.reason = None
+        self.waited = 0.0
+
+    def __repr__(self):
+        return (f"<{self.phase}: size={self.size}, rate={self.rate / 1024:.0f} KB/s, "
+                f"max_gap={self.max_gap:.2f}s, quiet={self.policy.quiet_needed(self):.2f}s, waited={self.waited:.1f}s>")
+
+    def _sample(self, now, last_change):
+        """Reads the size; returns the new last-change time (raises FileNotFoundError)."""
+        size = os.path.getsize(self.file_path)
+        if size == self.size:
+            return last_change
+        if self.size == 0 and size > 0:
+            # First data in a placeholder counts as first sight: the time it sat
+            # empty says nothing about the writer (further growth still does).
+            pass
+        elif self.size is not None and size > self.size:
+            gap = now - last_change
+            rate = (size - self.size) / max(gap, 1e-3)
+            self.rate = 0.7 * self.rate + 0.3 * rate if self.rate else rate
+            self.max_gap = max(self.max_gap * 0.9, gap)
+            self.grew = True
+        self.size = size
+        return now
+
+    def wait(self, busy_check=None):
+        """Blocks until the file is stable and unlocked (or fails). Returns self.ready."""
+        for delay in self.steps(busy_check):
+            time.sleep(delay)
+        return self.ready
+
+    def steps(self, busy_check=None):
+        """
+        The check as a generator: each next() probes the file and yields how
+        long to sleep before the next probe; it ends with ready/reason set.
+        wait() drives it with time.sleep, the asyncio engine with asyncio.sleep.
+        """
+        policy = self.policy
+        started = last_change = time.monotonic()
+        zero_since = None
+        try:
+            while True:
+                # Phase 1: size stability
+                self.phase = "stability"
+                while True:
+                    now = time.monotonic()
+                    self.waited = now - started
+                    last_change = self._sample(now, last_change)
+                    quiet = policy.quiet_needed(self)
+                    interval = policy.interval(quiet)
+                    if self.waited > policy.max_wait:
+                        self.reason = "timeout"
+                        return
+
+                    if self.size == 0:
+                        # Placeholder (e.g. Innorix pre-creates files): wait while the
+                        # batch is still downloading, else a short grace period.
+                        zero_since = zero_since or now
+                        if busy_check is not None and busy_check(self.file_path):
+                            zero_since = now
+                        if now - zero_since < policy.zero_grace:
+                            self.phase = "zero-byte"
+                            yield max(interval, 0.2)
+                            continue
+                    else:
+                        zero_since = None
+
+                    if now - last_change >= quiet:
+                        break
+                    yield interval
+
+                # Phase 2: lock check (renaming to itself fails on Windows while a writer holds it)
+                self.phase = "lock"
+                lock_started = time.monotonic()
+                delay = policy.min_interval
+                size_before = self.size
+                while True:
+                    try:
+                        os.rename(self.file_path, self.file_path)
+                        self.ready = True
+                        return
+                    except FileNotFoundError:
+                        raise
+                    except OSError:
+                        pass
+                    if time.monotonic() - lock_started > policy.lock_timeout:
+                        self.reason = "locked"
+                        return
+                    yield delay
+                    delay = min(delay * 2, policy.max_interval)
+                    now = time.monotonic()
+                    last_change = self._sample(now, last_change)
+                    if self.size != size_before:
+                        break # Still being written: back to the stability phase
+        except FileNotFoundError:
+            self.reason = "gone" # Renamed or deleted (a rename arrives as its own event)
+        finally:
+            self.waited = time.monotonic() - started
+
+
+class RetryQueue:
+    """
+    Files that failed readiness (still locked, or growing past max_wait) are
+    checked again after increasing delays instead of being dropped.
+    on_retry(file_path, attempt) is called from the queue's thread when due.
+    """
+    def __init__(self, on_retry, delays=(5, 15, 45, 120, 300)):
+        self.on_retry = on_retry
+        self.delays = tuple(delays)
+        self._heap = []
+        self._queued = set()
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def add(self, file_path, attempt):
+        """Schedules retry number 'attempt' (1-based). Returns the delay, or None when out of retries."""
+        if attempt > len(self.delays):
+            return None
+        delay = self.delays[attempt - 1]
+        with self._cond:
+            if file_path in self._queued:
+                return delay
+            self._queued.add(file_path)
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), file_path, attempt))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ready-retry", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return delay
+
+    def pending(self):
+        with self._cond:
+            return len(self._heap)
+
+    def scheduled(self, file_path):
+        with self._cond:
+            return file_path in self._queued
+
+    def _run(self):
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                if not self._heap or self._heap[0][0] > now:
+                    self._cond.wait(self._heap[0][0] - now if self._heap else None)
+                    continue
+                _, _, file_path, attempt = heapq.heappop(self._heap)
+                self._queued.discard(file_path)
+            try:
+                self.on_retry(file_path, attempt)
+            except Exception as e:
+                print(f"Retry error for {file_path}: {e}")
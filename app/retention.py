@@ -0,0 +1,301 @@
+import json
+import os
+import shutil
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from app.folder_map import record_id_of
+from app.integrity import member_target
+from app.iopriority import lower_process_priority
+from app.utils import format_size
+
+DAY = 24 * 3600
+SAMPLE_BYTES = 64 * 1024 # Per file, to estimate how well a loose tree compresses
+
+
+def _tree_files(tree):
+    """{normcase relative path: size} of every file under tree, and the newest mtime."""
+    files, newest = {}, os.path.getmtime(tree)
+    for dirpath, dirnames, filenames in os.walk(tree):
+        for name in dirnames:
+            newest = max(newest, os.path.getmtime(os.path.join(dirpath, name)))
+        for name in filenames:
+            st = os.stat(os.path.join(dirpath, name))
+            files[os.path.normcase(os.path.relpath(os.path.join(dirpath, name), tree))] = st.st_size
+            newest = max(newest, st.st_mtime)
+    return files, newest
+
+
+def _zip_sizes(zip_path):
+    """{normcase member path: size} from the central directory (nothing is inflated)."""
+    with zipfile.ZipFile(zip_path, "r") as zip_ref:
+        return {os.path.normcase(member_target(i, "")): i.file_size for i in zip_ref.infolist() if not i.is_dir()}
+
+
+def is_redundant(tree_files, zip_path):
+    """True if every file of the tree is in the ZIP with the same size (the tree can be re-extracted)."""
+    try:
+        members = _zip_sizes(zip_path)
+    except (OSError, zipfile.BadZipFile):
+        return False
+    return all(members.get(path) == size for path, size in tree_files.items())
+
+
+def matches_content(tree, tree_files, zip_path):
+    """
+    True if every file of the tree has the CRC-32 of its ZIP member: catches
+    edits that kept the file size. Only the tree is read (CRCs come from the
+    central directory).
+    """
+    try:
+        with zipfile.ZipFile(zip_path, "r") as zip_ref:
+            crcs = {os.path.normcase(member_target(i, "")): i.CRC for i in zip_ref.infolist() if not i.is_dir()}
+    except (OSError, zipfile.BadZipFile):
+        return False
+    for path in tree_files:
+        crc = 0
+        try:
+            with open(os.path.join(tree, path), "rb") as f:
+                while True:
+                    chunk = f.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    crc = zlib.crc32(chunk, crc)
+        except OSError:
+            return False
+        if crcs.get(path) != crc:
+            return False
+    return True
+
+
+def _estimate_compressed(tree, tree_files):
+    """Compressed size of a tree, extrapolated from the first SAMPLE_BYTES of each file."""
+    total = 0
+    for path, size in tree_files.items():
+        try:
+            with open(os.path.join(tree, path), "rb") as f:
+                sample = f.read(SAMPLE_BYTES)
+        except OSError:
+            total += size
+            continue
+        ratio = len(zlib.compress(sample, 1)) / len(sample) if sample else 1.0
+        total += int(size * min(1.0, ratio))
+    return total
+
+
+def plan_folder(folder, cutoff, repack):
+    """
+    Compaction actions for one [ID]_Title folder (runs in a worker process):
+    - "drop": a tree next to "<tree>.zip" that holds all of its files
+    - "repack": a loose tree with no ZIP of that name
+    Returns None if the folder was touched after cutoff.
+    """
+    actions = []
+    newest = os.path.getmtime(folder)
+    trees = []
+    with os.scandir(folder) as it:
+        entries = list(it)
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            files, tree_newest = _tree_files(entry.path)
+            newest = max(newest, tree_newest)
+            trees.append((entry, files))
+        else:
+            newest = max(newest, entry.stat(follow_symlinks=False).st_mtime)
+    if newest >= cutoff:
+        return None
+
+    names = {os.path.normcase(e.name) for e in entries}
+    for entry, files in trees:
+        size = sum(files.values())
+        zip_path = entry.path + ".zip"
+        if os.path.normcase(entry.name + ".zip") in names:
+            if is_redundant(files, zip_path):
+                actions.append({"kind": "drop", "tree": entry.path, "zip": zip_path, "bytes": size, "saved": size})
+        elif repack and files:
+            saved = size - _estimate_compressed(entry.path, files)
+            actions.append({"kind": "repack", "tree": entry.path, "zip": zip_path, "bytes": size, "saved": saved})
+    return {"folder": folder, "newest": newest, "actions": actions}
+
+
+def _repack(tree, zip_path):
+    """Packs tree into zip_path (written as .partial, renamed when complete)."""
+    partial = zip_path + ".partial"
+    with zipfile.ZipFile(partial, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as zip_ref:
+        for dirpath, dirnames, filenames in os.walk(tree):
+            dirnames.sort()
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                zip_ref.write(path, os.path.relpath(path, tree).replace(os.sep, "/"))
+    os.replace(partial, zip_path)
+    shutil.copystat(tree, zip_path)
+
+
+def compact_folder(plan):
+    """
+    Applies one folder's plan (runs in a worker process). Every step can be
+    interrupted: a stale .partial is rewritten, and a tree is only deleted
+    after its files were checked against the ZIP again, by size and CRC-32.
+    Returns (bytes freed, [messages]).
+    """
+    freed, messages = 0, []
+    for action in plan["actions"]:
+        tree, zip_path = action["tree"], action["zip"]
+        try:
+            if not os.path.isdir(tree):
+                continue
+            if action["kind"] == "repack" and not os.path.exists(zip_path):
+                _repack(tree, zip_path)
+                messages.append(f"repacked {os.path.basename(tree)} -> {format_size(os.path.getsize(zip_path))}")
+            files, _ = _tree_files(tree)
+            if not is_redundant(files, zip_path) or not matches_content(tree, files, zip_path):
+                messages.append(f"kept {os.path.basename(tree)}: differs from {os.path.basename(zip_path)}")
+                continue
+            shutil.rmtree(tree)
+            freed += sum(files.values())
+            if action["kind"] == "repack":
+                freed -= os.path.getsize(zip_path)
+            messages.append(f"removed {os.path.basename(tree)} ({format_size(sum(files.values()))})")
+        except Exception as e:
+            messages.append(f"error on {os.path.basename(tree)}: {e}")
+    return freed, messages
+
+
+def record_folders(roots):
+    for root in roots:
+        try:
+            with os.scandir(root) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False) and record_id_of(entry.name):
+                        yield entry.path
+        except OSError as e:
+            print(f"Retention: cannot list {root}: {e}")
+
+
+class RetentionJob:
+    """
+    Compacts [ID]_Title folders nobody touched for 'days':
+    - an extracted tree is deleted when the ZIP next to it still holds every
+      file (process_zip_workflow always keeps the ZIP),
+    - with 'repack', loose trees without a ZIP are packed into one first.
+    Scanning and compaction run in a process pool at idle priority.
+    A run with apply=True writes the folders it still has to do to
+    retention_state.json; an interrupted run resumes them first next time.
+    """
+    def __init__(self, roots, days=90, repack=False, workers=2, state_path=None):
+        self.roots = list(roots)
+        self.days = days
+        self.repack = repack
+        self.workers = max(1, int(workers))
+        if state_path is None:
+            from app.settings import SettingsManager
+            state_path = os.path.join(SettingsManager().settings_dir, "retention_state.json")
+        self.state_path = state_path
+
+    @classmethod
+    def from_settings(cls, settings):
+        roots = [settings.get("watch_folder") or os.path.join(os.path.expanduser("~"), "Downloads")]
+        roots += [r["path"] for r in settings.get("watch_roots", []) if isinstance(r, dict) and r.get("path")]
+        return cls(roots, days=float(settings.get("retention_days", 90)),
+                   repack=bool(settings.get("retention_repack", False)),
+                   workers=settings.get("retention_workers", 2))
+
+    def _load_pending(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f).get("pending", [])
+        except (OSError, ValueError):
+            return []
+
+    def _save_pending(self, pending):
+        temp = self.state_path + ".tmp"
+        with open(temp, "w", encoding="utf-8") as f:
+            json.dump({"updated": time.time(), "pending": pending}, f, indent=1, ensure_ascii=False)
+        os.replace(temp, self.state_path)
+
+    def run(self, apply=False):
+        """Plans every folder (dry run) or compacts them. Returns the report dict."""
+        cutoff = time.time() - self.days * DAY
+        resumed = self._load_pending() if apply else []
+        folders = list(dict.fromkeys(resumed + list(record_folders(self.roots))))
+        report = {"folders": len(folders), "stale": 0, "resumed": len(resumed), "drop": [0, 0], "repack": [0, 0],
+                  "reclaimable": 0, "freed": 0, "messages": []}
+        if resumed:
+            print(f"Retention: resuming {len(resumed)} folder(s) from an interrupted run")
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=lower_process_priority) as pool:
+            # Resumed folders skip the age check: the interrupted run itself touched them
+            cutoffs = [float("inf") if f in resumed else cutoff for f in folders]
+            plans = [p for p in pool.map(plan_folder, folders, cutoffs, [self.repack] * len(folders))
+                     if p and p["actions"]]
+            for plan in plans:
+                report["stale"] += 1
+                for action in plan["actions"]:
+                    report[action["kind"]][0] += 1
+                    report[action["kind"]][1] += action["bytes"]
+                    report["reclaimable"] += max(0, action["saved"])
+            if not apply:
+                report["plans"] = plans
+                return report
+
+            pending = [p["folder"] for p in plans]
+            self._save_pending(pending)
+            for plan, (freed, messages) in zip(plans, pool.map(compact_folder, plans)):
+                report["freed"] += freed
+                report["messages"] += [f"{os.path.basename(plan['folder'])}: {m}" for m in messages]
+                pending.remove(plan["folder"])
+                self._save_pending(pending)
+        return report
+
+
+def print_report(report, apply):
+    drop, repack = report["drop"], report["repack"]
+    print(f"Scanned {report['folders']} record folder(s), {report['stale']} with something to compact.")
+    print(f"  extracted trees with their ZIP: {drop[0]} ({format_size(drop[1])})")
+    if repack[0]:
+        print(f"  loose trees to repack: {repack[0]} ({format_size(repack[1])})")
+    print(f"Reclaimable: about {format_size(report['reclaimable'])}")
+    for plan in report.get("plans", []):
+        for action in plan["actions"]:
+            print(f"    {action['kind']:<6} {action['tree']} ({format_size(action['bytes'])})")
+    for message in report["messages"]:
+        print(f"    {message}")
+    if apply:
+        print(f"Freed {format_size(report['freed'])}.")
+
+
+class RetentionScheduler:
+    """Runs the retention job in the background: once after 'delay', then every 'interval' seconds."""
+    def __init__(self, job, interval=DAY, delay=600):
+        self.job = job
+        self.interval = interval
+        self.delay = delay
+        self.stop_event = threading.Event()
+
+    @classmethod
+    def from_settings(cls, settings):
+        if not settings.get("retention_enabled", False):
+            return None
+        return cls(RetentionJob.from_settings(settings),
+                   interval=float(settings.get("retention_interval_hours", 24)) * 3600)
+
+    def start(self):
+        threading.Thread(target=self._run, name="retention", daemon=True).start()
+        print(f"Retention: folders untouched for {self.job.days:g} days are compacted every "
+              f"{self.interval / 3600:g}h")
+
+    def _run(self):
+        wait = self.delay
+        while not self.stop_event.wait(wait):
+            wait = self.interval
+            try:
+                report = self.job.run(apply=True)
+                print(f"Retention: freed {format_size(report['freed'])} in {report['stale']} folder(s)")
+            except Exception as e:
+                print(f"Retention error: {e}")
+
+    def stop(self):
+        self.stop_event.set()
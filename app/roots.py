@@ -0,0 +1,79 @@
+import os
+from watchdog.observers import Observer
+
+from app.locks import path_key
+from app.polling import AdaptivePollingEmitter, is_network_path
+
+# Per-root keys that override the global settings for files arriving in that root
+ROOT_OVERRIDE_KEYS = ("auto_unzip", "extract_filters", "extraction_backend", "target_base")
+
+
+class WatchRoot:
+    """
+    One watched folder, e.g. the browser's Downloads, the Innorix download
+    folder or a scanner drop folder. Stored in settings as a "watch_roots" entry:
+        {"path": "D:/Innorix", "label": "Innorix", "backend": "auto", "auto_unzip": false}
+    """
+    def __init__(self, path, label=None, backend=None, enabled=True, overrides=None):
+        self.path = os.path.abspath(path)
+        self.label = label or os.path.basename(self.path.rstrip("\\/")) or self.path
+        self.backend = backend # None -> global "watch_backend"
+        self.enabled = enabled
+        self.overrides = overrides or {}
+        self.watch = None # ObservedWatch while scheduled
+
+    @property
+    def key(self):
+        return path_key(self.path)
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, str):
+            data = {"path": data}
+        overrides = {k: data[k] for k in ROOT_OVERRIDE_KEYS if k in data}
+        return cls(data["path"], data.get("label"), data.get("backend"), data.get("enabled", True), overrides)
+
+    def to_dict(self):
+        data = {"path": self.path, "label": self.label, "enabled": self.enabled}
+        if self.backend:
+            data["backend"] = self.backend
+        data.update(self.overrides)
+        return data
+
+    def wants_polling(self, default_backend):
+        backend = self.backend or default_backend
+        return backend == "polling" or (backend == "auto" and is_network_path(self.path))
+
+
+class WatchEngine(Observer):
+    """
+    A single observer (one dispatch thread, one handler) for every watch root.
+    Each root gets its own emitter: the platform's native one, or an adaptive
+    polling emitter for roots marked as polling. Roots are scheduled and
+    unscheduled individually, so the others keep running.
+    """
+    def __init__(self, polling_options=None):
+        super().__init__()
+        self.polling_options = polling_options or {}
+        self._polling_keys = set()
+        native_emitter = self._emitter_class
+
+        def emitter_for(event_queue, watch, **kwargs):
+            if path_key(watch.path) in self._polling_keys:
+                return AdaptivePollingEmitter(event_queue, watch, **self.polling_options, **kwargs)
+            return native_emitter(event_queue, watch, **kwargs)
+        self._emitter_class = emitter_for
+
+    def schedule_root(self, handler, root, polling=False):
+        if polling:
+            self._polling_keys.add(root.key)
+        else:
+            self._polling_keys.discard(root.key)
+        root.watch = self.schedule(handler, root.path, recursive=False)
+        return root.watch
+
+    def unschedule_root(self, root):
+        if root.watch is not None:
+            self.unschedule(root.watch)
+            root.watch = None
+        self._polling_keys.discard(root.key)
@@ -0,0 +1,159 @@
+import os
+import threading
+import weakref
+from app.locks import path_key
+
+
+class NameSet(set):
+    # set subclass so it can live in a WeakValueDictionary
+    pass
+
+
+class Route:
+    """
+    Pre-resolved routing decision for one source folder under one context.
+    Holds everything a file needs to be filed: the (already created) target
+    directory, the strategy flags and the target's name-collision state.
+    """
+    def __init__(self, target_dir, folder_name, auto_unzip, extract_filters, existing_names,
+                 extraction_backend="inline", record=None, context=None):
+        self.target_dir = target_dir
+        self.folder_name = folder_name
+        # PLM record the folder belongs to: plm_id / defect_id / title (for the search index)
+        self.record = record or {}
+        # Snapshot of the PLM context the route was built for (manifest entries)
+        self.context = context
+        self.auto_unzip = auto_unzip
+        self.extract_filters = extract_filters
+        self.extraction_backend = extraction_backend
+        # Lower-cased names known to exist in target_dir (Windows is case-insensitive).
+        # Shared by every live Route to the same folder; mutated only under its folder lock.
+        self.names = existing_names
+
+    def claim_name(self, name, timestamp):
+        """
+        Picks a free destination path for name and reserves it.
+        Same suffix scheme as Organizer.unique_destination, but answered
+        from the in-memory name set; Organizer.claim_destination confirms
+        the result on disk.
+        Caller must hold the target folder lock.
+        """
+        candidate = name
+        if candidate.lower() in self.names:
+            base, ext = os.path.splitext(name)
+            candidate = f"{base}_{timestamp}{ext}"
+            counter = 1
+            while candidate.lower() in self.names:
+                candidate = f"{base}_{timestamp}_{counter}{ext}"
+                counter += 1
+        self.names.add(candidate.lower())
+        return os.path.join(self.target_dir, candidate)
+
+    def release_name(self, destination):
+        """Forget a claimed name whose move did not happen."""
+        self.names.discard(os.path.basename(destination).lower())
+
+
+class RoutingCache:
+    """
+    Routes keyed on (context version, settings version, source folder).
+    A change to either version drops every cached route, so the per-file
+    fast path is a single dict lookup.
+    """
+    def __init__(self, context_manager, settings_manager, dir_locks, folder_map=None):
+        self.context_manager = context_manager
+        self.settings_manager = settings_manager
+        self.dir_locks = dir_locks
+        # Optional record ID -> canonical folder map (retitled records keep their folder)
+        self.folder_map = folder_map
+        self._routes = {}
+        self._versions = None
+        self._lock = threading.Lock()
+        # One name set per target folder, kept alive by the routes using it, so
+        # an in-flight file holding an older Route still sees new claims.
+        self._names = weakref.WeakValueDictionary()
+        # Per watch-root settings (path_key -> dict) that take precedence over settings.json
+        self._overrides = {}
+
+    def resolve(self, base_dir):
+        """Returns the Route for files arriving in base_dir, or None without a context."""
+        key = (self.context_manager.version, self.settings_manager.revision, base_dir)
+        route = self._routes.get(key)
+        if route is not None:
+            return route
+
+        with self._lock:
+            versions = key[:2]
+            if versions != self._versions:
+                self._routes = {}
+                self._versions = versions
+            if key not in self._routes:
+                self._routes[key] = self._build(base_dir)
+            return self._routes[key]
+
+    def set_overrides(self, base_dir, overrides):
+        """Per-root settings for files arriving in base_dir (None removes them)."""
+        with self._lock:
+            if overrides:
+                self._overrides[path_key(base_dir)] = dict(overrides)
+            else:
+                self._overrides.pop(path_key(base_dir), None)
+            self._routes = {}
+            self._versions = None
+
+    def _setting(self, base_dir, key, default):
+        overrides = self._overrides.get(path_key(base_dir))
+        if overrides and key in overrides:
+            return overrides[key]
+        return self.settings_manager.get(key, default)
+
+    def invalidate(self):
+        with self._lock:
+            self._routes = {}
+            self._versions = None
+
+    def snapshot(self):
+        """{source folder: target folder} of the routes built for the current context (warm state)."""
+        with self._lock:
+            return {key[2]: route.target_dir for key, route in self._routes.items()
+                    if route is not None and key[:2] == self._versions}
+
+    def _build(self, base_dir):
+        context = self.context_manager.get_context()
+        folder_name = context.get('folder_name') if context else None
+        if not folder_name:
+            return None
+
+        # Files are filed next to where they arrived unless the root says otherwise.
+        target_base = self._setting(base_dir, "target_base", None) or base_dir
+        if self.folder_map is not None and self._setting(base_dir, "reuse_record_folders", True):
+            canonical = self.folder_map.canonical(target_base, folder_name)
+            if canonical != folder_name:
+                print(f"Record already has a folder, reusing: {canonical}")
+                folder_name = canonical
+        target_dir = os.path.join(target_base, folder_name)
+        dir_key = path_key(target_dir)
+        with self.dir_locks.hold(dir_key):
+            if not os.path.exists(target_dir):
+                os.makedirs(target_dir, exist_ok=True)
+                print(f"Created directory: {target_dir}")
+            existing = self._names.get(dir_key)
+            if existing is None:
+                existing = NameSet()
+                self._names[dir_key] = existing
+            # Refresh in place (one listing per route build, not per file)
+            existing.clear()
+            existing.update(name.lower() for name in os.listdir(target_dir))
+        if self.folder_map is not None:
+            self.folder_map.remember(target_base, folder_name)
+
+        return Route(
+            target_dir=target_dir,
+            folder_name=folder_name,
+            auto_unzip=self._setting(base_dir, "auto_unzip", True),
+            extract_filters=self._setting(base_dir, "extract_filters", []),
+            existing_names=existing,
+            extraction_backend=self._setting(base_dir, "extraction_backend", "inline"),
+            record={k: context.get(k) for k in ("plm_id", "defect_id", "title") if context.get(k)},
+            context=dict(context),
+        )
@@ -0,0 +1,109 @@
+import itertools
+import queue
+import threading
+
+
+class Lane:
+    """
+    A worker pool with its own queue. Jobs are ordered by cost bucket
+    (powers of two), FIFO within a bucket: near shortest-job-first without
+    starving jobs of similar size.
+    """
+    job_hook = None # hook(job) runs each job instead while diagnostics profile the workers
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = max(1, int(workers))
+        self.queue = queue.PriorityQueue()
+        self.threads = []
+        self.busy = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        while len(self.threads) < self.workers:
+            t = threading.Thread(target=self._run, name=f"{self.name}-worker-{len(self.threads)}", daemon=True)
+            self.threads.append(t)
+            t.start()
+
+    def _run(self):
+        while True:
+            _, _, job = self.queue.get()
+            if job is None:
+                return
+            with self._lock:
+                self.busy += 1
+            try:
+                hook = Lane.job_hook
+                if hook is None:
+                    job()
+                else:
+                    hook(job)
+            except Exception as e:
+                print(f"Scheduler ({self.name}) job error: {e}")
+            finally:
+                with self._lock:
+                    self.busy -= 1
+                self.queue.task_done()
+
+
+class JobScheduler:
+    """
+    Size-aware scheduling for the organize stage.
+    Each file gets an estimated I/O cost (bytes to copy or inflate); cheap
+    jobs go to the 'quick' lane, expensive ones (big archive extractions,
+    cross-volume copies) to the 'heavy' lane, so a 4 GB ZIP cannot hold
+    fifty small PDFs hostage.
+    """
+    def __init__(self, quick_workers=4, heavy_workers=1, heavy_threshold=64 * 1024 * 1024):
+        self.heavy_threshold = heavy_threshold
+        self.lanes = {
+            "quick": Lane("quick", quick_workers),
+            "heavy": Lane("heavy", heavy_workers),
+        }
+        self._seq = itertools.count()
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(
+            quick_workers=settings.get("quick_lane_workers", 4),
+            heavy_workers=settings.get("heavy_lane_workers", 1),
+            heavy_threshold=int(settings.get("heavy_threshold_mb", 64)) * 1024 * 1024,
+        )
+
+    def lane_for(self, cost):
+        return self.lanes["heavy" if cost >= self.heavy_threshold else "quick"]
+
+    def submit(self, key, cost, fn, *args):
+        """
+        Queues fn(*args). 'key' (usually the file path) de-duplicates jobs that
+        are already waiting. Returns the lane name, or None if it was a duplicate.
+        """
+        with self._lock:
+            if key in self._pending:
+                return None
+            self._pending.add(key)
+
+        def job():
+            with self._lock:
+                self._pending.discard(key)
+            fn(*args)
+
+        lane = self.lane_for(cost)
+        lane.start()
+        lane.queue.put((max(0, int(cost)).bit_length(), next(self._seq), job))
+        return lane.name
+
+    def shutdown(self):
+        """Stops the workers once their queues are drained."""
+        for lane in self.lanes.values():
+            for _ in lane.threads:
+                lane.queue.put((float('inf'), next(self._seq), None))
+            lane.threads = []
+
+    def queue_depth(self):
+        return sum(lane.queue.qsize() for lane in self.lanes.values())
+
+    def in_flight(self):
+        return sum(lane.busy for lane in self.lanes.values())
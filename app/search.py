@@ -0,0 +1,248 @@
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from app.manifest import MANIFEST_NAME
+from app.store import BatchedSqliteStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    record_id TEXT,
+    plm_id TEXT,
+    defect_id TEXT,
+    title TEXT,
+    folder TEXT,
+    file_name TEXT,
+    size INTEGER,
+    mtime REAL
+);
+CREATE TABLE IF NOT EXISTS terms (
+    term TEXT NOT NULL,
+    file_id INTEGER NOT NULL,
+    PRIMARY KEY (term, file_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_terms_file ON terms(file_id);
+"""
+
+COLUMNS = ("id", "path", "record_id", "plm_id", "defect_id", "title", "folder", "file_name", "size", "mtime")
+# "[ID]_Title" folder names built by ContextManager
+_RECORD_FOLDER = re.compile(r'^\[([^\]]+)\]_?(.*)$')
+# Words: letters/digits of any script; '_' and punctuation separate ("[DF12345]_Main_Board.pdf")
+_TOKEN = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower()) if text else []
+
+
+def _prefix_end(prefix):
+    """Smallest string greater than every string starting with prefix."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def record_folder_of(path):
+    """(folder_path, record_id, title) of the nearest "[ID]_Title" ancestor, or None."""
+    folder = os.path.dirname(path)
+    while True:
+        name = os.path.basename(folder)
+        match = _RECORD_FOLDER.match(name)
+        if match:
+            return folder, match.group(1), match.group(2).replace("_", " ")
+        parent = os.path.dirname(folder)
+        if not name or parent == folder:
+            return None
+        folder = parent
+
+
+def make_entry(path, st=None, record=None):
+    """Index entry for one file: column values plus its search terms."""
+    found = record_folder_of(path)
+    if found is None:
+        return None
+    folder_path, record_id, title = found
+    record = record or {}
+    if st is None:
+        st = os.stat(path)
+
+    file_name = os.path.basename(path)
+    title = record.get("title") or title
+    terms = set(tokenize(record_id) + tokenize(title) + tokenize(file_name))
+    terms.update(tokenize(record.get("plm_id")) + tokenize(record.get("defect_id")))
+    # Sub-folders between the record folder and the file (e.g. an extracted ZIP)
+    terms.update(tokenize(os.path.relpath(os.path.dirname(path), folder_path).replace(".", " ")))
+    row = (path, record_id, record.get("plm_id"), record.get("defect_id"), title,
+           os.path.basename(folder_path), file_name, st.st_size, st.st_mtime)
+    return row, terms
+
+
+class SearchIndex(BatchedSqliteStore):
+    """
+    Incremental search index over organized files (search.db next to settings.json).
+    - Updated at move time from the organizer (no rescans); bulk_index() is a
+      one-time parallel scan for folders organized before the index existed.
+    - Search: every query token is a prefix of some term of the file
+      (PLM/defect ID parts, title words, file name words). Terms live in a
+      WITHOUT ROWID (term, file_id) table, so a prefix is one index range.
+    """
+    _instance = None
+    _lock = threading.Lock()
+    writer_name = "search-writer"
+    SELECTIVITY_CAP = 2000 # Rows counted per token when picking the driving token
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    instance = super(SearchIndex, cls).__new__(cls)
+                    instance._open(cls.default_path(), SCHEMA)
+                    cls._instance = instance
+        return cls._instance
+
+    @staticmethod
+    def default_path():
+        from app.settings import SettingsManager
+        return os.path.join(SettingsManager().settings_dir, "search.db")
+
+    # --- Writing ---------------------------------------------------------
+
+    def add(self, dest_path, record=None):
+        """Queues a moved file, or every file of a moved folder (extracted ZIPs)."""
+        entries = []
+        try:
+            if os.path.isdir(dest_path):
+                for dirpath, _, filenames in os.walk(dest_path):
+                    for name in filenames:
+                        entry = make_entry(os.path.join(dirpath, name), record=record)
+                        if entry:
+                            entries.append(entry)
+            else:
+                entry = make_entry(dest_path, record=record)
+                if entry:
+                    entries.append(entry)
+        except OSError as e:
+            print(f"Search index: cannot read {dest_path}: {e}")
+        if entries:
+            self._enqueue(entries)
+
+    def remove(self, path):
+        """Queues removal of a file, or of everything under a folder, that moved away."""
+        self._enqueue([((path,), None)])
+
+    def _write_batch(self, conn, batch):
+        for row, terms in batch:
+            if terms is None:
+                self._delete(conn, row[0])
+                continue
+            existing = conn.execute("SELECT id FROM files WHERE path = ?", (row[0],)).fetchone()
+            if existing:
+                file_id = existing[0]
+                conn.execute("UPDATE files SET record_id=?, plm_id=?, defect_id=?, title=?, folder=?, "
+                             "file_name=?, size=?, mtime=? WHERE id=?", row[1:] + (file_id,))
+                conn.execute("DELETE FROM terms WHERE file_id = ?", (file_id,))
+            else:
+                file_id = conn.execute(
+                    "INSERT INTO files (path, record_id, plm_id, defect_id, title, folder, file_name, size, mtime) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row).lastrowid
+            conn.executemany("INSERT OR IGNORE INTO terms (term, file_id) VALUES (?, ?)",
+                             [(term, file_id) for term in terms])
+
+    def _delete(self, conn, path):
+        prefix = path.rstrip("\\/") + os.sep
+        ids = [r[0] for r in conn.execute("SELECT id FROM files WHERE path = ? OR (path >= ? AND path < ?)",
+                                          (path, prefix, _prefix_end(prefix)))]
+        conn.executemany("DELETE FROM terms WHERE file_id = ?", [(i,) for i in ids])
+        conn.executemany("DELETE FROM files WHERE id = ?", [(i,) for i in ids])
+
+    def bulk_index(self, roots, workers=8, progress=None):
+        """
+        One-time indexer for existing "[ID]_Title" folders under roots.
+        Folders are scanned in parallel (network storage is latency bound);
+        the writer thread stores the entries as they come in.
+        progress(folders_done, folders_total, files_indexed) is optional.
+        Returns the number of files indexed.
+        """
+        folders = []
+        for root in roots:
+            try:
+                with os.scandir(root) as it:
+                    folders.extend(e.path for e in it if e.is_dir() and _RECORD_FOLDER.match(e.name))
+            except OSError as e:
+                print(f"Search index: cannot list {root}: {e}")
+
+        def scan(folder):
+            entries = []
+            for dirpath, _, filenames in os.walk(folder):
+                for name in filenames:
+                    if name == MANIFEST_NAME:
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        entry = make_entry(path)
+                    except OSError:
+                        continue
+                    if entry:
+                        entries.append(entry)
+            return entries
+
+        indexed = 0
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            futures = [pool.submit(scan, folder) for folder in folders]
+            for done, future in enumerate(as_completed(futures), 1):
+                entries = future.result()
+                self._enqueue(entries)
+                indexed += len(entries)
+                if progress:
+                    progress(done, len(folders), indexed)
+        self.flush(timeout=None)
+        return indexed
+
+    # --- Reading ---------------------------------------------------------
+
+    def search(self, text, limit=200):
+        """Files matching every token of text as a term prefix, most recently indexed first."""
+        tokens = set(tokenize(text))
+        if not tokens:
+            return []
+        conn = self._connection()
+        # Drive the query from the rarest token; the others are per-candidate
+        # EXISTS probes on (file_id, term), so common words never get materialized.
+        counts = {t: conn.execute("SELECT COUNT(*) FROM (SELECT 1 FROM terms WHERE term >= ? AND term < ? LIMIT ?)",
+                                  (t, _prefix_end(t), self.SELECTIVITY_CAP)).fetchone()[0]
+                  for t in tokens}
+        driver = min(tokens, key=lambda t: (counts[t], -len(t)))
+        if counts[driver] == 0:
+            return []
+
+        probe = "EXISTS (SELECT 1 FROM terms WHERE file_id = files.id AND term >= ? AND term < ?)"
+        if counts[driver] >= self.SELECTIVITY_CAP:
+            # Every token is common: walking files newest-first hits 'limit' matches quickly.
+            clauses, params = [], []
+            for token in tokens:
+                clauses.append(probe)
+                params += [token, _prefix_end(token)]
+            sql = f"SELECT {', '.join(COLUMNS)} FROM files WHERE " + " AND ".join(clauses)
+        else:
+            sql = (f"SELECT {', '.join(COLUMNS)} FROM files WHERE "
+                   "id IN (SELECT file_id FROM terms WHERE term >= ? AND term < ?)")
+            params = [driver, _prefix_end(driver)]
+            for token in tokens - {driver}:
+                sql += " AND " + probe
+                params += [token, _prefix_end(token)]
+        sql += " ORDER BY id DESC LIMIT ?"
+        return conn.execute(sql, params + [limit]).fetchall()
+
+    def stats(self):
+        conn = self._connection()
+        files = conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        terms = conn.execute("SELECT COUNT(*) FROM terms").fetchone()[0]
+        return {"files": files, "terms": terms}
+
+
+def timed_search(index, text, limit=200):
+    started = time.perf_counter()
+    rows = index.search(text, limit)
+    return rows, (time.perf_counter() - started) * 1000
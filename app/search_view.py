@@ -0,0 +1,68 @@
+import datetime
+import os
+
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QLineEdit, QLabel, QTableWidget, QTableWidgetItem,
+                             QHeaderView, QAbstractItemView)
+
+from app.search import SearchIndex, timed_search
+from app.utils import format_size
+
+
+class SearchDialog(QDialog):
+    """Search-as-you-type over organized files (PLM/defect ID, title words, file names)."""
+    HEADERS = ("File", "Folder", "Size", "Modified")
+
+    def __init__(self, parent=None, index=None):
+        super().__init__(parent)
+        self.setWindowTitle("Search Organized Files")
+        self.resize(900, 520)
+        self.index = index or SearchIndex()
+
+        layout = QVBoxLayout(self)
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("DF12345, P000123, title words, file name ... (prefixes work)")
+        layout.addWidget(self.query_edit)
+
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        for col, width in enumerate((300, 320, 90)):
+            self.table.setColumnWidth(col, width)
+        self.table.doubleClicked.connect(self.open_folder)
+        layout.addWidget(self.table, 1)
+
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet("color: #aaa;")
+        layout.addWidget(self.status_label)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(120)
+        self.search_timer.timeout.connect(self.run_search)
+        self.query_edit.textChanged.connect(lambda *_: self.search_timer.start())
+
+    def run_search(self):
+        self.index.flush(timeout=1.0) # Include files still in the write queue
+        rows, ms = timed_search(self.index, self.query_edit.text())
+        self.table.setRowCount(len(rows))
+        for r, row in enumerate(rows):
+            path, size, mtime = row[1], row[8], row[9]
+            values = (row[7], row[6], format_size(size or 0),
+                      datetime.datetime.fromtimestamp(mtime).strftime("%Y-%m-%d %H:%M") if mtime else "")
+            for c, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setToolTip(path)
+                self.table.setItem(r, c, item)
+        self.rows = rows
+        self.status_label.setText(f"{len(rows)} result(s) in {ms:.1f} ms" if self.query_edit.text().strip() else "")
+
+    def open_folder(self, index):
+        path = self.rows[index.row()][1]
+        folder = os.path.dirname(path)
+        if os.path.isdir(folder) and hasattr(os, "startfile"):
+            os.startfile(folder)
@@ -0,0 +1,76 @@
+import itertools
+import threading
+import time
+
+
+class DownloadSession:
+    """A burst of downloads that share a source folder and a destination."""
+    _ids = itertools.count(1)
+
+    def __init__(self, route):
+        self.id = next(self._ids)
+        self.route = route
+        self.files = []
+        self.bytes = 0
+        self.cost = 0
+        self.started = time.time()
+        self.last_added = time.monotonic()
+        self.opened = time.monotonic()
+
+    def add(self, file_path, size, cost):
+        self.files.append(file_path)
+        self.bytes += size
+        self.cost += cost
+        self.last_added = time.monotonic()
+
+
+class SessionGrouper:
+    """
+    Collects verified files into sessions keyed by (source folder, target folder).
+    A session is flushed once no new member arrived for 'window' seconds
+    (or it has been open for 'max_duration'), and handed to on_flush(session).
+    """
+    def __init__(self, on_flush, window=1.5, max_duration=30.0):
+        self.on_flush = on_flush
+        self.window = window
+        self.max_duration = max_duration
+        self._sessions = {}
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def add(self, key, route, file_path, size, cost):
+        with self._cond:
+            session = self._sessions.get(key)
+            if session is None:
+                session = DownloadSession(route)
+                self._sessions[key] = session
+            session.add(file_path, size, cost)
+
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="session-grouper", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def pending(self):
+        with self._cond:
+            return sum(len(s.files) for s in self._sessions.values())
+
+    def _due_in(self, session, now):
+        return min(session.last_added + self.window, session.opened + self.max_duration) - now
+
+    def _run(self):
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                ready = [k for k, s in self._sessions.items() if self._due_in(s, now) <= 0]
+                flushed = [self._sessions.pop(k) for k in ready]
+                if not flushed:
+                    waits = [self._due_in(s, now) for s in self._sessions.values()]
+                    self._cond.wait(min(waits) if waits else None)
+                    continue
+
+            for session in flushed:
+                try:
+                    self.on_flush(session)
+                except Exception as e:
+                    print(f"Session flush error: {e}")
@@ -1,15 +1,22 @@
 import json
 import os
 import shutil
+from threading import Lock
 
 class SettingsManager:
     _instance = None
+    _lock = Lock()
     
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(SettingsManager, cls).__new__(cls)
-            cls._instance.init_paths()
-            cls._instance.load()
+            with cls._lock:
+                if cls._instance is None:
+                    # Fully load before publishing: worker threads may race on first use.
+                    instance = super(SettingsManager, cls).__new__(cls)
+                    instance.revision = 0 # Bumped on every load/set (cache invalidation)
+                    instance.init_paths()
+                    instance.load()
+                    cls._instance = instance
         return cls._instance
 
     def init_paths(self):
@@ -44,6 +51,7 @@ class SettingsManager:
             return (0, 0, 0)
 
     def load(self):
+        self.revision += 1
         current_version = self.get_app_version()
         current_ver_tuple = self.parse_version(current_version)
 
@@ -106,4 +114,5 @@ class SettingsManager:
 
     def set(self, key, value):
         self.data[key] = value
+        self.revision += 1
         self.save()
@@ -0,0 +1,94 @@
+import queue
+import sqlite3
+import threading
+import time
+
+
+class BatchedWriter:
+    """
+    Background writer shared by the app's stores (history, search index,
+    manifest): workers only enqueue items, a single writer thread hands them
+    to _write(batch) every 'flush_interval' seconds or 'batch_size' items,
+    and flush() waits until everything queued is written.
+    """
+    writer_name = "store-writer"
+
+    def _start_writer(self, batch_size=500, flush_interval=0.25):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._writer = threading.Thread(target=self._write_loop, name=self.writer_name, daemon=True)
+        self._writer.start()
+
+    def _enqueue(self, items):
+        with self._idle:
+            self._pending += len(items)
+        for item in items:
+            self._queue.put(item)
+
+    def _write(self, batch):
+        raise NotImplementedError
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except Exception as e:
+                print(f"{self.writer_name} error ({len(batch)} items dropped): {e}")
+            with self._idle:
+                self._pending -= len(batch)
+                if self._pending == 0:
+                    self._idle.notify_all()
+
+    def flush(self, timeout=10.0):
+        """Waits until every queued item is written. Returns False on timeout."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+
+class BatchedSqliteStore(BatchedWriter):
+    """
+    Base for the app's SQLite stores (history, search index, ...):
+    - WAL mode, so the GUI/CLI can read while workers write.
+    - One connection per thread (sqlite3 connections are not shareable).
+    - Workers only enqueue items; the writer thread (BatchedWriter) hands
+      them to _write_batch(conn, batch), one transaction per batch.
+    """
+    def _open(self, path, schema, batch_size=500, flush_interval=0.25):
+        self.path = path
+        self._local = threading.local()
+
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(schema)
+        conn.close()
+
+        self._start_writer(batch_size, flush_interval)
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, batch):
+        conn = self._connection()
+        with conn:
+            self._write_batch(conn, batch)
+
+    def _write_batch(self, conn, batch):
+        raise NotImplementedError
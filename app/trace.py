@@ -0,0 +1,214 @@
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Event kinds (upper case for directories)
+KINDS = {"created": "c", "modified": "m", "moved": "v", "deleted": "d", "closed": "x"}
+OWN = 1 # Flag: caused by the organizer itself (moves out of the root, extraction folders)
+MODIFIED_SAMPLE_SECONDS = 0.05 # At most one 'modified' per path per interval (sizes stay exact)
+
+
+class TraceRecorder:
+    """
+    Records the raw watchdog event stream of DownloadHandler, plus context
+    changes and the organizer's own moves, to a gzipped JSON-lines trace
+    (<settings_dir>/traces/trace-<time>.jsonl.gz). bench.replay recreates the
+    same file operations in a temp folder.
+
+    Line 1 is a header; every other line is
+        [t, kind, root, path, size, dest, flags]   file system event
+        [t, "ctx", {plm_id, defect_id, title}]     context change
+        [t, "org", root, path, size, dest_name]    organizer moved path
+        [t, "root", root, label]                   first event in a new root
+    t is seconds since the start, paths are relative to their root.
+    With anonymize, file stems, IDs and titles are replaced by stable hashes
+    (extensions are kept, they decide how files are handled).
+
+    Only one recorder is active at a time (TraceRecorder.active); the hooks
+    in DownloadHandler and Organizer cost one attribute read when it is None.
+    """
+    active = None
+    _lock = threading.Lock()
+
+    def __init__(self, path=None, anonymize=True):
+        if path is None:
+            from app.settings import SettingsManager
+            folder = os.path.join(SettingsManager().settings_dir, "traces")
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, f"trace-{datetime.datetime.now():%Y%m%d-%H%M%S}.jsonl.gz")
+        self.path = path
+        self.anonymize = anonymize
+        self.file = None
+        self.started = 0.0
+        self.lock = threading.Lock()
+        self.roots = {} # directory -> index
+        self.claimed = set() # paths the organizer is about to move or create
+        self.last_modified = {} # path -> time of the last recorded 'modified'
+        self.events = 0
+
+    # --- Lifecycle ---------------------------------------------------------
+
+    @classmethod
+    def start(cls, path=None, anonymize=True):
+        with cls._lock:
+            if cls.active is not None:
+                print(f"Trace already recording: {cls.active.path}")
+                return cls.active
+            recorder = cls(path, anonymize)
+            recorder.file = gzip.open(recorder.path, "wt", encoding="utf-8")
+            recorder.started = time.monotonic()
+            recorder._write({"trace": 1, "started": time.time(), "anonymized": anonymize})
+            from app.context import ContextManager
+            context = ContextManager()
+            context.add_observer(recorder.on_context)
+            recorder.on_context(context.get_context()) # Context in effect at t=0
+            cls.active = recorder
+        print(f"Trace recording started: {recorder.path}")
+        return recorder
+
+    @classmethod
+    def stop(cls):
+        with cls._lock:
+            recorder, cls.active = cls.active, None
+        if recorder is None:
+            return None
+        from app.context import ContextManager
+        ContextManager().remove_observer(recorder.on_context)
+        with recorder.lock:
+            recorder.file.close()
+        print(f"Trace recording stopped: {recorder.events} events -> {recorder.path}")
+        return recorder.path
+
+    # --- Hooks -------------------------------------------------------------
+
+    def on_event(self, event):
+        """Called by DownloadHandler.dispatch for every raw watchdog event."""
+        kind = KINDS.get(event.event_type)
+        if kind is None or (event.is_directory and kind in ("m", "x")):
+            return # opened / closed_no_write / folder mtime changes: not file operations
+        src = event.src_path
+        now = time.monotonic()
+        if kind == "m" and not event.is_directory:
+            last = self.last_modified.get(src)
+            if last is not None and now - last < MODIFIED_SAMPLE_SECONDS:
+                return
+            self.last_modified[src] = now
+        elif kind in ("v", "d"):
+            self.last_modified.pop(src, None)
+
+        dest = getattr(event, "dest_path", None) if kind == "v" else None
+        flags = OWN if self._is_claimed(src) else 0
+        if flags and kind in ("v", "d"):
+            with self.lock:
+                self.claimed.discard(os.path.normcase(src))
+        size = None
+        if not event.is_directory and kind != "d":
+            try:
+                size = os.path.getsize(dest or src)
+            except OSError:
+                pass
+
+        with self.lock:
+            if self.file is None or self.file.closed:
+                return
+            root = self._root(os.path.dirname(src), now)
+            rel_dest = None
+            if dest:
+                rel_dest = os.path.relpath(dest, os.path.dirname(src))
+                if rel_dest.startswith(".."):
+                    rel_dest = None # Moved out of the root: a deletion for the replay
+            self._write([self._t(now), kind.upper() if event.is_directory else kind, root,
+                         self._name(os.path.basename(src)), size,
+                         self._rel(rel_dest) if rel_dest else None, flags])
+
+    def on_context(self, data):
+        if not data:
+            payload = {}
+        else:
+            payload = {k: data.get(k, "") for k in ("plm_id", "defect_id", "title")}
+            if self.anonymize:
+                payload = {k: self._hash_id(v) if k != "title" else (self._hash(v) if v else "") for k, v in payload.items()}
+        with self.lock:
+            if self.file is not None and not self.file.closed:
+                self._write([self._t(time.monotonic()), "ctx", payload])
+
+    def claim(self, path):
+        """The organizer is about to move or create path: its events are tagged OWN."""
+        with self.lock:
+            self.claimed.add(os.path.normcase(path))
+
+    def organized(self, source, destination):
+        now = time.monotonic()
+        try:
+            size = os.path.getsize(destination) if os.path.isfile(destination) else None
+        except OSError:
+            size = None
+        with self.lock:
+            if self.file is None or self.file.closed:
+                return
+            root = self._root(os.path.dirname(source), now)
+            self._write([self._t(now), "org", root, self._name(os.path.basename(source)), size,
+                         self._name(os.path.basename(destination))])
+
+    # --- Internals ---------------------------------------------------------
+
+    def _is_claimed(self, path):
+        key = os.path.normcase(path)
+        with self.lock:
+            if key in self.claimed:
+                return True
+            # Inside a claimed folder (an extraction in progress)
+            parent = os.path.dirname(key)
+            while parent and parent != os.path.dirname(parent):
+                if parent in self.claimed:
+                    return True
+                parent = os.path.dirname(parent)
+        return False
+
+    def _root(self, directory, now):
+        index = self.roots.get(directory)
+        if index is None:
+            index = self.roots[directory] = len(self.roots)
+            label = os.path.basename(directory.rstrip("\\/")) or directory
+            self._write([self._t(now), "root", index, self._hash(label) if self.anonymize else label])
+        return index
+
+    def _t(self, now):
+        return round(now - self.started, 3)
+
+    def _write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        if isinstance(record, list) and record[1] not in ("root", "ctx"):
+            self.events += 1
+
+    def _hash(self, text):
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()[:10]
+
+    def _hash_id(self, value):
+        if not value:
+            return ""
+        return ("DF" if value.startswith("DF") else "P") + self._hash(value)[:8]
+
+    def _name(self, name):
+        """Anonymized names keep every extension ("x.pdf.crdownload") and the context-file prefix."""
+        if not self.anonymize or name.startswith("_plm_context"):
+            return name
+        stem, dot, extensions = name.partition(".")
+        return f"f{self._hash(stem)}{dot}{extensions}" if stem else name
+
+    def _rel(self, rel):
+        parts = rel.replace("\\", "/").split("/")
+        return "/".join(self._name(p) for p in parts)
+
+
+def read_trace(path):
+    """(header, [records]) of a trace written by TraceRecorder."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("trace") != 1:
+            raise ValueError(f"Not a trace file (version {header.get('trace')!r}): {path}")
+        return header, [json.loads(line) for line in f if line.strip()]
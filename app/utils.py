@@ -0,0 +1,8 @@
+def format_size(num_bytes):
+    """Human readable byte count (e.g. 1536 -> '1.5 KB')."""
+    size = float(num_bytes or 0)
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024:
+            return f"{int(size)} B" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
@@ -0,0 +1,147 @@
+import json
+import os
+import threading
+import time
+
+from app.locks import path_key
+
+VERSION = 1
+
+
+class WarmState:
+    """
+    Small snapshot of in-memory state (warm_state.json next to settings.json)
+    so a restart is useful at once instead of waiting for the bridge:
+    - the last PLM context and when it was set,
+    - files seen but not organized yet (they get no new event after a restart),
+    - the routing decisions of the current context (source -> target folder).
+    (Record ID -> folder maps are already persisted on change by FolderMap.)
+    Written atomically (temp file + os.replace) every 'warm_state_interval_seconds'
+    when it changed, and at shutdown. At startup the context is restored from a
+    single small read; routes are warmed in the background and pending files
+    are handed to the watcher once it runs. Entries older than their max age
+    are ignored.
+    """
+    def __init__(self, handler, path=None, interval=30.0, context_max_age=3600.0, pending_max_age=24 * 3600.0):
+        self.handler = handler
+        if path is None:
+            from app.settings import SettingsManager
+            path = os.path.join(SettingsManager().settings_dir, "warm_state.json")
+        self.path = path
+        self.interval = interval
+        self.context_max_age = context_max_age
+        self.pending_max_age = pending_max_age
+        self.loaded = None
+        self.last_written = None
+        self.stop_event = threading.Event()
+
+    @classmethod
+    def from_settings(cls, settings, handler):
+        if not settings.get("warm_state_enabled", True):
+            return None
+        return cls(handler, interval=float(settings.get("warm_state_interval_seconds", 30)),
+                   context_max_age=float(settings.get("warm_context_max_age_minutes", 60)) * 60,
+                   pending_max_age=float(settings.get("warm_pending_max_age_hours", 24)) * 3600)
+
+    # --- Saving --------------------------------------------------------------
+
+    def snapshot(self):
+        from app.context import ContextManager
+        context_manager = ContextManager()
+        context = context_manager.get_context()
+        return {
+            "version": VERSION,
+            "context": {"data": context, "updated": context_manager.updated} if context else None,
+            "pending": self.handler.pending_files(),
+            "routes": self.handler.organizer.routing.snapshot(),
+        }
+
+    def save(self, force=False):
+        """Writes the snapshot if it changed since the last write. Returns True if written."""
+        state = self.snapshot()
+        if state == self.last_written and not force:
+            return False
+        temp = self.path + ".tmp"
+        try:
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(dict(state, saved=time.time()), f, indent=1, ensure_ascii=False)
+            os.replace(temp, self.path)
+        except OSError as e:
+            print(f"Error saving warm state: {e}")
+            return False
+        self.last_written = state
+        return True
+
+    def start(self):
+        threading.Thread(target=self._run, name="warm-state", daemon=True).start()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.save()
+            except Exception as e:
+                print(f"Warm state error: {e}")
+
+    def stop(self):
+        """Stops the cadence and writes the final snapshot (shutdown)."""
+        self.stop_event.set()
+        self.save(force=True)
+
+    # --- Loading -------------------------------------------------------------
+
+    def load(self):
+        """The saved snapshot (read once), or {} if missing, unreadable or of another version."""
+        if self.loaded is None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    state = json.load(f)
+                self.loaded = state if state.get("version") == VERSION else {}
+            except FileNotFoundError:
+                self.loaded = {}
+            except (OSError, ValueError, AttributeError) as e:
+                print(f"Ignoring warm state: {e}")
+                self.loaded = {}
+        return self.loaded
+
+    def restore_context(self):
+        """Reinstates the saved context unless it is older than context_max_age. Returns True if restored."""
+        from app.context import ContextManager
+        saved = self.load().get("context")
+        if not saved or not isinstance(saved.get("data"), dict):
+            return False
+        age = time.time() - float(saved.get("updated") or 0)
+        if age > self.context_max_age:
+            print(f"Warm state: last context is {age / 60:.0f} min old, not restored")
+            return False
+        if not ContextManager().restore(saved["data"], saved["updated"]):
+            return False
+        print(f"Warm state: restored context {saved['data'].get('folder_name')} ({age / 60:.0f} min old)")
+        threading.Thread(target=self._warm_routes, name="warm-routes", daemon=True).start()
+        return True
+
+    def _warm_routes(self):
+        """Builds the saved routes ahead of the first file (creates/lists the target folders)."""
+        routing = self.handler.organizer.routing
+        for base_dir in self.load().get("routes", {}):
+            if os.path.isdir(base_dir):
+                try:
+                    routing.resolve(base_dir)
+                except Exception as e:
+                    print(f"Warm state: cannot warm route for {base_dir}: {e}")
+
+    def restore_pending(self, watcher):
+        """FileWatcher.on_started: re-submits saved pending files that are still in a watched root."""
+        watcher.on_started = None # Once per process
+        now = time.time()
+        roots = set(watcher.roots)
+        restored = 0
+        for path, since in self.load().get("pending", {}).items():
+            if now - float(since) > self.pending_max_age:
+                continue
+            if path_key(os.path.dirname(path)) not in roots or not os.path.isfile(path):
+                continue
+            self.handler.track_pending(path, float(since)) # Keeps aging from when it was first seen
+            self.handler.start_process(path)
+            restored += 1
+        if restored:
+            print(f"Warm state: re-checking {restored} file(s) that were pending at shutdown")
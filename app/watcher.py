@@ -2,63 +2,235 @@ import time
 import os
 import json
 import threading
-from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from app.organizer import Organizer
+from app.scheduler import JobScheduler
+from app.session import SessionGrouper
+from app.polling import polling_options
+from app.roots import WatchEngine, WatchRoot
+from app.locks import path_key
+from app.metrics import Metrics
+from app.trace import TraceRecorder
+from app.readiness import ReadinessPolicy, ReadinessTracker, RetryQueue
+from app.download_tools import DownloadIntake
+from app.iopriority import IoController
 
 class DownloadHandler(FileSystemEventHandler):
     def __init__(self):
         self.organizer = Organizer()
+        # Verified files are organized by size-aware lanes, not by the event thread.
+        from app.settings import SettingsManager
+        settings = SettingsManager()
+        self.scheduler = JobScheduler.from_settings(settings)
+        # Batch bursts ("download all attachments") into one session per destination.
+        self.session_window = float(settings.get("session_window_seconds", 1.5))
+        self.sessions = SessionGrouper(self.submit_session, window=self.session_window,
+                                       max_duration=float(settings.get("session_max_seconds", 30.0)))
+        # Readiness timing adapts per file; files that fail it are retried later, not dropped.
+        self.readiness = ReadinessPolicy.from_settings(settings)
+        self.retries = RetryQueue(self.retry, settings.get("ready_retry_delays", [5, 15, 45, 120, 300]))
+        # Temp artifacts of download tools are dropped at event intake; each file is verified once.
+        self.intake = DownloadIntake.from_settings(settings)
+        self.intake.on_release = self.start_process
+        # Files whose copy or extraction failed verification go through the retry queue too
+        self.integrity_attempts = {}
+        # Files not organized yet (path -> first seen), for the warm-state snapshot.
+        # A path leaves it at its final outcome: moved, skipped or failed.
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.organizer.set_integrity_callback(self.requeue)
+        # Downloads still writing into a watch folder throttle extraction and copies
+        self.io = IoController()
+        self.metrics = Metrics()
+        self.metrics.gauge("plmorg_queue_depth", "Organize jobs waiting in the scheduler lanes",
+                           self.scheduler.queue_depth)
+        self.metrics.gauge("plmorg_workers_in_flight", "Organize jobs currently running", self.scheduler.in_flight)
+        self.metrics.gauge("plmorg_session_files_pending", "Files held in open download sessions",
+                           self.sessions.pending)
+        self.metrics.gauge("plmorg_ready_retries_pending", "Files waiting for another readiness check",
+                           self.retries.pending)
+        self.metrics.gauge("plmorg_io_limit_bytes_per_second", "Current extraction/copy bandwidth limit (0 = none)",
+                           self.io.current_limit)
+        self.metrics.gauge("plmorg_files_held", "Files waiting for their download tool to finish its temp files",
+                           self.intake.held_count)
 
-    def on_created(self, event):
-        if event.is_directory:
-            return
+    def dispatch(self, event):
+        recorder = TraceRecorder.active
+        if recorder is not None:
+            recorder.on_event(event)
+        if not event.is_directory and event.event_type in ("created", "modified"):
+            self.io.note_activity()
         # v1.8.7: Parallel Processing
-        # Spawn thread so one large download doesn't block checking of other files
-        threading.Thread(target=self.process, args=(event.src_path,), daemon=True).start()
+        # Spawn thread so one large download doesn't block checking of other files.
+        # Browser renames (.crdownload -> .zip) arrive as moves, Innorix merges as deletions.
+        path = self.intake.on_event(event)
+        if path is not None:
+            self.start_process(path)
 
-    def on_moved(self, event):
-        if event.is_directory:
-            return
-        # When browser finishes download (rename .crdownload -> .zip), it triggers on_moved
-        threading.Thread(target=self.process, args=(event.dest_path,), daemon=True).start()
+    def start_process(self, file_path):
+        if self.intake.begin(file_path):
+            self.track_pending(file_path)
+            threading.Thread(target=self.process, args=(file_path,), daemon=True).start()
 
-    def process(self, file_path):
-        filename = os.path.basename(file_path)
-        
+    def process(self, file_path, attempt=0):
+        """Runs one verification of file_path (started through start_process or a retry)."""
+        outcome = None
+        try:
+            outcome = self.process_file(file_path, attempt)
+        finally:
+            # A ready file is settled by its organize job
+            if outcome not in ("ready", "retry"):
+                self.settle((file_path,))
+            # A retry keeps the path claimed. If the file vanished but an event for
+            # the same name came in meanwhile (deleted and recreated), verify the new one.
+            if outcome != "retry" and self.intake.end(file_path) and outcome == "gone" and os.path.exists(file_path):
+                self.start_process(file_path)
+
+    def process_file(self, file_path, attempt):
+        """Returns "retry" when a retry was scheduled, "gone" if the file disappeared."""
         # 1. Ninja Mode: Check if this is a context bridge file
-        # Matches "_plm_context.json" or "_plm_context (1).json" etc.
-        if filename.startswith("_plm_context") and filename.endswith(".json"):
-            print(f"Ninja Mode: Received context file {filename}")
-            try:
-                # Increased delay to ensures Chrome has finished writing/unlocking
-                time.sleep(1.0) 
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    from app.context import ContextManager
-                    ContextManager().update_context(data)
-                
-                # Instantly delete to keep the folder clean
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                print(f"Ninja Mode: Success. Data from {data.get('url', 'Unknown URL')}")
-            except Exception as e:
-                print(f"Ninja Mode Error (File may be locked or malformed): {e}")
+        if self.is_context_file(file_path):
+            # Increased delay to ensures Chrome has finished writing/unlocking
+            time.sleep(1.0)
+            self.load_context_file(file_path)
             return
 
-        # 2. Ignore other temporary download files
-        ignored_exts = ['.crdownload', '.tmp', '.download', '.irx', '.partial', '.part']
-        if any(filename.lower().endswith(ext) for ext in ignored_exts):
+        # 2. Regular File Processing (temporary download files never get here, see DownloadIntake)
+        self.note_detected(file_path, attempt)
+
+        # 3. Verification Loop: Wait for file to be truly ready (Stable Size & Not Locked)
+        tracker = self.wait_for_file_ready(file_path)
+        outcome = self.readiness_outcome(file_path, attempt, tracker)
+        if outcome == "ready":
+            self.hand_off(file_path)
+        return outcome
+
+    def is_context_file(self, file_path):
+        # Matches "_plm_context.json" or "_plm_context (1).json" etc.
+        filename = os.path.basename(file_path)
+        return filename.startswith("_plm_context") and filename.endswith(".json")
+
+    def load_context_file(self, file_path):
+        print(f"Ninja Mode: Received context file {os.path.basename(file_path)}")
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                from app.context import ContextManager
+                ContextManager().update_context(data)
+
+            # Instantly delete to keep the folder clean
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            print(f"Ninja Mode: Success. Data from {data.get('url', 'Unknown URL')}")
+        except Exception as e:
+            print(f"Ninja Mode Error (File may be locked or malformed): {e}")
+
+    def note_detected(self, file_path, attempt):
+        if attempt == 0:
+            print(f"New file detected: {file_path}")
+            self.metrics.inc("plmorg_files_detected_total")
+
+    def readiness_outcome(self, file_path, attempt, tracker):
+        """
+        Verdict of a finished readiness check: "ready", "gone", "retry"
+        (a retry was scheduled) or "failed". Never blocks.
+        """
+        filename = os.path.basename(file_path)
+        self.metrics.observe("plmorg_readiness_wait_seconds", tracker.waited)
+        if tracker.ready:
+            return "ready"
+        if tracker.reason == "gone":
+            print(f"Skipping {filename}: File disappeared (renamed or deleted).")
+            return "gone"
+        delay = self.retries.add(file_path, attempt + 1)
+        if delay is not None:
+            self.metrics.inc("plmorg_ready_retries_total")
+            print(f"{filename} not ready ({tracker.reason}), retry {attempt + 1}/{len(self.retries.delays)} in {delay}s.")
+            return "retry"
+        self.metrics.inc("plmorg_files_failed_total", labels=(("stage", "ready"),))
+        print(f"Skipping {filename}: File verification failed after {attempt} retries ({tracker.reason}).")
+        return "failed"
+
+    def requeue(self, file_path):
+        """Called by the organizer when file_path failed verification; True if a retry was scheduled."""
+        attempt = self.integrity_attempts.get(file_path, 0) + 1
+        delay = self.retries.add(file_path, attempt)
+        if delay is None:
+            self.integrity_attempts.pop(file_path, None)
+            print(f"{os.path.basename(file_path)} failed verification {attempt - 1} times, giving up.")
+            return False
+        self.integrity_attempts[file_path] = attempt
+        print(f"{os.path.basename(file_path)} will be organized again in {delay}s (verification failed).")
+        return True
+
+    def retry(self, file_path, attempt):
+        if os.path.exists(file_path):
+            threading.Thread(target=self.process, args=(file_path, attempt), daemon=True).start()
+        else:
+            self.intake.end(file_path)
+            self.settle((file_path,))
+
+    def hand_off(self, file_path):
+        """
+        Hands a verified file to the organizer: quick files join the download
+        session of their destination, heavy ones are scheduled on their own.
+        """
+        cost = self.organizer.estimate_cost(file_path)
+        route = self.organizer.routing.resolve(os.path.dirname(file_path))
+        if self.session_window <= 0 or route is None or self.scheduler.lane_for(cost).name == "heavy":
+            self.scheduler.submit(file_path, cost, self.organize_job, file_path)
             return
-        
-        # 3. Regular File Processing
-        print(f"New file detected: {file_path}")
-        
-        # 4. Verification Loop: Wait for file to be truly ready (Stable Size & Not Locked)
-        if self.wait_for_file_ready(file_path):
+
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            size = 0
+        key = (os.path.dirname(file_path), route.target_dir)
+        self.sessions.add(key, route, file_path, size, cost)
+
+    def submit_session(self, session):
+        self.scheduler.submit(f"session:{session.id}", session.cost, self.organize_session_job, session)
+
+    def organize_job(self, file_path):
+        try:
             self.organizer.organize_file(file_path)
-        else:
-            print(f"Skipping {filename}: File verification failed (Locked or Unstable).")
+        finally:
+            self.settle((file_path,))
+
+    def organize_session_job(self, session):
+        try:
+            self.organizer.organize_session(session)
+        finally:
+            self.settle(session.files)
+
+    def track_pending(self, file_path, since=None):
+        with self.pending_lock:
+            self.pending.setdefault(file_path, since or time.time())
+
+    def settle(self, paths):
+        """Final outcome for paths (moved, skipped or failed), unless the organizer scheduled a retry."""
+        for path in paths:
+            if self.retries.scheduled(path):
+                continue
+            self.integrity_attempts.pop(path, None) # A later failure starts counting again
+            with self.pending_lock:
+                self.pending.pop(path, None)
+
+    def pending_files(self):
+        """{path: first seen} of files not organized yet (for WarmState)."""
+        with self.pending_lock:
+            return dict(self.pending)
+
+    def shutdown(self, cancel=False, timeout=None):
+        """
+        Stops the workers once queued jobs are done (both engines).
+        With cancel, running process-pool extractions are cancelled too.
+        timeout applies to the asyncio engine; the worker threads here are
+        daemons and end with the process.
+        """
+        if cancel:
+            self.organizer.shutdown()
+        self.scheduler.shutdown()
 
     def is_folder_busy(self, target_file_path, window_seconds=3.0):
         """
@@ -92,123 +264,190 @@ class DownloadHandler(FileSystemEventHandler):
             pass
         return False
 
-    def wait_for_file_ready(self, file_path, check_interval=0.2, stability_checks=3, lock_retries=50):
+    def wait_for_file_ready(self, file_path):
         """
-        Ensures file is ready by:
-        1. Checking size stability (no changes for 'stability_checks' intervals).
-        2. Checking file lock (can we rename it?).
+        Waits until the file is completely written and unlocked, with timing
+        adapted to how fast and how steadily it is being written (ReadinessPolicy).
+        Returns the ReadinessTracker: tracker.ready, or tracker.reason
+        ("gone", "locked", "timeout").
         """
-        last_size = -1
-        stable_count = 0
-        zero_byte_retries = 0
-        max_zero_byte_retries = 25 # 25 * 0.2s = 5 seconds
-        
-        # Phase 1: Size Stability
         print(f"Verifying stability for: {os.path.basename(file_path)}")
-        for i in range(150): # Max 30 seconds (150 * 0.2) wait for size to stabilize
-            try:
-                current_size = os.path.getsize(file_path)
-            except FileNotFoundError:
-                return False # File disappeared (e.g. renamed/deleted)
-            
-            # v1.8.7: Queue-Aware Batch Logic
-            # If I am 0 bytes...
-            if current_size == 0:
-                # Check if my neighbors are busy (Batch Download in progress?)
-                if self.is_folder_busy(file_path):
-                    # Neighbors are active! I should wait my turn.
-                    # Reset my wait counter so I don't timeout prematurely.
-                    zero_byte_retries = 0 
-                    stable_count = 0
-                    time.sleep(check_interval)
-                    continue
-
-                # No neighbors are active. It's just me.
-                # Use the Grace Period logic (v1.8.3)
-                if zero_byte_retries < max_zero_byte_retries:
-                    zero_byte_retries += 1
-                    stable_count = 0
-                    time.sleep(check_interval)
-                    continue
-
-            if current_size == last_size:
-                stable_count += 1
-            else:
-                stable_count = 0 # Reset if size changed
-                
-            last_size = current_size
-            
-            if stable_count >= stability_checks:
-                break # Stable!
-            
-            time.sleep(check_interval)
-            
-        if stable_count < stability_checks:
-            print(f"Timeout waiting for size stability: {file_path}")
-            return False
+        tracker = ReadinessTracker(file_path, self.readiness)
+        tracker.wait(busy_check=self.is_folder_busy)
+        return tracker
 
-        # Phase 2: Lock Check (Rename Method)
-        # Try to rename the file to ITSELF. Windows throws error if locked.
-        print(f"Checking lock status for: {os.path.basename(file_path)}")
-        for attempt in range(lock_retries):
-            try:
-                os.rename(file_path, file_path)
-                return True # Success! File is free.
-            except OSError:
-                time.sleep(check_interval)
-                pass # Retry
-        
-        print(f"File is locked by another process: {file_path}")
-        return False
+def create_handler(settings=None):
+    """
+    The organizer engine selected by the "engine" setting: "threads"
+    (DownloadHandler, the default) or "asyncio" (AsyncDownloadHandler).
+    Both are watchdog handlers with the same organizer and shutdown().
+    """
+    if settings is None:
+        from app.settings import SettingsManager
+        settings = SettingsManager()
+    if settings.get("engine", "threads") == "asyncio":
+        from app.async_engine import AsyncDownloadHandler
+        return AsyncDownloadHandler()
+    return DownloadHandler()
 
 class FileWatcher:
+    """
+    Watches every configured root (the primary "watch_folder" plus the extra
+    "watch_roots") with one WatchEngine, one DownloadHandler (and so one
+    worker pool) and one context. Roots can be added and removed at runtime.
+    """
     def __init__(self):
         self.observer = None
         from app.settings import SettingsManager
         self.settings_manager = SettingsManager()
+        self.roots = {} # path_key -> WatchRoot (scheduled roots only)
+        self.lock = threading.RLock()
         
-        self.path_to_watch = self.settings_manager.get("watch_folder")
-        if not self.path_to_watch or not os.path.exists(self.path_to_watch):
-            self.path_to_watch = os.path.join(os.path.expanduser("~"), "Downloads")
-        
-        self.event_handler = DownloadHandler()
+        self.path_to_watch = self.primary_path()
+        self.event_handler = create_handler(self.settings_manager)
+        self.on_started = None # Called once roots are scheduled (WarmState re-submits pending files)
+
+    def primary_path(self):
+        path = self.settings_manager.get("watch_folder")
+        if not path or not os.path.exists(path):
+            path = os.path.join(os.path.expanduser("~"), "Downloads")
+        return path
+
+    def configured_roots(self):
+        """Primary root first, then "watch_roots" entries (an entry for the same path adds its settings)."""
+        roots = {}
+        primary = WatchRoot(self.path_to_watch)
+        roots[primary.key] = primary
+        for data in self.settings_manager.get("watch_roots", []):
+            try:
+                root = WatchRoot.from_dict(data)
+            except (KeyError, TypeError, ValueError) as e:
+                print(f"Ignoring invalid watch root {data!r}: {e}")
+                continue
+            if root.enabled:
+                roots[root.key] = root
+        return list(roots.values())
 
     def start(self):
-        # Always reload path from settings to ensure we use the latest selection
-        self.path_to_watch = self.settings_manager.get("watch_folder")
-        if not self.path_to_watch or not os.path.exists(self.path_to_watch):
-             # Fallback (Safety)
-             self.path_to_watch = os.path.join(os.path.expanduser("~"), "Downloads")
-
-        if not os.path.exists(self.path_to_watch):
-            print(f"Watch directory {self.path_to_watch} does not exist.")
-            return
-            
-        if self.observer:
-            if self.observer.is_alive():
-                print("Observer already running.")
-                return
-            else:
-                self.observer = None
+        with self.lock:
+            # Always reload path from settings to ensure we use the latest selection
+            self.path_to_watch = self.primary_path()
+
+            if self.observer:
+                if self.observer.is_alive():
+                    print("Observer already running.")
+                    return
+                else:
+                    self.observer = None
+
+            # Start the engine first so each root is scheduled (and can fail) on its own.
+            self.observer = WatchEngine(polling_options(self.settings_manager))
+            self.observer.start()
+            for root in self.configured_roots():
+                self._schedule(root)
 
-        self.observer = Observer()
-        self.observer.schedule(self.event_handler, self.path_to_watch, recursive=False)
-        self.observer.start()
-        print(f"Monitoring started on {self.path_to_watch}")
+            if not self.roots:
+                print("No watch directory exists.")
+                self.stop()
+            elif self.on_started is not None:
+                self.on_started(self)
+
+    def _schedule(self, root):
+        if not os.path.isdir(root.path):
+            print(f"Watch directory {root.path} does not exist.")
+            return False
+
+        polling = root.wants_polling(self.settings_manager.get("watch_backend", "auto"))
+        self.event_handler.organizer.routing.set_overrides(root.path, root.overrides)
+        try:
+            self.observer.schedule_root(self.event_handler, root, polling)
+        except OSError as e:
+            if polling:
+                print(f"Cannot watch {root.path}: {e}")
+                self.event_handler.organizer.routing.set_overrides(root.path, None)
+                return False
+            # e.g. inotify watch limit reached or unsupported file system
+            print(f"Native watcher failed for {root.path} ({e}), falling back to polling.")
+            polling = True
+            self.observer.schedule_root(self.event_handler, root, polling)
+
+        self.roots[root.key] = root
+        print(f"Monitoring started on {root.path}" + (" (polling)" if polling else ""))
+        return True
+
+    def _unschedule(self, root):
+        self.observer.unschedule_root(root)
+        self.event_handler.organizer.routing.set_overrides(root.path, None)
+        self.roots.pop(root.key, None)
+        print(f"Monitoring stopped on {root.path}")
+
+    def add_root(self, path, persist=True, **options):
+        """
+        Adds a watch root at runtime (other roots keep running).
+        options: label, backend and the per-root overrides (auto_unzip, ...).
+        Returns False if the folder does not exist or cannot be watched.
+        """
+        root = WatchRoot.from_dict(dict(options, path=path))
+        if not os.path.isdir(root.path):
+            print(f"Watch directory {root.path} does not exist.")
+            return False
+
+        with self.lock:
+            if persist:
+                entries = [e for e in self.settings_manager.get("watch_roots", [])
+                           if WatchRoot.from_dict(e).key != root.key]
+                self.settings_manager.set("watch_roots", entries + [root.to_dict()])
+            if self.observer and self.observer.is_alive():
+                old = self.roots.get(root.key)
+                if old is not None:
+                    self._unschedule(old) # Re-schedule with the new settings
+                return self._schedule(root)
+        return True
+
+    def remove_root(self, path, persist=True):
+        """Stops watching one root at runtime (other roots keep running)."""
+        key = path_key(path)
+        with self.lock:
+            if persist:
+                entries = self.settings_manager.get("watch_roots", [])
+                self.settings_manager.set("watch_roots", [e for e in entries if WatchRoot.from_dict(e).key != key])
+            root = self.roots.get(key)
+            if root is not None and self.observer:
+                self._unschedule(root)
 
     def update_path(self, new_path):
+        """Replaces the primary root; extra roots keep running."""
         if not os.path.exists(new_path):
             return
-        
-        self.stop()
-        
-        self.path_to_watch = new_path
-        self.start()
+
+        with self.lock:
+            old_path = self.path_to_watch
+            self.path_to_watch = new_path
+            if not (self.observer and self.observer.is_alive()):
+                self.start()
+            else:
+                extra = {r.key for r in self.configured_roots()}
+                if path_key(old_path) not in extra:
+                    root = self.roots.get(path_key(old_path))
+                    if root is not None:
+                        self._unschedule(root)
+                if path_key(new_path) not in self.roots:
+                    self._schedule(WatchRoot(new_path))
         print(f"Monitoring updated to {self.path_to_watch}")
 
     def stop(self):
-        if self.observer:
-            self.observer.stop()
-            self.observer.join()
-            self.observer = None
-            print("Monitoring stopped.")
+        with self.lock:
+            if self.observer:
+                self.observer.stop()
+                self.observer.join()
+                self.observer = None
+                self.roots.clear()
+                print("Monitoring stopped.")
+
+    def shutdown(self, timeout=5.0):
+        """App exit: stops monitoring and cancels the engine's pending work (stop() only pauses)."""
+        self.stop()
+        try:
+            self.event_handler.shutdown(cancel=True, timeout=timeout)
+        except Exception as e:
+            print(f"Engine shutdown error: {e}")
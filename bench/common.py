@@ -0,0 +1,141 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile (pct in 0..100). Returns None for no data."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(values):
+    """Mean / p50 / p95 / p99 / max of a list of seconds (rounded to ms)."""
+    if not values:
+        return {"count": 0}
+    r = lambda v: round(v, 4)
+    return {
+        "count": len(values),
+        "mean": r(sum(values) / len(values)),
+        "p50": r(percentile(values, 50)),
+        "p95": r(percentile(values, 95)),
+        "p99": r(percentile(values, 99)),
+        "max": r(max(values)),
+    }
+
+
+def current_rss_bytes():
+    """Resident set size of this process, or None if it cannot be measured."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                            ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                            ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            handle = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+        except Exception:
+            return None
+        return None
+    try:
+        # Linux has no cheap "current" RSS without /proc
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        return None
+
+
+class ResourceSampler(threading.Thread):
+    """Samples thread count and RSS in the background to find their peaks."""
+    def __init__(self, interval=0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_threads = 0
+        self.peak_rss = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            rss = current_rss_bytes()
+            if rss:
+                self.peak_rss = max(self.peak_rss, rss)
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def environment_info():
+    commit = ""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.dirname(__file__))).stdout.strip()
+    except Exception:
+        pass
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def save_results(results, out_path):
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    return out_path
+
+
+def default_out_path(name):
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join("bench_results", f"{name}-{stamp}.json")
+
+
+def compare_results(current, baseline_path, keys):
+    """
+    Prints current vs baseline for the given dotted metric keys
+    (e.g. 'metrics.files_per_sec').
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+
+    def lookup(data, dotted):
+        for part in dotted.split("."):
+            if not isinstance(data, dict) or part not in data:
+                return None
+            data = data[part]
+        return data
+
+    print(f"Comparison against {baseline_path}:")
+    for key in keys:
+        new, old = lookup(current, key), lookup(baseline, key)
+        if isinstance(new, (int, float)) and isinstance(old, (int, float)) and old:
+            delta = (new - old) / old * 100
+            print(f"  {key:<40} {old:>12} -> {new:>12} ({delta:+.1f}%)")
+        else:
+            print(f"  {key:<40} {old!s:>12} -> {new!s:>12}")
@@ -0,0 +1,104 @@
+"""
+Extraction scaling benchmark: inline zipfile vs the process-pool backend
+with 1/2/4/8 worker processes on the same synthetic archive.
+
+    python -m bench.extraction
+    python -m bench.extraction --size-mb 1024 --members 200 --workers 1 2 4 8 16
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import zipfile
+
+from bench.common import compare_results, default_out_path, environment_info, save_results
+from bench.pipeline import MB, make_payload
+
+
+def build_archive(path, size, members):
+    member_size = max(1, size // members)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        for m in range(members):
+            z.writestr(f"set_{m % 8}/part_{m:04d}.dat", make_payload(member_size, seed=m, compressible=True))
+    return path
+
+
+def run_inline(zip_path, out_dir):
+    started = time.perf_counter()
+    with zipfile.ZipFile(zip_path, "r") as z:
+        z.extractall(out_dir)
+    return time.perf_counter() - started
+
+
+def run_pool(zip_path, out_dir, workers):
+    from app.extract_pool import ProcessPoolExtractor
+    extractor = ProcessPoolExtractor(workers)
+    try:
+        with zipfile.ZipFile(zip_path, "r") as z:
+            infos = z.infolist()
+        # Warm-up: process start-up is a one-time cost of a long-lived pool.
+        extractor.extract(zip_path, out_dir + "_warmup", infos[:workers])
+        started = time.perf_counter()
+        ok = extractor.extract(zip_path, out_dir, infos)
+        elapsed = time.perf_counter() - started
+        if not ok:
+            raise RuntimeError("Extraction did not complete")
+        return elapsed
+    finally:
+        extractor.shutdown()
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="PLM Organizer extraction scaling benchmark")
+    p.add_argument("--size-mb", type=int, default=256, help="uncompressed archive size")
+    p.add_argument("--members", type=int, default=64)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.add_argument("--repeat", type=int, default=3, help="runs per configuration (best is kept)")
+    p.add_argument("--out")
+    p.add_argument("--compare")
+    args = p.parse_args(argv)
+
+    root = tempfile.mkdtemp(prefix="plm_bench_extract_")
+    try:
+        zip_path = os.path.join(root, "bundle.zip")
+        print(f"Building {args.size_mb} MB archive with {args.members} members ...")
+        build_archive(zip_path, args.size_mb * MB, args.members)
+        total = args.size_mb * MB
+
+        def best_of(fn, *fn_args):
+            times = []
+            for r in range(args.repeat):
+                out_dir = os.path.join(root, f"out_{len(os.listdir(root))}")
+                times.append(fn(zip_path, out_dir, *fn_args))
+                shutil.rmtree(out_dir, ignore_errors=True)
+                shutil.rmtree(out_dir + "_warmup", ignore_errors=True)
+            return min(times)
+
+        inline = best_of(run_inline)
+        print(f"  inline    {inline:7.3f}s  {total / MB / inline:8.1f} MB/s")
+        rows = {"inline": {"seconds": round(inline, 4), "mb_per_sec": round(total / MB / inline, 1)}}
+        for workers in args.workers:
+            elapsed = best_of(run_pool, workers)
+            rows[f"pool_{workers}"] = {
+                "workers": workers,
+                "seconds": round(elapsed, 4),
+                "mb_per_sec": round(total / MB / elapsed, 1),
+                "speedup_vs_inline": round(inline / elapsed, 2),
+            }
+            print(f"  pool x{workers:<3} {elapsed:7.3f}s  {total / MB / elapsed:8.1f} MB/s  "
+                  f"({inline / elapsed:.2f}x inline)")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    results = {"benchmark": "extraction", "env": environment_info(), "params": vars(args), "metrics": rows}
+    out = save_results(results, args.out or default_out_path("extraction"))
+    print(f"Results saved to {out}")
+    if args.compare:
+        compare_results(results, args.compare, [f"metrics.{k}.seconds" for k in rows])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+History store benchmark: batched writes from worker threads, then
+first-page / deep-page / filtered query latency on a large table
+(default 1M rows), plus the Qt model's fetchMore when PyQt6 is available.
+
+    python -m bench.history
+    python -m bench.history --rows 2000000 --writers 8
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from bench.common import compare_results, default_out_path, environment_info, save_results, summarize
+
+COMPARE_KEYS = [
+    "metrics.write_rows_per_sec",
+    "metrics.queries.first_page.p50",
+    "metrics.queries.deep_page.p50",
+    "metrics.queries.plm_id.p50",
+    "metrics.queries.folder.p50",
+    "metrics.queries.date_range.p50",
+]
+
+
+def synthetic_rows(count, start_ts, projects=2000, seed=0):
+    rng = random.Random(seed)
+    ts = start_ts
+    for i in range(count):
+        ts += rng.random() * 2
+        p = rng.randrange(projects)
+        plm_id = f"P{p:06d}-{p * 7 % 100000:05d}"
+        folder = f"[{plm_id}]_Project_{p}"
+        name = f"doc_{i:07d}.pdf"
+        yield (ts, plm_id, folder, name, f"C:/Downloads/{folder}/{name}", rng.randrange(1, 50_000_000), "file")
+
+
+def bulk_load(path, rows, batch=50_000):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA synchronous=OFF")
+    buf = []
+    for row in rows:
+        buf.append(row)
+        if len(buf) >= batch:
+            with conn:
+                conn.executemany("INSERT INTO history (ts, plm_id, folder, file_name, dest_path, size, kind) "
+                                 "VALUES (?, ?, ?, ?, ?, ?, ?)", buf)
+            buf = []
+    if buf:
+        with conn:
+            conn.executemany("INSERT INTO history (ts, plm_id, folder, file_name, dest_path, size, kind) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?)", buf)
+    conn.close()
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - started)
+    return summarize([t * 1000 for t in times]) # milliseconds
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="PLM Organizer history store benchmark")
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--write-rows", type=int, default=50_000, help="rows written through the batched writer")
+    p.add_argument("--writers", type=int, default=4, help="concurrent recording threads")
+    p.add_argument("--repeat", type=int, default=20)
+    p.add_argument("--out")
+    p.add_argument("--compare")
+    args = p.parse_args(argv)
+
+    root = tempfile.mkdtemp(prefix="plm_bench_history_")
+    os.environ["APPDATA"] = root
+    try:
+        from app.history import HistoryFilter, HistoryStore
+        store = HistoryStore()
+        start_ts = time.time() - args.rows * 2
+
+        # 1. Writer throughput: worker threads enqueue, one thread commits batches.
+        per_thread = args.write_rows // args.writers
+        rows = list(synthetic_rows(per_thread * args.writers, start_ts - 10 ** 8, seed=1))
+        chunks = [rows[i * per_thread:(i + 1) * per_thread] for i in range(args.writers)]
+        started = time.perf_counter()
+        threads = [threading.Thread(target=lambda c=c: [store.record_rows([r]) for r in c]) for c in chunks]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        store.flush(timeout=600)
+        write_rate = len(rows) / (time.perf_counter() - started)
+        print(f"Batched writer: {write_rate:,.0f} rows/sec from {args.writers} threads")
+
+        # 2. Bulk-load the big table, then query it.
+        print(f"Loading {args.rows:,} rows ...")
+        bulk_load(store.path, synthetic_rows(args.rows, start_ts, seed=2))
+        total = store.count()
+
+        sample = store.query(limit=1)[0]
+        plm_id, folder = sample[2], sample[3]
+        day = 86400
+        date_filter = HistoryFilter(date_from=start_ts + args.rows / 2, date_to=start_ts + args.rows / 2 + day)
+
+        def deep_page(pages=200):
+            before = None
+            for _ in range(pages):
+                page = store.query(before_id=before, limit=500)
+                if not page:
+                    break
+                before = page[-1][0]
+
+        queries = {
+            "first_page": timed(lambda: store.query(limit=500), args.repeat),
+            "deep_page": timed(lambda: store.query(before_id=total // 2, limit=500), args.repeat),
+            "plm_id": timed(lambda: store.query(HistoryFilter(plm_id=plm_id), limit=500), args.repeat),
+            "folder": timed(lambda: store.query(HistoryFilter(folder=folder.lower()), limit=500), args.repeat),
+            "date_range": timed(lambda: store.query(date_filter, limit=500), args.repeat),
+            "combined": timed(lambda: store.query(HistoryFilter(plm_id=plm_id, date_from=start_ts,
+                                                                date_to=time.time()), limit=500), args.repeat),
+            "scroll_100k_rows": timed(deep_page, 3),
+        }
+        for name, stats in queries.items():
+            print(f"  {name:<17} p50 {stats['p50']:8.2f} ms  max {stats['max']:8.2f} ms")
+
+        model_ms = None
+        try:
+            os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+            from PyQt6.QtWidgets import QApplication
+            from app.history_view import HistoryModel
+            app = QApplication.instance() or QApplication([])
+            model = HistoryModel(store)
+            started = time.perf_counter()
+            model.set_filter(HistoryFilter())
+            for _ in range(19):
+                model.fetchMore()
+            model_ms = (time.perf_counter() - started) * 1000
+            print(f"  model: {model.rowCount()} rows fetched in {model_ms:.1f} ms")
+        except ImportError:
+            print("  (PyQt6 not available, model fetch skipped)")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    results = {
+        "benchmark": "history",
+        "env": environment_info(),
+        "params": vars(args),
+        "metrics": {
+            "rows": total,
+            "write_rows_per_sec": round(write_rate),
+            "queries": queries,
+            "model_10k_rows_ms": round(model_ms, 1) if model_ms is not None else None,
+        },
+    }
+    out = save_results(results, args.out or default_out_path("history"))
+    print(f"Results saved to {out}")
+    if args.compare:
+        compare_results(results, args.compare, COMPARE_KEYS)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,355 @@
+"""
+End-to-end benchmark of the watch -> verify -> organize pipeline.
+
+Drives a real organizer engine (through a watchdog Observer) against temp
+directories with a mocked PLM context, and reports files/sec, end-to-end
+latency (download complete -> organized), peak threads and peak RSS.
+
+    python -m bench.pipeline --workload mixed
+    python -m bench.pipeline --workload small --small-count 500 --compare bench_results/old.json
+    python -m bench.pipeline --engine asyncio --compare bench_results/threads.json
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+from bench.common import (ResourceSampler, compare_results, default_out_path,
+                          environment_info, save_results, summarize)
+
+MB = 1024 * 1024
+COMPARE_KEYS = [
+    "metrics.files_per_sec",
+    "metrics.latency.mean",
+    "metrics.latency.p95",
+    "metrics.latency_by_kind.small.mean",
+    "metrics.latency_by_kind.small.p95",
+    "metrics.latency_by_kind.small.p99",
+    "metrics.peak_threads",
+    "metrics.peak_rss_bytes",
+]
+
+
+def make_payload(size, seed=0, compressible=False):
+    """Synthetic file body. Compressible payloads make deflate do real work."""
+    rng = random.Random(seed)
+    if not compressible:
+        return rng.randbytes(size)
+    words = [rng.randbytes(rng.randint(4, 12)).hex() for _ in range(256)]
+    out = io.BytesIO()
+    while out.tell() < size:
+        out.write(" ".join(rng.choices(words, k=64)).encode() + b"\n")
+    return out.getvalue()[:size]
+
+
+class Job:
+    """One synthetic download: a final file name, a kind and a writer."""
+    def __init__(self, name, kind, writer):
+        self.name = name
+        self.kind = kind
+        self.writer = writer # writer() -> perf_counter() when the download completed
+
+
+class WorkloadBuilder:
+    def __init__(self, watch_dir, staging_dir):
+        self.watch_dir = watch_dir
+        self.staging_dir = staging_dir
+        self.jobs = []
+
+    def small_files(self, count, size):
+        for i in range(count):
+            name = f"small_{i:05d}.pdf"
+            data = make_payload(size, seed=i)
+
+            def writer(name=name, data=data):
+                with open(os.path.join(self.watch_dir, name), "wb") as f:
+                    f.write(data)
+                return time.perf_counter()
+            self.jobs.append(Job(name, "small", writer))
+
+    def huge_zips(self, count, size, members=20):
+        # Archives are built in staging up front; the "download" is the rename.
+        for i in range(count):
+            name = f"bundle_{i:03d}.zip"
+            staged = os.path.join(self.staging_dir, name)
+            member_size = max(1, size // members)
+            with zipfile.ZipFile(staged, "w", zipfile.ZIP_DEFLATED) as z:
+                for m in range(members):
+                    z.writestr(f"docs/part_{m:03d}.dat", make_payload(member_size, seed=i * 1000 + m, compressible=True))
+
+            def writer(name=name, staged=staged):
+                os.replace(staged, os.path.join(self.watch_dir, name))
+                return time.perf_counter()
+            self.jobs.append(Job(name, "zip", writer))
+
+    def slow_downloads(self, count, size, duration, chunks=10):
+        # Browser style: grow NAME.crdownload, then rename to NAME.
+        for i in range(count):
+            name = f"slow_{i:03d}.bin"
+            data = make_payload(size, seed=10_000 + i)
+
+            def writer(name=name, data=data):
+                temp = os.path.join(self.watch_dir, name + ".crdownload")
+                step = max(1, len(data) // chunks)
+                with open(temp, "wb") as f:
+                    for offset in range(0, len(data), step):
+                        f.write(data[offset:offset + step])
+                        f.flush()
+                        time.sleep(duration / chunks)
+                os.rename(temp, os.path.join(self.watch_dir, name))
+                return time.perf_counter()
+            self.jobs.append(Job(name, "slow", writer))
+
+    def zero_byte_placeholders(self, count, size, delay):
+        # Innorix style: a 0-byte file appears first, content lands later.
+        for i in range(count):
+            name = f"placeholder_{i:03d}.dwg"
+            data = make_payload(size, seed=20_000 + i)
+
+            def writer(name=name, data=data):
+                path = os.path.join(self.watch_dir, name)
+                open(path, "wb").close()
+                time.sleep(delay)
+                with open(path, "wb") as f:
+                    f.write(data)
+                return time.perf_counter()
+            self.jobs.append(Job(name, "zero", writer))
+
+
+    def segmented_downloads(self, count, size, segments):
+        # Innorix multi-segment style: NAME.irx.<n> segments are written in
+        # parallel, then merged into NAME and deleted.
+        for i in range(count):
+            name = f"segmented_{i:03d}.dwg"
+            data = make_payload(size, seed=30_000 + i)
+
+            def writer(name=name, data=data):
+                step = -(-len(data) // segments)
+                parts = [os.path.join(self.watch_dir, f"{name}.irx.{n}") for n in range(segments)]
+                for chunk in range(4):
+                    for n, part in enumerate(parts):
+                        piece = data[n * step:(n + 1) * step]
+                        with open(part, "ab") as f:
+                            f.write(piece[chunk * len(piece) // 4:(chunk + 1) * len(piece) // 4])
+                    time.sleep(0.1)
+                with open(os.path.join(self.watch_dir, name), "wb") as out:
+                    for part in parts:
+                        with open(part, "rb") as f:
+                            out.write(f.read())
+                for part in parts:
+                    os.remove(part)
+                return time.perf_counter()
+            self.jobs.append(Job(name, "seg", writer))
+
+
+def build_workload(args, watch_dir, staging_dir):
+    builder = WorkloadBuilder(watch_dir, staging_dir)
+    w = args.workload
+    if w in ("small", "mixed"):
+        builder.small_files(args.small_count, args.small_size)
+    if w in ("zips", "mixed"):
+        builder.huge_zips(args.zip_count, args.zip_size_mb * MB)
+    if w in ("slow", "mixed"):
+        builder.slow_downloads(args.slow_count, args.slow_size, args.slow_duration)
+    if w in ("zero", "mixed"):
+        builder.zero_byte_placeholders(args.zero_count, args.small_size, args.zero_delay)
+    if w in ("segmented", "mixed"):
+        builder.segmented_downloads(args.segmented_count, args.segmented_size, args.segments)
+    return builder.jobs
+
+
+def files_verified():
+    from app.metrics import Metrics
+    counters, _ = Metrics()._collect()
+    return counters.get(("plmorg_files_detected_total", ()), 0)
+
+
+def run_pipeline(args):
+    root = tempfile.mkdtemp(prefix="plm_bench_")
+    watch_dir = os.path.join(root, "watch")
+    staging_dir = os.path.join(root, "staging")
+    os.makedirs(watch_dir)
+    os.makedirs(staging_dir)
+    # Keep SettingsManager away from the real user profile.
+    os.environ["APPDATA"] = os.path.join(root, "appdata")
+
+    from watchdog.observers import Observer
+    from app.context import ContextManager
+    from app.settings import SettingsManager
+    from app.watcher import create_handler
+
+    lane_settings = {
+        "quick_lane_workers": args.quick_workers,
+        "heavy_lane_workers": args.heavy_workers,
+        "heavy_threshold_mb": args.heavy_threshold_mb,
+        "session_window_seconds": args.session_window,
+        "io_limit_busy_mbps": args.io_limit_busy_mbps,
+        "engine": args.engine,
+    }
+    SettingsManager().data.update(lane_settings)
+
+    print(f"Preparing '{args.workload}' workload in {root} ...")
+    jobs = build_workload(args, watch_dir, staging_dir)
+
+    ContextManager().update_context({
+        "plm_id": "P000001-12345",
+        "title": "[BENCH] Pipeline Benchmark",
+        "url": "bench",
+    })
+
+    done = {}
+    done_lock = threading.Lock()
+    all_done = threading.Event()
+
+    def on_success(dest_path):
+        with done_lock:
+            done.setdefault(os.path.basename(dest_path), time.perf_counter())
+            if len(done) >= len(jobs):
+                all_done.set()
+
+    sessions = []
+
+    def on_session(summary):
+        sessions.append(summary)
+        for dest_path in summary["files"]:
+            on_success(dest_path)
+
+    handler = create_handler()
+    handler.organizer.set_callback(on_success)
+    handler.organizer.set_session_callback(on_session)
+    if args.watch_backend == "polling":
+        from app.polling import AdaptivePollingObserver
+        observer = AdaptivePollingObserver.from_settings(SettingsManager())
+    else:
+        observer = Observer()
+    observer.schedule(handler, watch_dir, recursive=False)
+    observer.start()
+
+    completed_at = {}
+    sampler = ResourceSampler()
+    log_sink = io.StringIO() if not args.verbose else sys.stdout
+
+    def drive(job):
+        completed_at[job.name] = job.writer()
+
+    print(f"Running {len(jobs)} downloads ...")
+    with contextlib.redirect_stdout(log_sink):
+        sampler.start()
+        started = time.perf_counter()
+        writers = [threading.Thread(target=drive, args=(job,), daemon=True) for job in jobs]
+        for t in writers:
+            t.start()
+        for t in writers:
+            t.join()
+        all_done.wait(args.timeout)
+        finished = time.perf_counter()
+        sampler.stop()
+        observer.stop()
+        observer.join()
+        handler.shutdown()
+
+    latencies, by_kind = [], {}
+    for job in jobs:
+        if job.name in done and job.name in completed_at:
+            value = max(0.0, done[job.name] - completed_at[job.name])
+            latencies.append(value)
+            by_kind.setdefault(job.kind, []).append(value)
+
+    last_done = max(done.values()) if done else finished
+    wall = max(1e-9, last_done - started)
+    results = {
+        "benchmark": "pipeline",
+        "env": environment_info(),
+        "params": vars(args),
+        "metrics": {
+            "files_total": len(jobs),
+            "files_organized": len(latencies),
+            "files_lost": len(jobs) - len(latencies),
+            "wall_time": round(wall, 3),
+            "files_per_sec": round(len(latencies) / wall, 2),
+            "sessions": len(sessions),
+            "files_verified": files_verified(),
+            "latency": summarize(latencies),
+            "latency_by_kind": {kind: summarize(v) for kind, v in sorted(by_kind.items())},
+            "peak_threads": sampler.peak_threads,
+            "peak_rss_bytes": sampler.peak_rss,
+        },
+    }
+
+    if not args.keep:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def print_report(results):
+    m = results["metrics"]
+    lat = m["latency"]
+    print(f"Organized {m['files_organized']}/{m['files_total']} files "
+          f"({m['files_lost']} lost) in {m['wall_time']}s -> {m['files_per_sec']} files/sec")
+    if lat.get("count"):
+        print(f"Latency: mean {lat['mean']}s, p50 {lat['p50']}s, p95 {lat['p95']}s, max {lat['max']}s")
+    for kind, stats in m["latency_by_kind"].items():
+        print(f"  {kind:<6} n={stats['count']:<5} mean {stats['mean']}s  p95 {stats['p95']}s")
+    small = m["latency_by_kind"].get("small")
+    if small and len(m["latency_by_kind"]) > 1:
+        # The number that matters for scheduling: small files behind heavy work.
+        print(f"Small files under mixed load: mean {small['mean']}s, p95 {small['p95']}s, p99 {small['p99']}s")
+    if m.get("files_verified") is not None:
+        # More verifications than files: temp artifacts or duplicate events got through
+        print(f"Verifications started: {m['files_verified']} for {m['files_total']} files")
+    if m.get("sessions"):
+        print(f"Sessions: {m['sessions']}")
+    print(f"Peak threads: {m['peak_threads']}, peak RSS: {m['peak_rss_bytes'] / MB:.1f} MB")
+
+
+def build_parser():
+    p = argparse.ArgumentParser(description="PLM Organizer pipeline benchmark")
+    p.add_argument("--workload", choices=["small", "zips", "slow", "zero", "segmented", "mixed"], default="mixed")
+    p.add_argument("--small-count", type=int, default=100)
+    p.add_argument("--small-size", type=int, default=20 * 1024, help="bytes")
+    p.add_argument("--zip-count", type=int, default=2)
+    p.add_argument("--zip-size-mb", type=int, default=64, help="uncompressed MB per archive")
+    p.add_argument("--slow-count", type=int, default=5)
+    p.add_argument("--slow-size", type=int, default=2 * MB, help="bytes")
+    p.add_argument("--slow-duration", type=float, default=3.0, help="seconds per slow download")
+    p.add_argument("--zero-count", type=int, default=5)
+    p.add_argument("--zero-delay", type=float, default=2.0, help="seconds a placeholder stays at 0 bytes")
+    p.add_argument("--segmented-count", type=int, default=5)
+    p.add_argument("--segmented-size", type=int, default=MB, help="bytes")
+    p.add_argument("--segments", type=int, default=4, help="segments per segmented download")
+    p.add_argument("--quick-workers", type=int, default=4, help="quick lane concurrency")
+    p.add_argument("--heavy-workers", type=int, default=1, help="heavy lane concurrency")
+    p.add_argument("--heavy-threshold-mb", type=int, default=64, help="cost above which a job is heavy")
+    p.add_argument("--session-window", type=float, default=1.5, help="session grouping window in seconds (0 = off)")
+    p.add_argument("--io-limit-busy-mbps", type=float, default=32,
+                   help="extraction/copy bandwidth while downloads are arriving (0 = unlimited)")
+    p.add_argument("--watch-backend", choices=["native", "polling"], default="native")
+    p.add_argument("--engine", choices=["threads", "asyncio"], default="threads", help="organizer engine")
+    p.add_argument("--timeout", type=float, default=300.0)
+    p.add_argument("--out", help="JSON results path (default: bench_results/pipeline-<time>.json)")
+    p.add_argument("--compare", help="Previous results JSON to compare against")
+    p.add_argument("--keep", action="store_true", help="Keep the temp directories")
+    p.add_argument("--verbose", action="store_true", help="Show organizer logs")
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    results = run_pipeline(args)
+    print_report(results)
+    out = save_results(results, args.out or default_out_path("pipeline"))
+    print(f"Results saved to {out}")
+    if args.compare:
+        compare_results(results, args.compare, COMPARE_KEYS)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
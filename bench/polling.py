@@ -0,0 +1,185 @@
+"""
+Polling watcher benchmark on a large folder (default 50k entries):
+scan time and CPU per poll (capped vs uncapped, vs watchdog's DirectorySnapshot),
+snapshot memory, and detection latency while idle (backed off) and during a burst.
+
+    python -m bench.polling
+    python -m bench.polling --entries 100000 --max-cpu 0.1
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from bench.common import compare_results, default_out_path, environment_info, save_results, summarize
+
+COMPARE_KEYS = [
+    "metrics.scan_uncapped.seconds",
+    "metrics.scan_uncapped.cpu_seconds",
+    "metrics.scan_capped.cpu_seconds",
+    "metrics.latency_idle.mean",
+    "metrics.latency_burst.mean",
+]
+
+
+def populate(folder, entries):
+    for i in range(entries):
+        with open(os.path.join(folder, f"archived_{i:06d}.pdf"), "wb") as f:
+            if i % 10 == 0:
+                f.write(b"x" * (i % 4096))
+
+
+def time_scans(scanner, repeat):
+    from app.polling import diff_snapshots
+    snapshot = scanner.scan()
+    walls, cpus = [], []
+    for _ in range(repeat):
+        fresh = scanner.scan(snapshot)
+        diff_snapshots(snapshot, fresh)
+        snapshot = fresh
+        walls.append(scanner.last_scan_seconds)
+        cpus.append(scanner.last_scan_cpu)
+    return {"seconds": round(min(walls), 4), "cpu_seconds": round(min(cpus), 4)}
+
+
+def time_dirsnapshot(folder, repeat):
+    from watchdog.utils.dirsnapshot import DirectorySnapshot, DirectorySnapshotDiff
+    old = DirectorySnapshot(folder, recursive=False)
+    walls = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        new = DirectorySnapshot(folder, recursive=False)
+        DirectorySnapshotDiff(old, new)
+        walls.append(time.perf_counter() - started)
+        old = new
+    return {"seconds": round(min(walls), 4)}
+
+
+def measure_latency(folder, args):
+    from watchdog.events import FileSystemEventHandler
+    from app.polling import AdaptivePollingObserver
+
+    seen = {}
+    cond = threading.Condition()
+
+    class Recorder(FileSystemEventHandler):
+        def record(self, path):
+            with cond:
+                seen.setdefault(os.path.basename(path), time.perf_counter())
+                cond.notify_all()
+
+        def on_created(self, event):
+            self.record(event.src_path)
+
+        def on_moved(self, event):
+            self.record(event.dest_path)
+
+    def wait_for(names, timeout):
+        with cond:
+            cond.wait_for(lambda: all(n in seen for n in names), timeout)
+
+    observer = AdaptivePollingObserver(args.min_interval, args.max_interval, args.max_cpu)
+    observer.schedule(Recorder(), folder, recursive=False)
+    observer.start()
+    try:
+        idle, burst = [], []
+        for i in range(args.probes):
+            # Let the poller back off to its slowest interval, then drop one file.
+            time.sleep(args.max_interval * 2)
+            name = f"idle_{i}.pdf"
+            created = time.perf_counter()
+            open(os.path.join(folder, name), "wb").close()
+            wait_for([name], args.max_interval * 4)
+            if name in seen:
+                idle.append(seen[name] - created)
+
+        # Browser-style burst: NAME.crdownload renamed to NAME, one every 50 ms.
+        names, created = [], {}
+        for i in range(args.burst):
+            name = f"burst_{i}.pdf"
+            temp = os.path.join(folder, name + ".crdownload")
+            with open(temp, "wb") as f:
+                f.write(b"y" * 1024)
+            os.rename(temp, os.path.join(folder, name))
+            created[name] = time.perf_counter()
+            names.append(name)
+            time.sleep(0.05)
+        wait_for(names, args.max_interval * 4)
+        burst = [seen[n] - created[n] for n in names if n in seen]
+        return idle, burst, args.burst - len(burst)
+    finally:
+        observer.stop()
+        observer.join()
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="PLM Organizer polling watcher benchmark")
+    p.add_argument("--entries", type=int, default=50_000)
+    p.add_argument("--repeat", type=int, default=3, help="steady-state scans per configuration")
+    p.add_argument("--min-interval", type=float, default=0.25)
+    p.add_argument("--max-interval", type=float, default=2.0)
+    p.add_argument("--max-cpu", type=float, default=0.2, help="CPU cap per scan (fraction of a core)")
+    p.add_argument("--probes", type=int, default=3, help="idle detection probes")
+    p.add_argument("--burst", type=int, default=20, help="files in the burst")
+    p.add_argument("--out")
+    p.add_argument("--compare")
+    args = p.parse_args(argv)
+
+    from app.polling import SnapshotScanner
+
+    root = tempfile.mkdtemp(prefix="plm_bench_poll_")
+    try:
+        print(f"Creating {args.entries} entries in {root} ...")
+        populate(root, args.entries)
+
+        tracemalloc.start()
+        snapshot = SnapshotScanner(root, max_cpu=1.0).scan()
+        snapshot_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del snapshot
+
+        uncapped = time_scans(SnapshotScanner(root, max_cpu=1.0), args.repeat)
+        capped = time_scans(SnapshotScanner(root, max_cpu=args.max_cpu), args.repeat)
+        baseline = time_dirsnapshot(root, args.repeat)
+        print(f"  scan uncapped     {uncapped['seconds']:7.3f}s wall  {uncapped['cpu_seconds']:7.3f}s CPU")
+        print(f"  scan capped {args.max_cpu:<5} {capped['seconds']:7.3f}s wall  {capped['cpu_seconds']:7.3f}s CPU")
+        print(f"  watchdog snapshot {baseline['seconds']:7.3f}s wall")
+        print(f"  snapshot memory   {snapshot_bytes / (1024 * 1024):7.1f} MB")
+
+        print(f"Measuring detection latency ({args.probes} idle probes, burst of {args.burst}) ...")
+        idle, burst, missed = measure_latency(root, args)
+        idle_stats, burst_stats = summarize(idle), summarize(burst)
+        if idle_stats.get("count"):
+            print(f"  idle  latency mean {idle_stats['mean']}s  max {idle_stats['max']}s")
+        if burst_stats.get("count"):
+            print(f"  burst latency mean {burst_stats['mean']}s  p95 {burst_stats['p95']}s  ({missed} missed)")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    results = {
+        "benchmark": "polling",
+        "env": environment_info(),
+        "params": vars(args),
+        "metrics": {
+            "scan_uncapped": uncapped,
+            "scan_capped": capped,
+            "watchdog_snapshot": baseline,
+            "snapshot_bytes": snapshot_bytes,
+            "latency_idle": idle_stats,
+            "latency_burst": burst_stats,
+            "burst_missed": missed,
+        },
+    }
+    out = save_results(results, args.out or default_out_path("polling"))
+    print(f"Results saved to {out}")
+    if args.compare:
+        compare_results(results, args.compare, COMPARE_KEYS)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,342 @@
+"""
+Replays a recorded file system event trace (see app/trace.py) against a real
+DownloadHandler in temp folders, at 1x or accelerated speed, and reports the
+same kind of numbers as bench.pipeline, next to the latencies of the
+original recording.
+
+    python -m bench.replay trace-20250101-093000.jsonl.gz
+    python -m bench.replay trace.jsonl.gz --speed 4 --session-window 0 --compare bench_results/old.json
+
+File contents are synthetic (random bytes of the recorded sizes; names
+ending in .zip get a valid stored archive). The readiness checks still run
+in real time, so accelerated replays compress the gaps between operations,
+not the stability waits.
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+from bench.common import (ResourceSampler, compare_results, default_out_path,
+                          environment_info, save_results, summarize)
+
+COMPARE_KEYS = [
+    "metrics.files_per_sec",
+    "metrics.latency.mean",
+    "metrics.latency.p95",
+    "metrics.peak_threads",
+    "metrics.peak_rss_bytes",
+]
+# Name suffixes added by the organizer for duplicates: "a_1735689600.pdf", "a_1735689600_2.pdf"
+DUPLICATE_SUFFIX = re.compile(r'_\d{9,}(?:_\d+)?(?=\.[^.]*$|$)')
+
+
+class Lineage:
+    """One file across its renames (x.pdf.crdownload -> x.pdf), from the trace."""
+    def __init__(self, lid):
+        self.id = lid
+        self.final_name = None
+        self.size = 0
+        self.deleted = False # Deleted by a download tool (not by the organizer)
+        self.last_event_t = 0.0
+        self.original_org_t = None
+        self.payload = b""
+
+
+def make_zip_payload(size, seed):
+    """A valid (stored) ZIP of exactly 'size' bytes when possible."""
+    rng = random.Random(seed)
+    name = "data.bin"
+    overhead = 30 + len(name) + 46 + len(name) + 22
+    if size <= overhead:
+        return rng.randbytes(size)
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_STORED) as zf:
+        zf.writestr(name, rng.randbytes(size - overhead))
+    data = out.getvalue()
+    return data if len(data) == size else rng.randbytes(size)
+
+
+def analyze(records):
+    """
+    Pre-pass: follows every file through its renames, so the replay knows
+    final names and sizes (payloads) and which files should get organized.
+    Returns (lineages, op_lineage) where op_lineage[i] is the lineage of record i.
+    """
+    lineages, current, op_lineage = [], {}, {}
+    for i, rec in enumerate(records):
+        kind = rec[1]
+        if kind in ("ctx", "root") or kind.isupper():
+            continue
+        if kind == "org":
+            lineage = current.get((rec[2], rec[3]))
+            if lineage is not None and lineage.original_org_t is None:
+                lineage.original_org_t = rec[0]
+            continue
+        t, _, root, path, size, dest, flags = rec
+        key = (root, path)
+        if flags:
+            current.pop(key, None) # The organizer took it
+            continue
+        lineage = current.get(key)
+        if lineage is None:
+            if kind == "d":
+                continue
+            lineage = Lineage(len(lineages))
+            lineages.append(lineage)
+            current[key] = lineage
+        op_lineage[i] = lineage
+        lineage.last_event_t = t
+        if size is not None:
+            lineage.size = max(lineage.size, size)
+        if kind == "v":
+            del current[key]
+            if dest is None:
+                lineage.deleted = True # Moved out of the root
+            else:
+                current[(root, dest)] = lineage
+                lineage.final_name = os.path.basename(dest)
+        elif kind == "d":
+            del current[key]
+            lineage.deleted = True
+        elif lineage.final_name is None:
+            lineage.final_name = path
+
+    for lineage in lineages:
+        name = lineage.final_name or ""
+        if name.lower().endswith(".zip"):
+            lineage.payload = make_zip_payload(lineage.size, lineage.id)
+        else:
+            lineage.payload = random.Random(lineage.id).randbytes(lineage.size)
+    return lineages, op_lineage
+
+
+def expected(lineage, intake):
+    name = (lineage.final_name or "").lower()
+    return not lineage.deleted and not name.startswith("_plm_context") and not intake.is_temp(name)
+
+
+class Replayer:
+    """Applies trace records as file operations under one temp folder per root."""
+    def __init__(self, records, op_lineage, root_dirs):
+        self.records = records
+        self.op_lineage = op_lineage
+        self.root_dirs = root_dirs
+        self.ready_at = {} # lineage id -> perf_counter() of its last operation
+        self.applied = 0
+        self.skipped = 0
+
+    def run(self, speed):
+        from app.context import ContextManager
+        started = time.perf_counter()
+        for i, rec in enumerate(self.records):
+            delay = started + rec[0] / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            kind = rec[1]
+            if kind == "ctx":
+                if rec[2]:
+                    ContextManager().update_context(dict(rec[2]))
+                else:
+                    ContextManager().clear()
+                continue
+            lineage = self.op_lineage.get(i)
+            if lineage is None:
+                continue # Directories, organizer's own moves, markers
+            try:
+                self.apply(rec, lineage)
+                self.applied += 1
+                self.ready_at[lineage.id] = time.perf_counter()
+            except OSError:
+                self.skipped += 1
+
+    def apply(self, rec, lineage):
+        _, kind, root, path, size, dest, _ = rec
+        full = os.path.join(self.root_dirs[root], path)
+        if path.startswith("_plm_context"):
+            return # Context files are replayed as their "ctx" records
+        if kind == "c":
+            with open(full, "wb") as f:
+                f.write(lineage.payload[:size or 0])
+        elif kind in ("m", "x"):
+            self.resize(full, lineage, size)
+        elif kind == "v":
+            if dest is None:
+                os.remove(full)
+                return
+            target = os.path.join(self.root_dirs[root], dest)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(full, target)
+            self.resize(target, lineage, size)
+        elif kind == "d":
+            os.remove(full)
+
+    def resize(self, full, lineage, size):
+        if size is None:
+            return
+        current = os.path.getsize(full)
+        if size > current:
+            with open(full, "r+b") as f:
+                f.seek(current)
+                f.write(lineage.payload[current:size])
+        elif size < current:
+            os.truncate(full, size)
+
+
+def run_replay(args):
+    from app.trace import read_trace
+    header, records = read_trace(args.trace)
+    records.sort(key=lambda r: r[0])
+    if args.limit:
+        records = [r for r in records if r[0] <= args.limit]
+    lineages, op_lineage = analyze(records)
+    from app.download_tools import BUILTIN_TOOLS, DownloadIntake
+    intake = DownloadIntake(BUILTIN_TOOLS)
+    wanted = [l for l in lineages if expected(l, intake)]
+
+    root = tempfile.mkdtemp(prefix="plm_replay_")
+    os.environ["APPDATA"] = os.path.join(root, "appdata")
+    root_dirs = {i: os.path.join(root, f"root{i}") for i in sorted({r[2] for r in records if r[1] != "ctx"})}
+    for path in root_dirs.values():
+        os.makedirs(path)
+
+    from app.settings import SettingsManager
+    from app.roots import WatchEngine, WatchRoot
+    from app.polling import polling_options
+    from app.watcher import create_handler
+    SettingsManager().data.update({
+        "quick_lane_workers": args.quick_workers,
+        "heavy_lane_workers": args.heavy_workers,
+        "session_window_seconds": args.session_window,
+        "engine": args.engine,
+    })
+
+    by_name = {}
+    for lineage in wanted:
+        by_name.setdefault(lineage.final_name, []).append(lineage)
+    done = {}
+    done_lock = threading.Lock()
+    all_done = threading.Event()
+
+    def on_success(dest_path):
+        name = os.path.basename(dest_path)
+        with done_lock:
+            candidates = by_name.get(name) or by_name.get(DUPLICATE_SUFFIX.sub("", name)) or []
+            for lineage in candidates:
+                if lineage.id not in done:
+                    done[lineage.id] = time.perf_counter()
+                    break
+            if len(done) >= len(wanted):
+                all_done.set()
+
+    def on_session(summary):
+        for dest_path in summary["files"]:
+            on_success(dest_path)
+
+    handler = create_handler()
+    handler.organizer.set_callback(on_success)
+    handler.organizer.set_session_callback(on_session)
+    engine = WatchEngine(polling_options(SettingsManager()))
+    engine.start()
+    for path in root_dirs.values():
+        engine.schedule_root(handler, WatchRoot(path), polling=args.watch_backend == "polling")
+
+    replayer = Replayer(records, op_lineage, root_dirs)
+    sampler = ResourceSampler()
+    log_sink = io.StringIO() if not args.verbose else sys.stdout
+    duration = records[-1][0] if records else 0.0
+    print(f"Replaying {len(records)} records ({duration:.1f}s recorded, {len(wanted)} files to organize) "
+          f"at {args.speed:g}x ...")
+    with contextlib.redirect_stdout(log_sink):
+        sampler.start()
+        started = time.perf_counter()
+        replayer.run(args.speed)
+        if wanted:
+            all_done.wait(args.timeout)
+        finished = time.perf_counter()
+        sampler.stop()
+        engine.stop()
+        engine.join()
+        handler.shutdown()
+
+    latencies = [max(0.0, done[l.id] - replayer.ready_at[l.id]) for l in wanted
+                 if l.id in done and l.id in replayer.ready_at]
+    original = [l.original_org_t - l.last_event_t for l in wanted if l.original_org_t is not None]
+    last_done = max(done.values()) if done else finished
+    wall = max(1e-9, last_done - started)
+    results = {
+        "benchmark": "replay",
+        "env": environment_info(),
+        "params": vars(args),
+        "trace": {"path": os.path.abspath(args.trace), "records": len(records), "duration": duration,
+                  "anonymized": header.get("anonymized")},
+        "metrics": {
+            "files_total": len(wanted),
+            "files_organized": len(latencies),
+            "files_lost": len(wanted) - len(latencies),
+            "ops_applied": replayer.applied,
+            "ops_skipped": replayer.skipped,
+            "wall_time": round(wall, 3),
+            "files_per_sec": round(len(latencies) / wall, 2),
+            "latency": summarize(latencies),
+            "original_latency": summarize(original),
+            "peak_threads": sampler.peak_threads,
+            "peak_rss_bytes": sampler.peak_rss,
+        },
+    }
+    if not args.keep:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def print_report(results):
+    m = results["metrics"]
+    print(f"Organized {m['files_organized']}/{m['files_total']} files ({m['files_lost']} lost) "
+          f"in {m['wall_time']}s -> {m['files_per_sec']} files/sec")
+    print(f"Operations: {m['ops_applied']} applied, {m['ops_skipped']} skipped")
+    for label, key in (("Replay latency", "latency"), ("Recorded latency", "original_latency")):
+        lat = m[key]
+        if lat.get("count"):
+            print(f"{label}: mean {lat['mean']}s, p50 {lat['p50']}s, p95 {lat['p95']}s, max {lat['max']}s")
+    print(f"Peak threads: {m['peak_threads']}, peak RSS: {m['peak_rss_bytes'] / (1024 * 1024):.1f} MB")
+
+
+def build_parser():
+    p = argparse.ArgumentParser(description="PLM Organizer trace replay benchmark")
+    p.add_argument("trace", help="trace-*.jsonl.gz recorded with Diagnostics > Record Event Trace")
+    p.add_argument("--speed", type=float, default=1.0, help="replay speed factor (gaps between operations)")
+    p.add_argument("--limit", type=float, default=0, help="only the first N seconds of the trace")
+    p.add_argument("--quick-workers", type=int, default=4)
+    p.add_argument("--heavy-workers", type=int, default=1)
+    p.add_argument("--session-window", type=float, default=1.5)
+    p.add_argument("--watch-backend", choices=["native", "polling"], default="native")
+    p.add_argument("--engine", choices=["threads", "asyncio"], default="threads", help="organizer engine")
+    p.add_argument("--timeout", type=float, default=120.0, help="seconds to wait for stragglers after the replay")
+    p.add_argument("--out")
+    p.add_argument("--compare")
+    p.add_argument("--keep", action="store_true")
+    p.add_argument("--verbose", action="store_true")
+    return p
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    results = run_replay(args)
+    print_report(results)
+    out = save_results(results, args.out or default_out_path("replay"))
+    print(f"Results saved to {out}")
+    if args.compare:
+        compare_results(results, args.compare, COMPARE_KEYS)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
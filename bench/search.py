@@ -0,0 +1,120 @@
+"""
+Search index benchmark: parallel bulk indexing of a synthetic tree of
+"[ID]_Title" folders, then prefix/token query latency.
+
+    python -m bench.search
+    python -m bench.search --folders 5000 --files-per-folder 40 --workers 1 8
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+from bench.common import compare_results, default_out_path, environment_info, save_results, summarize
+
+COMPARE_KEYS = [
+    "metrics.index_files_per_sec",
+    "metrics.queries.exact_id.p95",
+    "metrics.queries.id_prefix.p95",
+    "metrics.queries.title_token.p95",
+    "metrics.queries.two_tokens.p95",
+]
+WORDS = ("main", "board", "power", "supply", "camera", "module", "display", "panel", "battery", "cover",
+         "antenna", "speaker", "firmware", "bracket", "housing", "connector", "sensor", "drawing", "spec", "test")
+
+
+def build_tree(root, folders, files_per_folder, seed=0):
+    rng = random.Random(seed)
+    for f in range(folders):
+        record = f"DF{10000 + f}" if f % 2 else f"P{f:06d}-{f * 7 % 100000:05d}"
+        title = "_".join(rng.sample(WORDS, 3))
+        folder = os.path.join(root, f"[{record}]_{title}")
+        os.makedirs(folder)
+        for i in range(files_per_folder):
+            name = f"{rng.choice(WORDS)}_{rng.choice(WORDS)}_rev{i}.{rng.choice(('pdf', 'dwg', 'xlsx', 'zip'))}"
+            with open(os.path.join(folder, name), "wb") as fh:
+                fh.write(b"x" * rng.randrange(0, 512))
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="PLM Organizer search index benchmark")
+    p.add_argument("--folders", type=int, default=2000)
+    p.add_argument("--files-per-folder", type=int, default=50)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 8], help="bulk indexer thread counts")
+    p.add_argument("--repeat", type=int, default=50)
+    p.add_argument("--out")
+    p.add_argument("--compare")
+    args = p.parse_args(argv)
+
+    root = tempfile.mkdtemp(prefix="plm_bench_search_")
+    tree = os.path.join(root, "target")
+    try:
+        print(f"Building {args.folders} folders x {args.files_per_folder} files ...")
+        build_tree(tree, args.folders, args.files_per_folder)
+
+        import time
+        indexing = {}
+        index = None
+        for workers in args.workers:
+            # Fresh database per run (the index is a per-profile singleton).
+            os.environ["APPDATA"] = os.path.join(root, f"appdata_{workers}")
+            import app.settings
+            import app.search
+            app.settings.SettingsManager._instance = None
+            app.search.SearchIndex._instance = None
+            index = app.search.SearchIndex()
+            started = time.perf_counter()
+            count = index.bulk_index([tree], workers=workers)
+            elapsed = time.perf_counter() - started
+            indexing[workers] = {"files": count, "seconds": round(elapsed, 3),
+                                 "files_per_sec": round(count / elapsed)}
+            print(f"  bulk index x{workers:<3} {count} files in {elapsed:6.2f}s ({count / elapsed:,.0f} files/s)")
+
+        queries = {
+            "exact_id": "DF10001",
+            "id_prefix": "DF1000",
+            "plm_prefix": "P00012",
+            "title_token": "camera",
+            "title_prefix": "batt",
+            "two_tokens": "main board",
+            "id_and_name": "DF10001 rev1",
+        }
+        from app.search import timed_search
+        results = {}
+        for name, text in queries.items():
+            times, hits = [], 0
+            for _ in range(args.repeat):
+                rows, ms = timed_search(index, text)
+                times.append(ms)
+                hits = len(rows)
+            stats = summarize(times)
+            stats["hits"] = hits
+            results[name] = stats
+            print(f"  {name:<13} '{text}': {hits:>4} hits  p50 {stats['p50']:.2f} ms  p95 {stats['p95']:.2f} ms")
+        index_stats = index.stats()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    best = max(indexing.values(), key=lambda r: r["files_per_sec"])
+    out_results = {
+        "benchmark": "search",
+        "env": environment_info(),
+        "params": vars(args),
+        "metrics": {
+            "index": index_stats,
+            "bulk_index": {str(k): v for k, v in indexing.items()},
+            "index_files_per_sec": best["files_per_sec"],
+            "queries": results,
+        },
+    }
+    out = save_results(out_results, args.out or default_out_path("search"))
+    print(f"Results saved to {out}")
+    if args.compare:
+        compare_results(out_results, args.compare, COMPARE_KEYS)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -58,50 +58,136 @@ const titleObserver = new MutationObserver(() => {
 const titleNode = document.querySelector('title');
 if (titleNode) titleObserver.observe(titleNode, { childList: true });
 
-function findValueByAnchor(keywords) {
-    const elements = document.querySelectorAll('th, td, label, span, .label');
-    for (let el of elements) {
-        const text = el.innerText.trim();
-        if (keywords.some(k => text === k || text.includes(k + ":"))) {
-            let next = el.nextElementSibling;
-            if (next && next.innerText.trim()) return next.innerText.trim();
-            let parentNext = el.parentElement?.nextElementSibling;
-            if (parentNext && parentNext.innerText.trim()) return parentNext.innerText.trim();
+// --- Incremental Scraper ---
+// Large PLM grid pages made every reparse expensive (full querySelectorAll +
+// innerText, which forces layout). Resolved elements are now cached, so a
+// steady-state parse is a few textContent reads, and only those nodes are observed.
+const ANCHOR_TAGS = 'th, td, label, span, .label';
+const PARSE_BUDGET_MS = 8;      // Max main-thread time per parse before yielding
+const DEBOUNCE_MS = 1000;
+
+const scrapeCache = {
+    url: "",
+    nodes: { defect: null, plm: null, title: null, heading: null }, // Resolved value elements
+    anchorsScanned: false, // Anchor scan already completed for the current DOM: don't rescan
+    patternId: "",         // Result of the page-text ID pattern fallback
+    scan: null             // Resumable anchor scan (TreeWalker) when a parse ran out of budget
+};
+
+function resetScrapeCache() {
+    scrapeCache.url = window.location.href;
+    scrapeCache.nodes = { defect: null, plm: null, title: null, heading: null };
+    scrapeCache.anchorsScanned = false;
+    scrapeCache.patternId = "";
+    scrapeCache.scan = null;
+}
+
+// textContent does not force a layout pass (innerText does).
+function readText(el) {
+    return el ? (el.textContent || "").replace(/\s+/g, " ").trim() : "";
+}
+
+function isLive(el) {
+    return !!el && el.isConnected;
+}
+
+function resolveNode(field, selector) {
+    let el = scrapeCache.nodes[field];
+    if (!isLive(el)) {
+        el = document.querySelector(selector);
+        scrapeCache.nodes[field] = el;
+    }
+    return readText(el);
+}
+
+function valueElementNextTo(label) {
+    const next = label.nextElementSibling;
+    if (next && readText(next)) return next;
+    const parentNext = label.parentElement?.nextElementSibling;
+    if (parentNext && readText(parentNext)) return parentNext;
+    return null;
+}
+
+function matchesAnchor(text, keywords) {
+    return keywords.some(k => text === k || text.includes(k + ":"));
+}
+
+/**
+ * Walks text nodes once for all missing fields (cheap substring pre-check,
+ * no layout). Resumes where it stopped if the previous parse ran out of budget.
+ * @returns {boolean} true if the scan completed, false if it yielded.
+ */
+function scanAnchors(fields, deadline) {
+    let scan = scrapeCache.scan;
+    if (!scan || !isLive(scan.walker.currentNode)) {
+        scan = scrapeCache.scan = {
+            walker: document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT),
+            fields: new Set(fields)
+        };
+    }
+    for (const field of [...scan.fields]) {
+        if (!fields.includes(field)) scan.fields.delete(field);
+    }
+
+    let visited = 0;
+    let node;
+    while (scan.fields.size && (node = scan.walker.nextNode())) {
+        if ((++visited & 255) === 0 && performance.now() > deadline) return false;
+
+        const raw = node.nodeValue;
+        for (const field of scan.fields) {
+            const keywords = CONFIG.anchors[field];
+            if (!keywords.some(k => raw.includes(k))) continue;
+
+            const label = node.parentElement?.closest(ANCHOR_TAGS);
+            if (!label || !matchesAnchor(readText(label), keywords)) continue;
+
+            const valueEl = valueElementNextTo(label);
+            if (valueEl) {
+                scrapeCache.nodes[field] = valueEl;
+                scan.fields.delete(field);
+            }
         }
     }
-    return "";
+
+    scrapeCache.scan = null;
+    return true;
 }
 
 function parseMetadata() {
     // 🔒 Security Check (Shared Config)
     if (typeof isUrlAllowed === 'function' && !isUrlAllowed(window.location.href)) return null;
 
-    console.log("[Content] Parsing metadata from DOM...");
-    let defectId = "";
-    let plmId = "";
-    let title = "";
-
-    const elDefect = document.querySelector(CONFIG.selectors.defectId);
-    if (elDefect) defectId = elDefect.innerText.trim();
-
-    const elPlm = document.querySelector(CONFIG.selectors.plmId);
-    if (elPlm) plmId = elPlm.innerText.trim();
+    const started = performance.now();
+    if (scrapeCache.url !== window.location.href) resetScrapeCache();
 
-    const elTitle = document.querySelector(CONFIG.selectors.title);
-    if (elTitle) title = elTitle.innerText.trim();
+    // 1. Direct selectors (or cached elements from an earlier parse)
+    let defectId = resolveNode('defect', CONFIG.selectors.defectId);
+    let plmId = resolveNode('plm', CONFIG.selectors.plmId);
+    let title = resolveNode('title', CONFIG.selectors.title);
 
-    if (!defectId) defectId = findValueByAnchor(CONFIG.anchors.defect);
-    if (!plmId) plmId = findValueByAnchor(CONFIG.anchors.plm);
+    // 2. Anchor fallback (label -> neighbour value), time-budgeted
+    let complete = true;
+    const missing = [];
+    if (!defectId) missing.push('defect');
+    if (!plmId) missing.push('plm');
+    if (missing.length && !scrapeCache.anchorsScanned) {
+        complete = scanAnchors(missing, started + PARSE_BUDGET_MS);
+        if (!defectId) defectId = readText(scrapeCache.nodes.defect);
+        if (!plmId) plmId = readText(scrapeCache.nodes.plm);
 
-    if (!title) {
-        const h = document.querySelector('h1, h2, .page-title, .title');
-        if (h) title = h.innerText.trim();
+        if (complete) {
+            scrapeCache.anchorsScanned = true;
+            // 3. Last resort: ID pattern anywhere in the page text (once per DOM state)
+            if (!plmId && !defectId) {
+                const pMatch = (document.body.textContent || "").match(/P\d{6}-\d{5}/);
+                scrapeCache.patternId = pMatch ? pMatch[0] : "";
+            }
+        }
     }
+    if (!plmId && !defectId) plmId = scrapeCache.patternId;
 
-    if (!plmId && !defectId) {
-        const pMatch = document.body.innerText.match(/P\d{6}-\d{5}/);
-        if (pMatch) plmId = pMatch[0];
-    }
+    if (!title) title = resolveNode('heading', 'h1, h2, .page-title, .title');
 
     const data = {
         defect_id: defectId,
@@ -110,28 +196,87 @@ function parseMetadata() {
         url: window.location.href
     };
 
-    console.log("[Content] Parsed Data:", data);
+    console.log(`[Content] Parsed in ${(performance.now() - started).toFixed(1)} ms${complete ? "" : " (partial, resuming)"}:`, data);
 
     if (data.defect_id || data.plm_id) {
         syncTitle(data);
     }
 
+    if (!complete) {
+        // Out of budget: yield to the page, then continue the anchor scan.
+        scheduleParse(0);
+    } else if (autoSyncEnabled) {
+        updateSyncObserver(data);
+    }
+
     return data;
 }
 
 // Auto-Sync Setup (Only runs on Allowed Domains)
 // This Observer effectively "pushes" changes to the Window Title (Ghost Bridge),
 // handling SPA navigation or dynamic content loading that bg.js might miss.
-if (typeof isUrlAllowed === 'function' && isUrlAllowed(window.location.href)) {
+//  - 'body' mode: nothing resolved yet, watch the whole body (debounced).
+//  - 'nodes' mode: watch only the resolved elements, plus their ancestors
+//    (childList only) to notice when one of them is detached by a re-render.
+let debounceTimer;
+let syncMode = "";
+let watchedNodes = [];
+const autoSyncEnabled = typeof isUrlAllowed === 'function' && isUrlAllowed(window.location.href);
+
+function scheduleParse(delay) {
+    clearTimeout(debounceTimer);
+    debounceTimer = setTimeout(parseMetadata, delay);
+}
+
+const syncObserver = new MutationObserver((records) => {
+    if (syncMode === "nodes") {
+        if (watchedNodes.some(el => !el.isConnected)) {
+            // Re-rendered: resolve again from scratch.
+            scrapeCache.anchorsScanned = false;
+            scheduleParse(DEBOUNCE_MS);
+            return;
+        }
+        // Ancestor childList records that did not detach us are noise.
+        if (!records.some(r => watchedNodes.some(el => el.contains(r.target)))) return;
+    } else {
+        scrapeCache.anchorsScanned = false;
+    }
+    scheduleParse(DEBOUNCE_MS);
+});
+
+function updateSyncObserver(data) {
+    const nodes = Object.values(scrapeCache.nodes).filter(isLive);
+    const resolved = (data.defect_id || data.plm_id) && data.title && nodes.length;
+
+    if (!resolved) {
+        if (syncMode === "body") return;
+        syncObserver.disconnect();
+        syncObserver.observe(document.body, { childList: true, subtree: true });
+        syncMode = "body";
+        watchedNodes = [];
+        return;
+    }
+
+    if (syncMode === "nodes" && nodes.length === watchedNodes.length &&
+        nodes.every(el => watchedNodes.includes(el))) return;
+
+    syncObserver.disconnect();
+    const ancestors = new Set();
+    for (const el of nodes) {
+        syncObserver.observe(el, { childList: true, characterData: true, subtree: true });
+        for (let p = el.parentNode; p && p !== document; p = p.parentNode) ancestors.add(p);
+    }
+    for (const p of ancestors) {
+        // Never downgrade a watched node that happens to contain another one.
+        if (!nodes.includes(p)) syncObserver.observe(p, { childList: true });
+    }
+    syncMode = "nodes";
+    watchedNodes = nodes;
+}
+
+if (autoSyncEnabled) {
     console.log("[Content] Site Allowed. Starting Auto-Sync Observer.");
-    setTimeout(parseMetadata, 1000);
-
-    let debounceTimer;
-    const bodyObserver = new MutationObserver(() => {
-        clearTimeout(debounceTimer);
-        debounceTimer = setTimeout(parseMetadata, 1000);
-    });
-    bodyObserver.observe(document.body, { childList: true, subtree: true });
+    scheduleParse(1000);
 } else {
     console.log("[Content] Site Not Allowed. Auto-Sync Disabled.");
 }
@@ -139,6 +284,8 @@ if (typeof isUrlAllowed === 'function' && isUrlAllowed(window.location.href)) {
 chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
     console.log("[Content] Message Received:", request);
     if (request.action === "get_metadata") {
+        // Tab focus: allow one fresh anchor scan in case the page changed outside watched nodes.
+        scrapeCache.anchorsScanned = false;
         const data = parseMetadata();
         sendResponse(data);
     }
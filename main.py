@@ -32,6 +32,12 @@ def log_uncaught_exceptions(ex_cls, ex, tb):
     
 sys.excepthook = log_uncaught_exceptions
 
+# Command-line tools run without the GUI (e.g. "PLM_Organizer.exe search DF12345")
+if __name__ == "__main__" and len(sys.argv) > 1:
+    from app.cli import COMMANDS, run_cli
+    if sys.argv[1] in COMMANDS:
+        sys.exit(run_cli(sys.argv[1:]))
+
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtGui import QIcon
 from app.gui import MainWindow
@@ -57,15 +63,36 @@ def main():
     # Initialize Core Components
     # 1. Server Removed (v1.7.1 - Ghost Bridge Only)
 
+    # 1b. Metrics endpoint (loopback only, Prometheus text format)
+    from app.settings import SettingsManager
+    from app.metrics import MetricsServer
+    metrics_server = MetricsServer.from_settings(SettingsManager())
+    if metrics_server:
+        metrics_server.start()
+
     # 2. File Watcher
     watcher = FileWatcher()
     # watcher.start() -> Deformed to GUI for validation logic
+
+    # 2b. Warm state: last context, pending files and routes from the previous run
+    from app.warmstate import WarmState
+    warm_state = WarmState.from_settings(SettingsManager(), watcher.event_handler)
+    if warm_state:
+        warm_state.restore_context()
+        watcher.on_started = warm_state.restore_pending
+        warm_state.start()
     
     # 3. Ghost Title Bridge (Invisible Sync)
     from app.bridge import TitleBridge
     bridge = TitleBridge()
     bridge.start()
     
+    # 3b. Retention (compacts old record folders in the background, if enabled)
+    from app.retention import RetentionScheduler
+    retention = RetentionScheduler.from_settings(SettingsManager())
+    if retention:
+        retention.start()
+
     # 4. GUI
     window = MainWindow(watcher)
     window.show()
@@ -75,7 +102,13 @@ def main():
     # v1.8.1: Strict Shutdown
     # Force kill all threads (including TitleBridge) to prevent zombie processes.
     print("[Main] Shutting down...")
+    if warm_state:
+        warm_state.stop() # Before the engine is cancelled: files still being verified stay pending
+    watcher.shutdown()
     os._exit(exit_code) # os._exit is stronger than sys.exit
 
 if __name__ == "__main__":
+    # Required for the process-pool extraction backend in the frozen EXE
+    import multiprocessing
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,118 @@
+// PLM Organizer - Content Script Timing Harness
+// Loaded by mock_plm.html?bench=1 (use &rows=20000 for a huge grid).
+// Runs extension/content.js as a page script (chrome.* stubbed) and compares
+// the incremental scraper against the legacy full-scan parser.
+(function () {
+    const RUNS = 20;
+    const MUTATION_BURSTS = 20;
+    const ROWS_PER_BURST = 200;
+
+    if (!window.chrome || !window.chrome.runtime) {
+        window.chrome = { runtime: { onMessage: { addListener() { } } } };
+    }
+
+    function loadScript(src) {
+        return new Promise((resolve, reject) => {
+            const s = document.createElement('script');
+            s.src = src;
+            s.onload = resolve;
+            s.onerror = () => reject(new Error(`Failed to load ${src}`));
+            document.body.appendChild(s);
+        });
+    }
+
+    // Pre-incremental parser (innerText on every candidate element), kept for comparison.
+    function legacyFindValueByAnchor(keywords) {
+        const elements = document.querySelectorAll('th, td, label, span, .label');
+        for (let el of elements) {
+            const text = el.innerText.trim();
+            if (keywords.some(k => text === k || text.includes(k + ":"))) {
+                let next = el.nextElementSibling;
+                if (next && next.innerText.trim()) return next.innerText.trim();
+                let parentNext = el.parentElement?.nextElementSibling;
+                if (parentNext && parentNext.innerText.trim()) return parentNext.innerText.trim();
+            }
+        }
+        return "";
+    }
+
+    function legacyParse() {
+        let defectId = "", plmId = "", title = "";
+        const elDefect = document.querySelector(CONFIG.selectors.defectId);
+        if (elDefect) defectId = elDefect.innerText.trim();
+        const elPlm = document.querySelector(CONFIG.selectors.plmId);
+        if (elPlm) plmId = elPlm.innerText.trim();
+        const elTitle = document.querySelector(CONFIG.selectors.title);
+        if (elTitle) title = elTitle.innerText.trim();
+        if (!defectId) defectId = legacyFindValueByAnchor(CONFIG.anchors.defect);
+        if (!plmId) plmId = legacyFindValueByAnchor(CONFIG.anchors.plm);
+        if (!plmId && !defectId) {
+            const pMatch = document.body.innerText.match(/P\d{6}-\d{5}/);
+            if (pMatch) plmId = pMatch[0];
+        }
+        return { defect_id: defectId, plm_id: plmId, title: title };
+    }
+
+    function time(fn, runs) {
+        const samples = [];
+        for (let i = 0; i < runs; i++) {
+            // Dirty the layout like a live grid would, so innerText pays for it.
+            document.body.style.paddingLeft = (i % 2 ? 20 : 21) + "px";
+            const t0 = performance.now();
+            fn();
+            samples.push(performance.now() - t0);
+        }
+        samples.sort((a, b) => a - b);
+        const mean = samples.reduce((a, b) => a + b, 0) / samples.length;
+        return {
+            mean: +mean.toFixed(2),
+            p95: +samples[Math.min(samples.length - 1, Math.ceil(samples.length * 0.95) - 1)].toFixed(2),
+            max: +samples[samples.length - 1].toFixed(2)
+        };
+    }
+
+    async function mutationStorm() {
+        // Measures main-thread time spent in parseMetadata while the grid keeps growing.
+        const original = window.parseMetadata;
+        let spent = 0, calls = 0;
+        window.parseMetadata = function () {
+            const t0 = performance.now();
+            try { return original.apply(this, arguments); }
+            finally { spent += performance.now() - t0; calls++; }
+        };
+        const tbody = document.querySelector('#content > div.dataGrid tbody');
+        for (let b = 0; b < MUTATION_BURSTS; b++) {
+            tbody.insertAdjacentHTML('beforeend', fillerRows(ROWS_PER_BURST));
+            await new Promise(r => setTimeout(r, 100));
+        }
+        await new Promise(r => setTimeout(r, 1500)); // Let the debounce fire
+        window.parseMetadata = original;
+        return { parse_calls: calls, parse_ms_total: +spent.toFixed(2) };
+    }
+
+    async function run() {
+        await loadScript('../extension/config.js');
+        await loadScript('../extension/content.js');
+        console.log = () => { }; // Keep console formatting out of the timings
+
+        const cells = document.querySelectorAll('td, th').length;
+        const results = {
+            scenario: currentId,
+            rows: extraRows,
+            cells: cells,
+            legacy: time(legacyParse, RUNS),
+            incremental_cold: time(() => { resetScrapeCache(); parseMetadata(); }, RUNS),
+            incremental_warm: time(() => parseMetadata(), RUNS),
+            mutation_storm: await mutationStorm(),
+            parsed: parseMetadata()
+        };
+
+        const out = document.createElement('pre');
+        out.id = 'bench-results';
+        out.textContent = JSON.stringify(results, null, 2);
+        document.body.prepend(out);
+        console.info("[Bench] Scraper timings", results);
+    }
+
+    run().catch(e => console.error("[Bench] Failed:", e));
+})();
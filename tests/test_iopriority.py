@@ -0,0 +1,122 @@
+"""
+Bandwidth limit: the token bucket, the download activity window and the
+per-copy choice between the shutil.copy2 fast path and the metered stream.
+Driven by a fake clock, so nothing here really sleeps.
+Run with: python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+# Settings, history and indexes go to a throwaway folder, never the user's
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="plm-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.integrity import VerifiedCopy  # noqa: E402
+from app.iopriority import MB, ActivityMonitor, IoController, TokenBucket  # noqa: E402
+
+CHUNK = 256 * 1024
+
+
+class FakeClock:
+    """monotonic() and sleep() in one: sleeping only moves the time forward."""
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def _controller(clock, **settings):
+    controller = object.__new__(IoController)
+    controller._init(settings, clock=clock, sleep=clock.sleep)
+    return controller
+
+
+def test_bucket_holds_the_long_run_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(4 * MB, burst=MB, clock=clock, sleep=clock.sleep)
+    total = 200 * CHUNK
+    for _ in range(200):
+        bucket.consume(CHUNK)
+    # Everything beyond the initial burst is paid for at exactly the rate
+    assert abs((clock.now - 1000.0) - (total - MB) / (4 * MB)) < 1e-9
+
+
+def test_bucket_debt_is_slept_off():
+    clock = FakeClock()
+    bucket = TokenBucket(MB, burst=MB, clock=clock, sleep=clock.sleep)
+    assert bucket.consume(MB) == 0.0 # The burst is free
+    assert bucket.consume(CHUNK) == CHUNK / MB # One chunk in debt: a quarter second at 1 MB/s
+    clock.now += 10 # Idle time refills only up to the burst
+    assert bucket.consume(MB) == 0.0
+    assert bucket.consume(2 * MB) == 2.0
+
+
+def test_bucket_without_rate_never_sleeps():
+    clock = FakeClock()
+    bucket = TokenBucket(0, clock=clock, sleep=clock.sleep)
+    for _ in range(100):
+        assert bucket.consume(10 * MB) == 0.0
+    assert clock.slept == []
+
+
+def test_activity_window():
+    clock = FakeClock()
+    activity = ActivityMonitor(window=3.0, clock=clock)
+    assert not activity.busy()
+    activity.note()
+    clock.now += 2.9
+    assert activity.busy()
+    clock.now += 0.2
+    assert not activity.busy()
+
+
+def test_limit_follows_download_activity():
+    clock = FakeClock()
+    io = _controller(clock, io_limit_mbps=0, io_limit_busy_mbps=8)
+    assert io.current_limit() == 0
+    io.note_activity()
+    assert io.current_limit() == 8 * MB
+    # While busy, the bucket meters at the busy limit...
+    io.throttle(MB) # burst
+    assert io.throttle(MB) == 1 / 8
+    clock.now += 3.0
+    # ...and once the window has passed, not at all
+    assert io.current_limit() == 0
+    assert io.throttle(100 * MB) == 0.0
+
+
+def test_busy_limit_never_raises_the_normal_limit():
+    clock = FakeClock()
+    io = _controller(clock, io_limit_mbps=4, io_limit_busy_mbps=32)
+    io.note_activity()
+    assert io.current_limit() == 4 * MB
+    clock.now += 5
+    assert io.current_limit() == 4 * MB
+
+
+def test_copy_takes_the_fast_path_when_no_limit_applies(tmp_path, monkeypatch):
+    clock = FakeClock()
+    io = _controller(clock, io_limit_mbps=0, io_limit_busy_mbps=1)
+    metered = []
+    copier = VerifiedCopy(throttle=lambda n: metered.append(n) or io.bucket.consume(n), limit=io.current_limit)
+    fast = []
+    real_copy2 = shutil.copy2
+    monkeypatch.setattr("app.integrity.shutil.copy2", lambda *a, **k: fast.append(a[0]) or real_copy2(*a, **k))
+    src = tmp_path / "big.bin"
+    src.write_bytes(b"x" * (3 * CHUNK))
+
+    copier(str(src), str(tmp_path / "quiet.bin"))
+    assert fast == [str(src)] and metered == []
+
+    io.note_activity()
+    copier(str(src), str(tmp_path / "busy.bin"))
+    assert fast == [str(src)] and sum(metered) == 3 * CHUNK
+    assert (tmp_path / "busy.bin").read_bytes() == src.read_bytes()
@@ -0,0 +1,135 @@
+"""
+Stress test for the per-folder move lock: hundreds of same-name files filed
+into one record folder at once must all arrive, each under its own name.
+Run with: python -m pytest tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Settings, history and indexes go to a throwaway folder, never the user's
+os.environ["APPDATA"] = tempfile.mkdtemp(prefix="plm-tests-")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.context import ContextManager  # noqa: E402
+from app.locks import KeyedLock  # noqa: E402
+from app.organizer import Organizer  # noqa: E402
+
+FILES = 300
+WORKERS = 32
+
+
+def _sources(base, count, name="report.pdf"):
+    """count files with the same name (in separate folders) and distinct contents."""
+    sources = []
+    for i in range(count):
+        folder = os.path.join(base, "incoming", str(i))
+        os.makedirs(folder)
+        path = os.path.join(folder, name)
+        with open(path, "wb") as f:
+            f.write(f"copy {i}\n".encode() * 50)
+        sources.append(path)
+    return sources
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _filed(target):
+    """{name: content} of the files in target (the manifest excluded)."""
+    return {name: _read(os.path.join(target, name)) for name in os.listdir(target) if not name.startswith(".plm")}
+
+
+def _move_all(organizer, sources, target, route=None):
+    start = threading.Barrier(WORKERS)
+
+    def move(source):
+        try:
+            start.wait(timeout=5) # The first batch hits the folder lock together
+        except threading.BrokenBarrierError:
+            pass
+        return organizer.move_file_safe(source, target, route=route, verbose=False)
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        return list(pool.map(move, sources))
+
+
+def _assert_nothing_lost(sources, moved, expected):
+    assert None not in moved
+    assert len(set(moved)) == len(sources), "two files were given the same destination"
+    assert not any(os.path.exists(source) for source in sources)
+    assert sorted(_read(path) for path in moved) == sorted(expected), "a file was overwritten"
+
+
+def test_same_name_moves_without_route(tmp_path):
+    sources = _sources(str(tmp_path), FILES)
+    expected = [_read(s) for s in sources]
+    target = os.path.join(str(tmp_path), "[T1]_Plain")
+    os.makedirs(target)
+
+    moved = _move_all(Organizer(), sources, target)
+    _assert_nothing_lost(sources, moved, expected)
+    assert len(_filed(target)) == FILES
+
+
+def test_same_name_moves_through_cached_route(tmp_path):
+    base = str(tmp_path)
+    sources = _sources(base, FILES)
+    expected = [_read(s) for s in sources]
+    organizer = Organizer()
+    ContextManager().update_context({"plm_id": "T2", "title": "Routed"})
+    route = organizer.routing.resolve(base)
+    # Added behind the route's back: must not be overwritten either
+    with open(os.path.join(route.target_dir, "report.pdf"), "wb") as f:
+        f.write(b"user copy")
+
+    moved = _move_all(organizer, sources, route.target_dir, route)
+    _assert_nothing_lost(sources, moved, expected)
+    filed = _filed(route.target_dir)
+    assert len(filed) == FILES + 1
+    assert filed["report.pdf"] == b"user copy"
+
+
+def test_locked_file_does_not_stall_the_folder(tmp_path, monkeypatch):
+    base = str(tmp_path)
+    locked, free = _sources(base, 1, "locked.pdf")[0], _sources(base + "/b", 1, "free.pdf")[0]
+    target = os.path.join(base, "[T3]_Busy")
+    os.makedirs(target)
+    real_move = shutil.move
+
+    def move(source, destination, **kwargs):
+        if source == locked:
+            raise PermissionError("in use by another process")
+        return real_move(source, destination, **kwargs)
+
+    monkeypatch.setattr("app.organizer.shutil.move", move)
+    organizer = Organizer()
+    stuck = threading.Thread(target=organizer.move_file_safe, args=(locked, target), kwargs={"verbose": False})
+    stuck.start()
+    time.sleep(0.2) # Now sleeping between its retries
+    started = time.monotonic()
+    assert organizer.move_file_safe(free, target, verbose=False) == os.path.join(target, "free.pdf")
+    assert time.monotonic() - started < 0.5, "the retry loop held the folder lock while sleeping"
+    stuck.join()
+    assert os.path.exists(locked)
+
+
+def test_keyed_lock_table_cleans_up():
+    locks = KeyedLock()
+    counter = {"value": 0}
+
+    def work(i):
+        for _ in range(100):
+            with locks.hold(f"folder-{i % 8}"):
+                counter["value"] += 1
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        list(pool.map(work, range(64)))
+    assert counter["value"] == 64 * 100
+    assert len(locks) == 0